@@ -10,6 +10,20 @@ import numpy as np
 from .utils import logger, verbose
 
 
+def _baseline_idx(times, baseline):
+    """The indices imin, imax of the baseline interval in times"""
+    bmin, bmax = baseline
+    if bmin is None:
+        imin = 0
+    else:
+        imin = int(np.where(times >= bmin)[0][0])
+    if bmax is None:
+        imax = len(times)
+    else:
+        imax = int(np.where(times <= bmax)[0][-1]) + 1
+    return imin, imax
+
+
 @verbose
 def rescale(data, times, baseline, mode, verbose=None, copy=True):
     """Rescale aka baseline correct data
@@ -53,15 +67,7 @@ def rescale(data, times, baseline, mode, verbose=None, copy=True):
 
     if baseline is not None:
         logger.info("Applying baseline correction ... (mode: %s)" % mode)
-        bmin, bmax = baseline
-        if bmin is None:
-            imin = 0
-        else:
-            imin = int(np.where(times >= bmin)[0][0])
-        if bmax is None:
-            imax = len(times)
-        else:
-            imax = int(np.where(times <= bmax)[0][-1]) + 1
+        imin, imax = _baseline_idx(times, baseline)
 
         # avoid potential "empty slice" warning
         if data.shape[-1] > 0:
@@ -235,7 +235,6 @@ def compute_raw_data_covariance(raw, tmin=None, tmax=None, tstep=0.2,
         stop = raw.last_samp - raw.first_samp
     else:
         stop = int(ceil(tmax * sfreq))
-    step = int(ceil(tstep * raw.info['sfreq']))
 
     # don't exclude any bad channels, inverses expect all channels present
     if picks is None:
@@ -253,11 +252,9 @@ def compute_raw_data_covariance(raw, tmin=None, tmax=None, tstep=0.2,
     idx_by_type = channel_indices_by_type(info)
 
     # Read data in chuncks
-    for first in range(start, stop, step):
-        last = first + step
-        if last >= stop:
-            last = stop
-        raw_segment, times = raw[picks, first:last]
+    for raw_segment, times, first in raw.iter_chunks(tstep, picks=picks,
+                                                     start=start, stop=stop):
+        last = first + raw_segment.shape[1]
         if _is_good(raw_segment, info['ch_names'], idx_by_type, reject, flat,
                     ignore_chs=info['bads']):
             mu += raw_segment.sum(axis=1)
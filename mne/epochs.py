@@ -9,32 +9,38 @@
 # License: BSD (3-clause)
 
 import copy as cp
+import gzip
+import os
+import tempfile
 import warnings
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy import linalg
 from copy import deepcopy
 
 from .fiff.write import (start_file, start_block, end_file, end_block,
                          write_int, write_float_matrix, write_float,
-                         write_id, write_string)
+                         write_id, write_string, write_padding)
 from .fiff.meas_info import read_meas_info, write_meas_info
 from .fiff.open import fiff_open
-from .fiff.raw import _time_as_index, _index_as_time
+from .fiff.raw import _time_as_index, _index_as_time, _check_dtype
 from .fiff.tree import dir_tree_find
 from .fiff.tag import read_tag
 from .fiff import Evoked, FIFF
 from .fiff.pick import (pick_types, channel_indices_by_type, channel_type,
                         pick_channels)
-from .fiff.proj import setup_proj, ProjMixin
+from .fiff.proj import setup_proj, ProjMixin, _projector_vecs, _project
 from .fiff.evoked import aspect_rev
-from .baseline import rescale
+from .baseline import _baseline_idx
 from .utils import (check_random_state, _check_pandas_index_arguments,
                     _check_pandas_installed)
-from .filter import resample, detrend
+from .filter import resample, _decim_filter, _fir_decimate
 from .event import _read_events_fif
 from .fixes import in1d
+from .parallel import parallel_func
 from .viz import _mutable_defaults, plot_epochs
-from .utils import logger, verbose
+from .utils import logger, verbose, get_config
 
 
 class _BaseEpochs(ProjMixin):
@@ -47,7 +53,7 @@ class _BaseEpochs(ProjMixin):
                  picks=None, name='Unknown', keep_comp=False, dest_comp=0,
                  reject=None, flat=None, decim=1, reject_tmin=None,
                  reject_tmax=None, detrend=None, add_eeg_ref=True,
-                 verbose=None):
+                 decim_filter=False, verbose=None):
 
         self.verbose = verbose
         self.name = name
@@ -88,6 +94,7 @@ class _BaseEpochs(ProjMixin):
         self.reject_tmax = reject_tmax
         self.flat = flat
         self.decim = decim = int(decim)
+        self.decim_filter = decim_filter = bool(decim_filter and decim > 1)
         self._bad_dropped = False
         self.drop_log = None
         self.detrend = detrend
@@ -123,7 +130,10 @@ class _BaseEpochs(ProjMixin):
         if decim > 1:
             new_sfreq = sfreq / decim
             lowpass = self.info['lowpass']
-            if new_sfreq < 2.5 * lowpass:  # nyquist says 2 but 2.5 is safer
+            if decim_filter:
+                # low-pass filtered at the new Nyquist frequency
+                self.info['lowpass'] = min(lowpass, new_sfreq / 2.)
+            elif new_sfreq < 2.5 * lowpass:  # nyquist says 2 but 2.5 is safer
                 msg = ('The measurement information indicates a low-pass '
                        'frequency of %g Hz. The decim=%i parameter will '
                        'result in a sampling frequency of %g Hz, which can '
@@ -139,6 +149,7 @@ class _BaseEpochs(ProjMixin):
         self.preload = False
         self._data = None
         self._offset = None
+        self._stats = None
 
         # setup epoch rejection
         self._reject_setup()
@@ -195,6 +206,31 @@ class _BaseEpochs(ProjMixin):
                             self.reject, self.flat, full_report=True,
                             ignore_chs=self.info['bads'])
 
+    @verbose
+    def _is_good_epochs(self, data, verbose=None):
+        """Determine which of a set of complete epochs are good
+
+        Parameters
+        ----------
+        data : array, shape (n_epochs, n_channels, n_times)
+            The epochs.
+
+        Returns
+        -------
+        good : array of bool, shape (n_epochs,)
+            Whether each epoch is good.
+        bad_lists : list
+            For each epoch, None if it is good, otherwise the list of the
+            offending channels.
+        """
+        if self.reject is None and self.flat is None:
+            return np.ones(len(data), dtype=bool), [None] * len(data)
+        if self._reject_time is not None:
+            data = data[..., self._reject_time]
+        return _is_good_batch(data, self.ch_names, self._channel_type_idx,
+                              self.reject, self.flat,
+                              ignore_chs=self.info['bads'])
+
     def get_data(self):
         """Get all epochs as a 3D array
 
@@ -364,23 +400,17 @@ class _BaseEpochs(ProjMixin):
             if not _do_std:
                 data = np.mean(self._data, axis=0)
             else:
-                data = np.std(self._data, axis=0)
+                data = _std_data(self._data)
             assert len(self.events) == len(self._data)
         else:
-            data = np.zeros((n_channels, n_times))
-            n_events = 0
-            for e in self:
-                data += e
-                n_events += 1
-            data /= n_events
-            # convert to stderr if requested, could do in one pass but do in
-            # two (slower) in case there are large numbers
-            if _do_std:
-                data_mean = cp.copy(data)
-                data.fill(0.)
-                for e in self:
-                    data += (e - data_mean) ** 2
-                data = np.sqrt(data / n_events)
+            # the statistics of all event ids are computed in a single pass
+            event_ids = np.unique(np.atleast_2d(self.events)[:, 2])
+            n_events, data, m2 = self._get_stats().combine(event_ids)
+            if n_events == 0:
+                data = np.empty((n_channels, n_times))
+                data.fill(np.nan)
+            elif _do_std:
+                data = np.sqrt(m2 / n_events)
 
         evoked.data = data
         evoked.times = self.times.copy()
@@ -415,6 +445,17 @@ class _BaseEpochs(ProjMixin):
 
         return evoked
 
+    def _get_stats(self):
+        """Compute the mean and squared deviations of each event id"""
+        def epochs_iter():
+            iter(self)
+            while True:
+                try:
+                    yield self.next(return_event_id=True)
+                except StopIteration:
+                    return
+        return _update_stats(_EpochsStats(), epochs_iter())
+
     @property
     def ch_names(self):
         return self.info['ch_names']
@@ -490,10 +531,12 @@ class Epochs(_BaseEpochs):
     picks : None (default) or array of int
         Indices of channels to include (if None, all channels
         are used).
-    preload : boolean
+    preload : boolean | 'memmap'
         Load all epochs from disk when creating the object
         or wait before accessing each epoch (more memory
-        efficient but can be slower).
+        efficient but can be slower). If 'memmap', the loaded data
+        are stored in a np.memmap in the directory set with
+        mne.set_cache_dir, so that they do not need to fit in memory.
     reject : dict
         Epoch rejection parameters based on peak to peak amplitude.
         Valid keys are 'grad' | 'mag' | 'eeg' | 'eog' | 'ecg'.
@@ -525,6 +568,7 @@ class Epochs(_BaseEpochs):
         Factor by which to downsample the data from the raw file upon import.
         Warning: This simply selects every nth sample, data is not filtered
         here. If data is not properly filtered, aliasing artifacts may occur.
+        Use decim_filter=True to avoid this.
     reject_tmin : scalar | None
         Start of the time window used to reject epochs (with the default None,
         the window will start with tmin).
@@ -542,6 +586,25 @@ class Epochs(_BaseEpochs):
     add_eeg_ref : bool
         If True, an EEG average reference will be added (unless one
         already exists).
+    dtype : numpy dtype
+        Floating point type of the epochs data, either np.float64 (default)
+        or np.float32. With np.float32, projection, detrending and baseline
+        correction are also done in single precision, which halves the
+        memory needed to preload the data.
+    n_jobs : int
+        Number of jobs to run in parallel when projecting, detrending and
+        baseline correcting the epochs read from raw. The epochs are
+        processed in chunks, which are memmapped to the workers if
+        mne.set_cache_dir is used.
+    decim_filter : bool
+        If True and decim > 1, the data are low-pass filtered before
+        decimation, with the FIR filter of scipy.signal.decimate (cutoff at
+        the Nyquist frequency of the decimated data). Only the decimated time
+        points are computed, from the raw data of each epoch plus the filter
+        margins, so that the epochs are never stored at the full sampling
+        rate. Where the margins extend beyond the raw data, the first or last
+        sample is repeated. Projection, detrending and baseline correction
+        are then applied to the decimated data.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
         Defaults to raw.verbose.
@@ -593,7 +656,8 @@ class Epochs(_BaseEpochs):
                  picks=None, name='Unknown', keep_comp=None, dest_comp=None,
                  preload=False, reject=None, flat=None, proj=True,
                  decim=1, reject_tmin=None, reject_tmax=None, detrend=None,
-                 add_eeg_ref=True, verbose=None):
+                 add_eeg_ref=True, dtype=np.float64, n_jobs=1,
+                 decim_filter=False, verbose=None):
         if raw is None:
             return
 
@@ -616,10 +680,18 @@ class Epochs(_BaseEpochs):
                                      reject=reject, flat=flat, decim=decim,
                                      reject_tmin=reject_tmin,
                                      reject_tmax=reject_tmax, detrend=detrend,
-                                     add_eeg_ref=add_eeg_ref, verbose=verbose)
+                                     add_eeg_ref=add_eeg_ref,
+                                     decim_filter=decim_filter,
+                                     verbose=verbose)
 
         # do the rest
         self.raw = raw
+        self._epochs_file = None
+        self._dtype = _check_dtype(dtype)
+        self._n_jobs = n_jobs
+        self._decim_fir = None
+        if self.decim_filter:
+            self._decim_fir = _decim_filter(self.decim)
         proj = proj or raw.proj  # proj is on when applied in Raw
         if proj not in [True, 'delayed', False]:
             raise ValueError(r"'proj' must either be 'True', 'False' or "
@@ -631,6 +703,7 @@ class Epochs(_BaseEpochs):
         activate = False if self._check_delayed() else self.proj
         self._projector, self.info = setup_proj(self.info, add_eeg_ref,
                                                 activate=activate)
+        self._proj_vecs = _projector_vecs(self.info)
         # Select the desired events
         selected = in1d(events[:, 2], self.event_id.values())
         self.events = events[selected]
@@ -645,7 +718,7 @@ class Epochs(_BaseEpochs):
         else:
             raise ValueError('No desired events found.')
 
-        self.preload = preload
+        self.preload = _check_preload(preload)
         if self.preload:
             self._data = self._get_data_from_disk()
             self.raw = None
@@ -668,9 +741,10 @@ class Epochs(_BaseEpochs):
 
         if self._projector is not None:
             self._projector = self._projector[idx][:, idx]
+            self._proj_vecs = self._proj_vecs[idx]
 
         if self.preload:
-            self._data = self._data[:, idx, :]
+            self._data = _take_data(self._data, idx, axis=1)
 
     def drop_bad_epochs(self):
         """Drop bad epochs without retaining the epochs data.
@@ -715,14 +789,20 @@ class Epochs(_BaseEpochs):
         if indices.dtype == bool:
             indices = np.where(indices)[0]
         self.events = np.delete(self.events, indices, axis=0)
+        if self._epochs_file is not None:
+            self._file_rows = np.delete(self._file_rows, indices)
         if(self.preload):
-            self._data = np.delete(self._data, indices, axis=0)
+            keep = np.delete(np.arange(len(self._data)), indices)
+            self._data = _take_data(self._data, keep)
         count = len(indices)
         logger.info('Dropped %d epoch%s' % (count, '' if count == 1 else 's'))
 
     @verbose
     def _get_epoch_from_disk(self, idx, proj, verbose=None):
         """Load one epoch from disk"""
+        if self.raw is None and self._epochs_file is not None:
+            # epochs read from file are already preprocessed
+            return [self._read_epochs_file([idx])[0], None]
         if self.raw is None:
             # This should never happen, as raw=None only if preload=True
             raise ValueError('An error has occurred, no valid raw file found.'
@@ -743,13 +823,21 @@ class Epochs(_BaseEpochs):
         if start < 0:
             return None, None
 
-        epoch_raw, _ = self.raw[self.picks, start:stop]
+        if self._decim_fir is None:
+            epoch_raw, _ = self.raw[self.picks, start:stop]
+        else:
+            epoch_raw = self._read_decimated(start, stop)
+        dtype = self._dtype
+        if np.iscomplexobj(epoch_raw):
+            dtype = np.result_type(dtype, np.complex64)
+        if epoch_raw.dtype != dtype:
+            epoch_raw = epoch_raw.astype(dtype)
 
         # setup list of epochs to handle delayed SSP
         epochs = []
         # whenever requested, the first epoch is being projected.
         if self._projector is not None and proj is True:
-            epochs += [np.dot(self._projector, epoch_raw)]
+            epochs += [_project(self._proj_vecs, epoch_raw)]
         else:
             epochs += [epoch_raw]
 
@@ -769,26 +857,210 @@ class Epochs(_BaseEpochs):
 
         return epochs
 
+    def _read_decimated(self, start, stop):
+        """Read the epoch start:stop from raw, filtered and decimated"""
+        n_raw_times = self.raw.n_times
+        margin = len(self._decim_fir) // 2
+        first = max(start - margin, 0)
+        last = min(stop + margin, n_raw_times)
+        data, _ = self.raw[self.picks, first:last]
+        if stop > n_raw_times:
+            # too short, the epoch will be dropped
+            return data[:, start - first:][:, self._decim_idx]
+        # repeat the first and last samples where the margins are missing
+        n_before = first - (start - margin)
+        n_after = stop + margin - last
+        if n_before > 0 or n_after > 0:
+            data = np.concatenate([np.repeat(data[:, :1], n_before, axis=1),
+                                   data,
+                                   np.repeat(data[:, -1:], n_after, axis=1)],
+                                  axis=1)
+        return _fir_decimate(data, self._decim_fir, self._decim_idx.start,
+                             self.decim)
+
+    def _get_epochs_from_disk(self, proj):
+        """Generate the output of _get_epoch_from_disk for all events
+
+        The epochs are extracted, projected and preprocessed in batches
+        using array operations. If the raw data are not preloaded, the
+        sorted epoch windows are merged into contiguous spans, so that
+        overlapping or adjacent epochs are read from disk only once.
+        """
+        if self.raw is None and self._epochs_file is not None:
+            for epoch in self._get_epochs_from_file():
+                yield epoch
+            return
+        if self.raw is None:
+            # This should never happen, as raw=None only if preload=True
+            raise ValueError('An error has occurred, no valid raw file found.'
+                             ' Please report this to the mne-python '
+                             'developers.')
+        n_events = len(self.events)
+        # same sample rounding as in _get_epoch_from_disk
+        sfreq = self.raw.info['sfreq']
+        events = np.atleast_2d(self.events)
+        starts = np.array([int(round(event_samp + self.tmin * sfreq))
+                           for event_samp in events[:, 0]], dtype=np.int64)
+        starts -= self.raw.first_samp
+        n_times = self._epoch_stop
+        decim_fir = None
+        if self._decim_fir is not None:
+            # read the filter margins too, see _read_decimated
+            margin = len(self._decim_fir) // 2
+            starts -= margin
+            n_times += 2 * margin
+            decim_fir = (self._decim_fir, self._decim_idx.start, self.decim)
+        n_raw_times = self.raw.n_times
+        picks = np.asarray(self.picks)
+        good = np.logical_and(starts >= 0, starts + n_times <= n_raw_times)
+        proj_vecs = None
+        if self._projector is not None and proj is True:
+            proj_vecs = self._proj_vecs
+        keep_raw = self.proj != proj  # delayed SSP, see _get_epoch_from_disk
+        parallel, p_fun, n_jobs = parallel_func(_process_epochs, self._n_jobs)
+        preprocessor = self._get_preprocessor()
+
+        if self.raw._preloaded:
+            raw_data = self.raw._data
+            # view of the raw data as (n_channels, n_windows, n_times),
+            # where window i starts at sample i
+            windows = as_strided(raw_data,
+                                 shape=(raw_data.shape[0],
+                                        max(n_raw_times - n_times + 1, 0),
+                                        n_times),
+                                 strides=(raw_data.strides[0],) +
+                                 2 * (raw_data.strides[1],))
+            is_complex = np.iscomplexobj(raw_data)
+
+            def get_windows(idx):
+                # one fancy index gives (n_channels, n_epochs, n_times)
+                return windows[picks[:, np.newaxis], starts[idx]]
+        else:
+            get_windows = _SpanReader(self.raw, picks, starts, good, n_times)
+            is_complex = False  # not known before reading
+
+        # small batches (2 MB) keep the temporary arrays in the CPU cache,
+        # larger ones (16 MB) are worth sending to the parallel jobs
+        batch_bytes = 2 ** 21 if n_jobs == 1 else 2 ** 24
+        batch_size = batch_bytes // (len(picks) * n_times *
+                                     np.dtype(self._dtype).itemsize)
+        batch_size = max(batch_size, 1)
+        batches = [np.arange(first, min(first + batch_size, n_events))
+                   for first in xrange(0, n_events, batch_size)]
+        # read n_jobs batches, then process them in parallel
+        for first in xrange(0, len(batches), n_jobs):
+            group = batches[first:first + n_jobs]
+            group_data = list()
+            for batch in group:
+                batch_good = good[batch]
+                if np.any(batch_good):
+                    data = get_windows(batch[batch_good])
+                    dtype = self._dtype
+                    if is_complex or np.iscomplexobj(data):
+                        dtype = np.result_type(dtype, np.complex64)
+                    if data.dtype != dtype:
+                        data = data.astype(dtype)
+                    group_data.append(data)
+            out = iter(parallel(p_fun(data, proj_vecs, keep_raw,
+                                      preprocessor, self._offset, decim_fir)
+                                for data in group_data))
+            for batch in group:
+                batch_good = good[batch]
+                if np.any(batch_good):
+                    data, data_raw = next(out)
+                ii = 0
+                for idx, is_good in zip(batch, batch_good):
+                    if is_good:
+                        yield [data[ii], data_raw[ii] if keep_raw else None]
+                        ii += 1
+                    else:
+                        # partial or missing data
+                        yield self._get_epoch_from_disk(idx, proj=proj)
+
+    def _read_epochs_file(self, idx):
+        """Read the epochs idx of epochs read with preload=False"""
+        data = self._epochs_file.read(self._file_rows[idx])
+        if len(self.picks) < data.shape[1]:
+            data = data[:, self.picks]
+        return data
+
+    def _get_epochs_from_file(self):
+        """Generate the epochs of epochs read with preload=False"""
+        n_events = len(self._file_rows)
+        epoch_size = (len(self._epochs_file.cals) * len(self.times) *
+                      np.dtype(self._dtype).itemsize)
+        batch_size = max(2 ** 21 // epoch_size, 1)
+        for first in xrange(0, n_events, batch_size):
+            batch = np.arange(first, min(first + batch_size, n_events))
+            for epoch in self._read_epochs_file(batch):
+                yield [epoch, None]
+
+    def _check_epochs_from_disk(self, proj):
+        """Generate the epochs from disk along with their rejection status
+
+        The complete epochs are checked against reject and flat in chunks
+        of up to 16 MB. Yields idx, epoch, epoch_raw, is_good and offenders
+        for all events in order.
+        """
+        n_times = len(self.times)
+        check = self.reject is not None or self.flat is not None
+        chunk = list()
+        for idx, (epoch, epoch_raw) in enumerate(
+                self._get_epochs_from_disk(proj)):
+            batched = (check and epoch is not None and
+                       epoch.shape[1] >= n_times)
+            if batched:
+                chunk.append((idx, epoch, epoch_raw))
+            if len(chunk) > 0 and (not batched or
+                                   len(chunk) * epoch.nbytes >= 2 ** 24):
+                for out in self._check_chunk(chunk):
+                    yield out
+                chunk = list()
+            if not batched:
+                is_good, offenders = self._is_good_epoch(epoch)
+                yield idx, epoch, epoch_raw, is_good, offenders
+        for out in self._check_chunk(chunk):
+            yield out
+
+    def _check_chunk(self, chunk):
+        """Check a list of (idx, epoch, epoch_raw) complete epochs"""
+        if len(chunk) == 0:
+            return
+        good, bad_lists = self._is_good_epochs(np.array([c[1]
+                                                         for c in chunk]))
+        for (idx, epoch, epoch_raw), is_good, offenders in zip(chunk, good,
+                                                               bad_lists):
+            yield idx, epoch, epoch_raw, is_good, offenders
+
+    def _get_preprocessor(self):
+        """The _Preprocessor of these epochs (cached)"""
+        key = (self.detrend, self.baseline, self.decim, self.decim_filter,
+               len(self._raw_times), tuple(self.ch_names))
+        preprocessor = getattr(self, '_preprocessor', None)
+        if preprocessor is None or preprocessor.key != key:
+            detrend_picks = None
+            if self.detrend is not None:
+                detrend_picks = pick_types(self.info, meg=True, eeg=True,
+                                           stim=False, eog=False, ecg=False,
+                                           emg=False, exclude=[])
+            times = self._raw_times
+            decim_idx = self._decim_idx if self.decim > 1 else None
+            if self.decim_filter:
+                # the data are decimated when read
+                times, decim_idx = self.times, None
+            preprocessor = _Preprocessor(key, len(self.ch_names), times,
+                                         self.detrend, detrend_picks,
+                                         self.baseline, decim_idx)
+            self._preprocessor = preprocessor
+        return preprocessor
+
     @verbose
     def _preprocess(self, epoch, verbose=None):
         """ Aux Function
-        """
-        if self.detrend is not None:
-            picks = pick_types(self.info, meg=True, eeg=True, stim=False,
-                               eog=False, ecg=False, emg=False, exclude=[])
-            epoch[picks] = detrend(epoch[picks], self.detrend, axis=1)
-        # Baseline correct
-        epoch = rescale(epoch, self._raw_times, self.baseline, 'mean',
-                        copy=False, verbose=verbose)
 
-        # handle offset
-        if self._offset is not None:
-            epoch += self._offset
-
-        # Decimate
-        if self.decim > 1:
-            epoch = epoch[:, self._decim_idx]
-        return epoch
+        epoch can be a single epoch or an array of epochs.
+        """
+        return self._get_preprocessor()(epoch, self._offset)
 
     @verbose
     def _get_data_from_disk(self, out=True, verbose=None):
@@ -805,16 +1077,17 @@ class Epochs(_BaseEpochs):
         """
         n_events = len(self.events)
         data = np.array([])
+        memmap = self.preload == 'memmap'
         if self._bad_dropped:
             proj = False if self._check_delayed() else self.proj
             if not out:
                 return
-            for ii in xrange(n_events):
+            epochs_iter = self._get_epochs_from_disk(proj)
+            for ii, (epoch, epoch_raw) in enumerate(epochs_iter):
                 # faster to pre-allocate memory here
-                epoch, epoch_raw = self._get_epoch_from_disk(ii, proj=proj)
                 if ii == 0:
-                    data = np.empty((n_events, epoch.shape[0],
-                                     epoch.shape[1]), dtype=epoch.dtype)
+                    data = _alloc_data((n_events, epoch.shape[0],
+                                        epoch.shape[1]), epoch.dtype, memmap)
                 if self._check_delayed():
                     epoch = epoch_raw
                 data[ii] = epoch
@@ -823,9 +1096,8 @@ class Epochs(_BaseEpochs):
             good_events = []
             drop_log = [[] for _ in range(n_events)]
             n_out = 0
-            for idx in xrange(n_events):
-                epoch, epoch_raw = self._get_epoch_from_disk(idx, proj=proj)
-                is_good, offenders = self._is_good_epoch(epoch)
+            epochs_iter = self._check_epochs_from_disk(proj)
+            for idx, epoch, epoch_raw, is_good, offenders in epochs_iter:
                 if is_good:
                     good_events.append(idx)
                     if self._check_delayed():
@@ -833,9 +1105,9 @@ class Epochs(_BaseEpochs):
                     if out:
                         # faster to pre-allocate, then trim as necessary
                         if n_out == 0:
-                            data = np.empty((n_events, epoch.shape[0],
-                                             epoch.shape[1]),
-                                            dtype=epoch.dtype, order='C')
+                            data = _alloc_data((n_events, epoch.shape[0],
+                                                epoch.shape[1]), epoch.dtype,
+                                               memmap)
                         data[n_out] = epoch
                         n_out += 1
                 else:
@@ -851,12 +1123,56 @@ class Epochs(_BaseEpochs):
             # just take the good events
             assert len(good_events) == n_out
             if n_out > 0:
-                # slicing won't free the space, so we resize
-                # we have ensured the C-contiguity of the array in allocation
-                # so this operation will be safe unless np is very broken
-                data.resize((n_out,) + data.shape[1:], refcheck=False)
+                if isinstance(data, np.memmap):
+                    # the pages of dropped epochs are never written
+                    data = data[:n_out]
+                else:
+                    # slicing won't free the space, so we resize
+                    # we have ensured the C-contiguity of the array in
+                    # allocation so this operation will be safe unless np
+                    # is very broken
+                    data.resize((n_out,) + data.shape[1:], refcheck=False)
         return data
 
+    def _get_stats(self):
+        """Compute the mean and squared deviations of each event id
+
+        The epochs of all event ids are read in a single pass and the
+        result is cached, so that the average and standard error of any
+        subset of event ids (e.g., epochs['aud_l'].average()) can be
+        computed without reading the data again.
+        """
+        key = (tuple(self.ch_names), self.proj, repr(self.reject),
+               repr(self.flat), repr(getattr(self, '_reject_time', None)),
+               len(self.times), self.tmin, float(self.times[0]),
+               self.detrend, repr(self.baseline), self.decim,
+               self.decim_filter)
+        key += tuple(None if a is None else a.tostring()
+                     for a in (self._projector, self._offset))
+        stats = getattr(self, '_stats', None)
+        if stats is not None and stats.is_valid(key, self.events):
+            return stats
+
+        stats = _EpochsStats(key)
+        proj = True if self._check_delayed() else self.proj
+        good = np.zeros(len(self.events), dtype=bool)
+
+        def epochs_iter():
+            epochs_iter = self._check_epochs_from_disk(proj)
+            for idx, epoch, epoch_raw, is_good, _ in epochs_iter:
+                if is_good:
+                    good[idx] = True
+                    if self._check_delayed():
+                        epoch = self._preprocess(epoch_raw)
+                    yield epoch, self.events[idx, 2]
+        _update_stats(stats, epochs_iter())
+        for event_id in np.unique(self.events[:, 2]):
+            mask = self.events[:, 2] == event_id
+            stats.events[event_id] = self.events[mask]
+            stats.good_events[event_id] = self.events[mask & good]
+        self._stats = stats
+        return stats
+
     @verbose
     def _is_good_epoch(self, data, verbose=None):
         """Determine if epoch is good"""
@@ -1030,8 +1346,10 @@ class Epochs(_BaseEpochs):
                               " preload=True")
 
         epochs.events = np.atleast_2d(epochs.events[key_match])
+        if epochs._epochs_file is not None:
+            epochs._file_rows = np.atleast_1d(epochs._file_rows[select])
         if epochs.preload:
-            epochs._data = epochs._data[select]
+            epochs._data = _take_data(epochs._data, select)
 
         return epochs
 
@@ -1078,12 +1396,12 @@ class Epochs(_BaseEpochs):
         this_epochs.tmin = this_epochs.times[tidx[0]]
         this_epochs.tmax = this_epochs.times[tidx[-1]]
         this_epochs.times = this_epochs.times[tmask]
-        this_epochs._data = this_epochs._data[:, :, tmask]
+        this_epochs._data = _take_data(this_epochs._data, tmask, axis=2)
         return this_epochs
 
     @verbose
     def resample(self, sfreq, npad=100, window='boxcar', n_jobs=1,
-                 verbose=None):
+                 method='fft', verbose=None):
         """Resample preloaded data
 
         Parameters
@@ -1096,6 +1414,9 @@ class Epochs(_BaseEpochs):
             Window to use in resampling. See scipy.signal.resample.
         n_jobs : int
             Number of jobs to run in parallel.
+        method : str
+            Resampling method, 'fft' or 'polyphase' (uses less memory for
+            long data). See mne.filter.resample.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -1108,7 +1429,7 @@ class Epochs(_BaseEpochs):
         if self.preload:
             o_sfreq = self.info['sfreq']
             self._data = resample(self._data, sfreq, o_sfreq, npad,
-                                  n_jobs=n_jobs)
+                                  n_jobs=n_jobs, method=method)
             # adjust indirectly affected variables
             self.info['sfreq'] = sfreq
             self.times = (np.arange(self._data.shape[2], dtype=np.float)
@@ -1120,9 +1441,17 @@ class Epochs(_BaseEpochs):
         """Return copy of Epochs instance"""
         raw = self.raw
         del self.raw
+        data = getattr(self, '_data', None)
+        memmap = isinstance(data, np.memmap)
+        if memmap:
+            # copy the memmapped data in chunks instead of in memory
+            del self._data
         new = deepcopy(self)
         self.raw = raw
         new.raw = raw
+        if memmap:
+            self._data = data
+            new._data = _take_data(data, slice(None))
 
         return new
 
@@ -1180,6 +1509,8 @@ class Epochs(_BaseEpochs):
 
         data *= decal[np.newaxis, :, np.newaxis]
 
+        # align the data so that single epochs can be read efficiently
+        write_padding(fid, 4096)
         write_float_matrix(fid, FIFF.FIFF_EPOCH, data)
 
         # undo modifications to data
@@ -1557,45 +1888,540 @@ def _is_good(e, ch_names, channel_type_idx, reject, flat, full_report=False,
     defined in reject and flat. If full_report=True, it will give
     True/False as well as a list of all offending channels.
     """
-    bad_list = list()
-    has_printed = False
+    good, bad_lists = _is_good_batch(e[np.newaxis], ch_names,
+                                     channel_type_idx, reject, flat,
+                                     ignore_chs=ignore_chs)
+    if not full_report:
+        return bool(good[0])
+    else:
+        if good[0]:
+            return True, None
+        else:
+            return False, bad_lists[0]
+
+
+@verbose
+def _is_good_batch(data, ch_names, channel_type_idx, reject, flat,
+                   ignore_chs=[], verbose=None):
+    """Test which data segments are good according to reject and flat
+
+    The peak-to-peak amplitudes of all channels of all segments are computed
+    at once and then compared to the thresholds of each channel type.
+
+    Parameters
+    ----------
+    data : array, shape (n_epochs, n_channels, n_times)
+        The data segments.
+    ch_names : list of str
+        The channel names.
+    channel_type_idx : dict
+        The channel indices of each channel type in reject and flat.
+    reject : dict | None
+        The maximum peak-to-peak amplitude of each channel type.
+    flat : dict | None
+        The minimum peak-to-peak amplitude of each channel type.
+    ignore_chs : list of str
+        The channels that are not checked.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+
+    Returns
+    -------
+    good : array of bool, shape (n_epochs,)
+        Whether each segment is good.
+    bad_lists : list
+        For each segment, None if it is good, otherwise the list of the
+        offending channels.
+    """
+    n_epochs = len(data)
     checkable = np.ones(len(ch_names), dtype=bool)
     checkable[np.array([c in ignore_chs
                         for c in ch_names], dtype=bool)] = False
+    good = np.ones(n_epochs, dtype=bool)
+    checks = list()
+    # peak-to-peak amplitudes of all channels, shape (n_epochs, n_channels)
+    deltas = np.max(data, axis=-1) - np.min(data, axis=-1)
     for refl, f, t in zip([reject, flat], [np.greater, np.less], ['', 'flat']):
         if refl is not None:
             for key, thresh in refl.iteritems():
                 idx = channel_type_idx[key]
-                name = key.upper()
                 if len(idx) > 0:
-                    e_idx = e[idx]
-                    deltas = np.max(e_idx, axis=1) - np.min(e_idx, axis=1)
-                    checkable_idx = checkable[idx]
-                    idx_deltas = np.where(np.logical_and(f(deltas, thresh),
-                                                         checkable_idx))[0]
-
-                    if len(idx_deltas) > 0:
-                        ch_name = [ch_names[idx[i]] for i in idx_deltas]
-                        if (not has_printed):
-                            logger.info('    Rejecting %s epoch based on %s : '
-                                        '%s' % (t, name, ch_name))
-                            has_printed = True
-                        if not full_report:
-                            return False
-                        else:
-                            bad_list.extend(ch_name)
+                    bad = np.logical_and(f(deltas[:, idx], thresh),
+                                         checkable[idx])
+                    good &= ~np.any(bad, axis=1)
+                    checks.append((idx, bad, t, key.upper()))
+
+    # only build the lists of offending channels for the bad segments
+    bad_lists = [None] * n_epochs
+    for ii in np.where(~good)[0]:
+        bad_list = list()
+        for idx, bad, t, name in checks:
+            ch_name = [ch_names[idx[i]] for i in np.where(bad[ii])[0]]
+            if len(ch_name) > 0:
+                if len(bad_list) == 0:
+                    logger.info('    Rejecting %s epoch based on %s : '
+                                '%s' % (t, name, ch_name))
+                bad_list.extend(ch_name)
+        bad_lists[ii] = bad_list
+    return good, bad_lists
+
+
+def _check_preload(preload):
+    """Check the preload argument of Epochs and read_epochs"""
+    if isinstance(preload, basestring):
+        if preload != 'memmap':
+            raise ValueError('preload must be a bool or "memmap", got "%s"'
+                             % preload)
+    else:
+        preload = bool(preload)
+    return preload
 
-    if not full_report:
+
+def _alloc_data(shape, dtype, memmap=False):
+    """Allocate the data of preloaded epochs
+
+    If memmap is True, the data are stored in a temporary file in the
+    directory set with mne.set_cache_dir. The file is removed as soon as
+    it is mapped (except on Windows), so that its space is freed when the
+    data are no longer used.
+    """
+    if not memmap or np.prod(shape) == 0:
+        return np.empty(shape, dtype=dtype)
+    cache_dir = get_config('MNE_CACHE_DIR', None)
+    if cache_dir is None:
+        raise ValueError('MNE_CACHE_DIR must be set to store epochs in a '
+                         'memmap, e.g., mne.set_cache_dir(\'/tmp/cache\')')
+    fd, fname = tempfile.mkstemp(prefix='mne_epochs_', suffix='.dat',
+                                 dir=cache_dir)
+    os.close(fd)
+    logger.debug('    Storing epochs data in %s' % fname)
+    data = np.memmap(fname, mode='w+', dtype=dtype, shape=shape)
+    if os.name != 'nt':
+        os.remove(fname)
+    return data
+
+
+def _take_data(data, idx, axis=0):
+    """Index the data of preloaded epochs along one axis
+
+    Data stored in a memmap are copied to a new memmap in chunks of epochs,
+    so that they never have to fit in memory.
+    """
+    if not isinstance(data, np.memmap):
+        return data[(slice(None),) * axis + (idx,)]
+    idx = np.arange(data.shape[axis])[idx]
+    shape = list(data.shape)
+    shape[axis] = len(idx)
+    out = _alloc_data(tuple(shape), data.dtype, memmap=True)
+    epoch_size = np.prod(data.shape[1:]) * data.itemsize
+    n_chunk = max(2 ** 26 // max(epoch_size, 1), 1)
+    for first in xrange(0, len(out), n_chunk):
+        chunk = slice(first, first + n_chunk)
+        if axis == 0:
+            out[chunk] = data[idx[chunk]]
+        else:
+            out[chunk] = data[chunk][(slice(None),) * axis + (idx,)]
+    return out
+
+
+def _std_data(data):
+    """Compute the standard deviation over epochs in chunks of epochs"""
+    if not isinstance(data, np.memmap):
+        return np.std(data, axis=0)
+    mean = np.mean(data, axis=0)
+    n_chunk = max(2 ** 26 // max(mean.nbytes, 1), 1)
+    sq_sum = np.zeros(mean.shape)
+    for first in xrange(0, len(data), n_chunk):
+        sq_sum += np.sum(np.abs(data[first:first + n_chunk] - mean) ** 2,
+                         axis=0)
+    return np.sqrt(sq_sum / len(data))
+
+
+class _EpochsStats(object):
+    """Running mean and sum of squared deviations of epochs per event id
+
+    Chunks of epochs are merged into the running statistics with the
+    pairwise update of Chan et al., a generalization of Welford's
+    algorithm, which is numerically stable and never needs the epochs that
+    were added before.
+
+    Parameters
+    ----------
+    key : tuple | None
+        The processing parameters the statistics are valid for.
+    """
+    def __init__(self, key=None):
+        self.key = key
+        self.n = dict()
+        self.mean = dict()
+        self.m2 = dict()
+        # the events of each event id that were read and that were kept
+        self.events = dict()
+        self.good_events = dict()
+
+    def update(self, data, event_ids):
+        """Add epochs
+
+        Parameters
+        ----------
+        data : array, shape (n_epochs, n_channels, n_times)
+            The epochs.
+        event_ids : array of int, shape (n_epochs,)
+            The event id of each epoch.
+        """
+        event_ids = np.asarray(event_ids)
+        for event_id in np.unique(event_ids):
+            this_data = data[event_ids == event_id]
+            mean = np.mean(this_data, axis=0)
+            m2 = np.sum(np.abs(this_data - mean) ** 2, axis=0)
+            self._merge(event_id, len(this_data), mean, m2)
+
+    def _merge(self, event_id, n, mean, m2):
+        """Merge the statistics of n epochs of an event id"""
+        if event_id not in self.n:
+            self.n[event_id] = n
+            self.mean[event_id] = mean
+            self.m2[event_id] = m2
+            return
+        n_old = self.n[event_id]
+        n_new = n_old + n
+        delta = mean - self.mean[event_id]
+        self.mean[event_id] = self.mean[event_id] + delta * (float(n) / n_new)
+        self.m2[event_id] = (self.m2[event_id] + m2 + np.abs(delta) ** 2 *
+                             (float(n_old) * n / n_new))
+        self.n[event_id] = n_new
+
+    def combine(self, event_ids):
+        """Get the statistics of all epochs of some event ids
+
+        Returns
+        -------
+        n : int
+            The number of epochs.
+        mean : array | None
+            The mean of the epochs (None if n is 0).
+        m2 : array | None
+            The sum of squared deviations from the mean (None if n is 0).
+        """
+        out = _EpochsStats()
+        for event_id in event_ids:
+            if event_id in self.n:
+                out._merge(0, self.n[event_id], self.mean[event_id],
+                           self.m2[event_id])
+        return out.n.get(0, 0), out.mean.get(0), out.m2.get(0)
+
+    def is_valid(self, key, events):
+        """Check if the statistics apply to epochs
+
+        They do if the processing parameters are the same and the events of
+        each event id are the ones that were read or kept.
+        """
+        if key != self.key:
+            return False
+        for event_id in np.unique(events[:, 2]):
+            this_events = events[events[:, 2] == event_id]
+            if not (np.array_equal(this_events,
+                                   self.events.get(event_id)) or
+                    np.array_equal(this_events,
+                                   self.good_events.get(event_id))):
+                return False
         return True
-    else:
-        if bad_list == []:
-            return True, None
+
+
+def _update_stats(stats, epochs_iter):
+    """Add (epoch, event_id) pairs to stats in chunks of up to 16 MB"""
+    chunk, chunk_ids = list(), list()
+    for epoch, event_id in epochs_iter:
+        chunk.append(epoch)
+        chunk_ids.append(event_id)
+        if len(chunk) * epoch.nbytes >= 2 ** 24:
+            stats.update(np.array(chunk), chunk_ids)
+            chunk, chunk_ids = list(), list()
+    if len(chunk) > 0:
+        stats.update(np.array(chunk), chunk_ids)
+    return stats
+
+
+class _SpanReader(object):
+    """Read epoch windows from non-preloaded raw data through merged spans
+
+    Following the order of the events, each window that overlaps or is
+    adjacent to the current span is merged into it, as long as the span
+    does not exceed max_size bytes. Each span is read from disk with a
+    single call and kept until a window outside of it is requested, so
+    that with chronological events every sample is read only once. Events
+    that are not in chronological order are read in smaller spans instead
+    of re-reading large ones.
+
+    Parameters
+    ----------
+    raw : instance of Raw
+        The raw data (not preloaded).
+    picks : array of int
+        The channels to read.
+    starts : array of int
+        The first sample of each window, relative to raw.first_samp.
+    good : array of bool
+        The windows that lie entirely within the raw data.
+    n_times : int
+        The number of samples of each window.
+    max_size : int
+        The maximum size of a span in bytes (at least one window is always
+        read at once).
+    """
+    def __init__(self, raw, picks, starts, good, n_times, max_size=2 ** 26):
+        self.raw = raw
+        self.picks = picks
+        self.starts = starts
+        self.n_times = n_times
+        max_len = max(max_size // (8 * len(picks)), n_times)
+
+        # plan the spans
+        self.span_idx = np.empty(len(starts), dtype=np.int64)
+        self.span_idx.fill(-1)
+        spans = list()
+        for idx in np.where(good)[0]:
+            start, stop = starts[idx], starts[idx] + n_times
+            if len(spans) > 0:
+                span_start = min(spans[-1][0], start)
+                span_stop = max(spans[-1][1], stop)
+                if (start <= spans[-1][1] and stop >= spans[-1][0] and
+                        span_stop - span_start <= max_len):
+                    spans[-1] = [span_start, span_stop]
+                    self.span_idx[idx] = len(spans) - 1
+                    continue
+            spans.append([start, stop])
+            self.span_idx[idx] = len(spans) - 1
+        self.spans = spans
+        logger.debug('    Reading %d epochs in %d spans'
+                     % (np.sum(good), len(spans)))
+        self._span = None
+        self._data = None
+
+    def _read_span(self, span):
+        """Read a span unless it is the current one"""
+        if span != self._span:
+            start, stop = self.spans[span]
+            self._data, _ = self.raw[self.picks, start:stop]
+            self._span = span
+        return self._data, self.spans[span][0]
+
+    def __call__(self, idx):
+        """Get the windows of the events idx as (n_channels, n_epochs, n_times)
+        """
+        out = None
+        for ii, this_idx in enumerate(idx):
+            data, offset = self._read_span(self.span_idx[this_idx])
+            if out is None:
+                out = np.empty((len(self.picks), len(idx), self.n_times),
+                               dtype=data.dtype)
+            start = self.starts[this_idx] - offset
+            out[:, ii] = data[:, start:start + self.n_times]
+        return out
+
+
+def _read_epochs_data(fid, pos, nsamp, cals, dtype, rlims=None):
+    """Read and calibrate the epochs (rlims[0] to rlims[1]) of a tag"""
+    data = read_tag(fid, pos, rlims=rlims).data
+    if data.shape[2] != nsamp:
+        fid.close()
+        raise ValueError('Incorrect number of samples (%d instead of %d)'
+                         % (data.shape[2], nsamp))
+    if data.dtype != dtype:
+        data = data.astype(dtype)
+    data *= cals[np.newaxis, :, np.newaxis]
+    return data
+
+
+class _Preprocessor(object):
+    """Detrend, baseline correct, offset and decimate epochs in one pass
+
+    Detrending and baseline correction (with mode 'mean') both subtract
+    from each channel a combination of a few time courses whose weights
+    are linear in the data. Together they amount to
+
+        y = x - (x A) B
+
+    with x of shape (n_channels, n_times), A of shape (n_times, k) and B of
+    shape (k, n_times), where k is at most 3. A and B are computed once, and
+    only the decimated time points of y are computed.
+
+    Parameters
+    ----------
+    key : tuple
+        The parameters of the epochs used to make the preprocessor.
+    n_channels : int
+        The number of channels of the epochs.
+    times : array
+        The time points of the epochs before decimation.
+    detrend_order : None | 0 | 1
+        The order of the detrending.
+    detrend_picks : array of int | None
+        The channels to detrend.
+    baseline : None | tuple of length 2
+        The baseline interval (see mne.baseline.rescale).
+    decim_idx : slice | None
+        The time points kept after decimation.
+    """
+    def __init__(self, key, n_channels, times, detrend_order, detrend_picks,
+                 baseline, decim_idx):
+        self.key = key
+        self.baseline = baseline
+        self.decim_idx = slice(None) if decim_idx is None else decim_idx
+        self.n_times = n_times = len(times)
+        if baseline is not None:
+            imin, imax = _baseline_idx(times, baseline)
+            weights = np.zeros((n_times, 1))
+            weights[imin:imax] = 1. / (imax - imin)
+        # the corrections, as (channels, A, B) with channels None for all
+        self.corrections = list()
+        if detrend_order is not None and len(detrend_picks) > 0:
+            # orthonormal basis of the polynomials of degree detrend_order
+            design = np.vander(np.arange(n_times, dtype=np.float),
+                               detrend_order + 1)
+            basis = linalg.qr(design, mode='economic')[0]
+            A = basis
+            B = basis.T
+            if baseline is not None:
+                # baseline of the detrended data
+                weights_d = weights - np.dot(basis, np.dot(basis.T, weights))
+                A = np.c_[A, weights_d]
+                B = np.r_[B, np.ones((1, n_times))]
+            picks = np.unique(detrend_picks)
+            if len(picks) == n_channels:
+                picks = None
+            self.corrections.append((picks, A, B))
+            if picks is not None and baseline is not None:
+                others = np.setdiff1d(np.arange(n_channels), picks)
+                self.corrections.append((others, weights,
+                                         np.ones((1, n_times))))
+        elif baseline is not None:
+            self.corrections.append((None, weights, np.ones((1, n_times))))
+        for ii, (picks, A, B) in enumerate(self.corrections):
+            self.corrections[ii] = (picks, A, B[:, self.decim_idx])
+
+    @verbose
+    def __call__(self, epoch, offset=None, verbose=None):
+        """Preprocess epoch in place and return the decimated result
+
+        epoch can be a single epoch or an array of epochs.
+        """
+        if self.baseline is not None:
+            logger.info("Applying baseline correction ... (mode: mean)")
+        else:
+            logger.info("No baseline correction applied...")
+        if epoch.shape[-1] != self.n_times:
+            # epoch cut at the end of the data, which is dropped as too
+            # short, so that the corrections do not apply
+            return epoch[..., self.decim_idx]
+        out = epoch[..., self.decim_idx]
+        dtype = epoch.real.dtype
+        for picks, A, B in self.corrections:
+            A, B = A.astype(dtype), B.astype(dtype)
+            if picks is None:
+                out -= np.dot(np.dot(epoch, A), B)
+            else:
+                x = epoch[..., picks, :]
+                out[..., picks, :] -= np.dot(np.dot(x, A), B)
+        # handle offset
+        if offset is not None:
+            out += offset
+        return out
+
+
+def _process_epochs(data, proj_vecs, keep_raw, preprocessor, offset,
+                    decim_fir=None):
+    """Project and preprocess a batch of epochs (used with parallel_func)
+
+    Parameters
+    ----------
+    data : array, shape (n_channels, n_epochs, n_times)
+        The epochs read from raw.
+    proj_vecs : array | None
+        The projection vectors of the SSP operator to apply (see _project).
+    keep_raw : bool
+        Also return the epochs before projection and preprocessing.
+    preprocessor : instance of _Preprocessor
+        The preprocessing to apply.
+    offset : array | None
+        The offset to add after preprocessing.
+    decim_fir : tuple | None
+        The filter, first sample and decimation factor to first decimate
+        the data with (see _fir_decimate).
+
+    Returns
+    -------
+    data : array, shape (n_epochs, n_channels, n_times)
+        The projected and preprocessed epochs.
+    data_raw : array, shape (n_epochs, n_channels, n_times) | None
+        The epochs before projection and preprocessing, if keep_raw.
+    """
+    if decim_fir is not None:
+        data = _fir_decimate(data, *decim_fir)
+    data_raw = data.transpose(1, 0, 2).copy() if keep_raw else None
+    if proj_vecs is not None:
+        data = _project(proj_vecs, data)
+    elif not data.flags.writeable:
+        # memmapped by joblib, and preprocessed in place below
+        data = data.copy()
+    data = preprocessor(data.transpose(1, 0, 2), offset)
+    return data, data_raw
+
+
+class _EpochsFile(object):
+    """Read single epochs from the data tag of an epochs fif file
+
+    The epochs are stored row-major with a fixed number of channels and
+    time points, so that the epochs are read by position without decoding
+    the whole tag. Consecutive epochs are read with a single call.
+
+    Parameters
+    ----------
+    fname : str
+        The name of the file.
+    pos : int
+        The position of the FIFF_EPOCH tag in the file.
+    nsamp : int
+        The number of time points of each epoch.
+    cals : array
+        The calibration factors of the channels.
+    dtype : numpy dtype
+        Floating point type of the epochs data.
+    """
+    def __init__(self, fname, pos, nsamp, cals, dtype):
+        self.fname = fname
+        self.pos = pos
+        self.nsamp = nsamp
+        self.cals = cals
+        self.dtype = dtype
+
+    def read(self, rows):
+        """Read and calibrate the epochs at rows (in the file)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        data = np.empty((len(rows), len(self.cals), self.nsamp), self.dtype)
+        if len(rows) == 0:
+            return data
+        order = np.argsort(rows, kind='mergesort')
+        sorted_rows = rows[order]
+        # runs of consecutive (or repeated) rows
+        breaks = np.where(np.diff(sorted_rows) > 1)[0] + 1
+        if os.path.splitext(self.fname)[1].lower() == '.gz':
+            fid = gzip.open(self.fname, 'rb')
         else:
-            return False, bad_list
+            fid = open(self.fname, 'rb')
+        with fid:
+            for run in np.split(np.arange(len(rows)), breaks):
+                start, stop = sorted_rows[run[0]], sorted_rows[run[-1]] + 1
+                run_data = _read_epochs_data(fid, self.pos, self.nsamp,
+                                             self.cals, self.dtype,
+                                             rlims=(start, stop))
+                data[order[run]] = run_data[sorted_rows[run] - start]
+        return data
 
 
 @verbose
-def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
+def read_epochs(fname, proj=True, add_eeg_ref=True, dtype=np.float32,
+                preload=True, verbose=None):
     """Read epochs from a fif file
 
     Parameters
@@ -1616,6 +2442,15 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
     add_eeg_ref : bool
         If True, an EEG average reference will be added (unless one
         already exists).
+    dtype : numpy dtype
+        Floating point type of the epochs data, either np.float32 (default,
+        the precision of the data in the file) or np.float64.
+    preload : bool | 'memmap'
+        If 'memmap', the data are read in chunks of epochs into a np.memmap
+        in the directory set with mne.set_cache_dir, so that they do not
+        need to fit in memory. If False, the data are not read, and only
+        the epochs that are used (e.g., after selecting a condition with
+        epochs['name']) are read from the file when needed.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
         Defaults to raw.verbose.
@@ -1625,6 +2460,8 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
     epochs : instance of Epochs
         The epochs
     """
+    dtype = _check_dtype(dtype)
+    preload = _check_preload(preload)
     epochs = Epochs(None, None, None, None, None)
 
     logger.info('Reading %s ...' % fname)
@@ -1651,7 +2488,7 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
 
     # Now find the data in the block
     comment = None
-    data = None
+    data_pos = None
     bmin, bmax = None, None
     baseline = None
     for k in range(my_epochs['nent']):
@@ -1667,8 +2504,7 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
             tag = read_tag(fid, pos)
             comment = tag.data
         elif kind == FIFF.FIFF_EPOCH:
-            tag = read_tag(fid, pos)
-            data = tag.data
+            data_pos = pos
         elif kind == FIFF.FIFF_MNE_BASELINE_MIN:
             tag = read_tag(fid, pos)
             bmin = float(tag.data)
@@ -1689,25 +2525,35 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
                     % len(info['comps']))
 
     # Read the data
-    if data is None:
+    if data_pos is None:
         raise ValueError('Epochs data not found')
 
-    if data.shape[2] != nsamp:
-        fid.close()
-        raise ValueError('Incorrect number of samples (%d instead of %d)'
-                         % (data.shape[2], nsamp))
-
-    # Calibrate
     cals = np.array([info['chs'][k]['cal'] * info['chs'][k].get('scale', 1.0)
                      for k in range(info['nchan'])])
-    data *= cals[np.newaxis, :, np.newaxis]
+    epochs_file = None
+    if not preload:
+        # the epochs are read from the file when needed
+        data = None
+        epochs_file = _EpochsFile(fname, data_pos, nsamp, cals, dtype)
+    elif preload == 'memmap':
+        # read and calibrate the data in chunks of epochs
+        n_epochs = len(events)
+        n_chunk = max(2 ** 26 // (8 * info['nchan'] * nsamp), 1)
+        data = _alloc_data((n_epochs, info['nchan'], nsamp), dtype,
+                           memmap=True)
+        for start in xrange(0, n_epochs, n_chunk):
+            stop = min(start + n_chunk, n_epochs)
+            data[start:stop] = _read_epochs_data(fid, data_pos, nsamp, cals,
+                                                 dtype, rlims=(start, stop))
+    else:
+        data = _read_epochs_data(fid, data_pos, nsamp, cals, dtype)
 
     times = np.arange(first, last + 1, dtype=np.float) / info['sfreq']
     tmin = times[0]
     tmax = times[-1]
 
     # Put it all together
-    epochs.preload = True
+    epochs.preload = preload
     epochs.raw = None
     epochs._bad_dropped = True
     epochs.events = events
@@ -1718,10 +2564,29 @@ def read_epochs(fname, proj=True, add_eeg_ref=True, verbose=None):
     epochs.name = comment
     epochs.times = times
     epochs._data = data
+    epochs._dtype = dtype
+    epochs._n_jobs = 1
+    epochs._epochs_file = epochs_file
+    if epochs_file is not None:
+        epochs._file_rows = np.arange(len(events))
+    # the data are stored preprocessed
+    epochs.picks = np.arange(info['nchan'])
+    epochs.reject = epochs.flat = None
+    epochs.reject_tmin = epochs.reject_tmax = None
+    epochs._reject_time = None
+    epochs.detrend = None
+    epochs.decim = 1
+    epochs.decim_filter = False
+    epochs._decim_fir = None
+    epochs._raw_times = times
+    epochs._epoch_stop = len(times)
+    epochs._offset = None
+    epochs._stats = None
     epochs.proj = proj
     activate = False if epochs._check_delayed() else proj
     epochs._projector, epochs.info = setup_proj(info, add_eeg_ref,
                                                 activate=activate)
+    epochs._proj_vecs = _projector_vecs(epochs.info)
 
     epochs.baseline = baseline
     epochs.event_id = (dict((str(e), e) for e in np.unique(events[:, 2]))
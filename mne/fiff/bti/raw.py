@@ -1151,6 +1151,9 @@ class RawBTi(Raw):
         self.comp = None
         self.fids = list()
         self._preloaded = True
+        self._mmap = False
+        self._n_jobs = 1
+        self._dtype = np.float64
         self._projector_hashes = [None]
         self.info = info
 
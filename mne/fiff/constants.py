@@ -483,6 +483,10 @@ FIFF.FIFF_MNE_ICA_MATRIX            = 3607     # ICA unmixing matrix
 FIFF.FIFF_MNE_ICA_BADS              = 3608     # ICA bad sources
 FIFF.FIFF_MNE_ICA_MISC_PARAMS       = 3609     # ICA misc params
 #
+# 3620... compressed data (mne-python only)
+#
+FIFF.FIFF_MNE_COMPRESSED_DATA_BUFFER = 3620    # A zlib-compressed FIFF_DATA_BUFFER
+#
 # Fiff values associated with MNE computations
 #
 FIFF.FIFFV_MNE_UNKNOWN_ORI          = 0
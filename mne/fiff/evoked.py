@@ -542,7 +542,7 @@ class Evoked(ProjMixin):
 
         return df
 
-    def resample(self, sfreq, npad=100, window='boxcar'):
+    def resample(self, sfreq, npad=100, window='boxcar', method='fft'):
         """Resample data
 
         This function operates in-place.
@@ -555,9 +555,13 @@ class Evoked(ProjMixin):
             Amount to pad the start and end of the data.
         window : string or tuple
             Window to use in resampling. See scipy.signal.resample.
+        method : str
+            Resampling method, 'fft' or 'polyphase' (uses less memory for
+            long data). See mne.filter.resample.
         """
         o_sfreq = self.info['sfreq']
-        self.data = resample(self.data, sfreq, o_sfreq, npad, window)
+        self.data = resample(self.data, sfreq, o_sfreq, npad, window,
+                             method=method)
         # adjust indirectly affected variables
         self.info['sfreq'] = sfreq
         self.times = (np.arange(self.data.shape[1], dtype=np.float) / sfreq
@@ -21,7 +21,7 @@ from ...coreg import fit_matched_points, _decimate_points
 from ...coreg import get_ras_to_neuromag_trans
 from ...utils import verbose, logger
 from ...transforms import apply_trans, als_ras_trans, als_ras_trans_mm
-from ..raw import Raw
+from ..raw import Raw, _allocate_data
 from ..constants import FIFF
 from ..meas_info import Info
 from .constants import KIT, KIT_NY, KIT_AD
@@ -88,6 +88,10 @@ class RawKIT(Raw):
         self.last_samp = self._sqd_params['nsamples'] - 1
         self.comp = None  # no compensation for KIT
         self.proj = False
+        # used to read the data once they are filtered into a fif file
+        self._mmap = False
+        self._n_jobs = 1
+        self._dtype = np.float64
 
         # Create raw.info dict for raw fif object with SQD data
         self.info = Info()
@@ -264,8 +268,8 @@ class RawKIT(Raw):
 
         return stim_ch
 
-    def _read_segment(self, start=0, stop=None, sel=None, verbose=None,
-                      projector=None):
+    def _read_segment(self, start=0, stop=None, sel=None, data_buffer=None,
+                      verbose=None, proj_vecs=None):
         """Read a chunk of raw data
 
         Parameters
@@ -278,8 +282,13 @@ class RawKIT(Raw):
             If omitted, data is included to the end.
         sel : array, optional
             Indices of channels to select.
-        projector : array
-            SSP operator to apply to the data.
+        data_buffer : array or str, optional
+            numpy array to fill with data read, must have the correct shape.
+            If str, a np.memmap with the correct data type will be used
+            to store the data.
+        proj_vecs : array | None
+            The orthogonal basis U of the SSP operator I - U U' to apply to
+            the data.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
 
@@ -290,11 +299,16 @@ class RawKIT(Raw):
         times : array, [samples]
             returns the time values corresponding to the samples.
         """
+        if len(self.fids) > 0:
+            # the data have been filtered into a fif file (see Raw.filter)
+            return super(RawKIT, self)._read_segment(start, stop, sel,
+                                                     data_buffer, verbose,
+                                                     proj_vecs)
         if sel is None:
             sel = range(self.info['nchan'])
         elif len(sel) == 1 and sel[0] == 0 and start == 0 and stop == 1:
             return (666, 666)
-        if projector is not None:
+        if proj_vecs is not None:
             raise NotImplementedError('Currently does not handle projections.')
         if stop is None:
             stop = self.last_samp + 1
@@ -348,6 +362,15 @@ class RawKIT(Raw):
         stim_ch = np.array(trig_chs.sum(axis=0), ndmin=2)
         data = np.vstack((data, stim_ch))
         data = data[sel]
+        if data_buffer is not None:
+            if isinstance(data_buffer, np.ndarray):
+                if data_buffer.shape != data.shape:
+                    raise ValueError('data_buffer has incorrect shape')
+            else:
+                data_buffer = _allocate_data(None, data_buffer, data.shape,
+                                             data.dtype)
+            data_buffer[:] = data
+            data = data_buffer
 
         logger.info('[done]')
         times = np.arange(start, stop) / self.info['sfreq']
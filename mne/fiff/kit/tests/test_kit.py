@@ -7,9 +7,11 @@
 import os.path as op
 import inspect
 import numpy as np
-from numpy.testing import assert_array_almost_equal, assert_array_equal
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_allclose)
 import scipy.io
 from mne.utils import _TempDir
+from mne import compute_raw_data_covariance
 from mne.fiff import Raw, pick_types
 from mne.fiff.kit import read_raw_kit, read_hsp, write_hsp
 from mne.fiff.kit.coreg import read_sns
@@ -72,6 +74,40 @@ def test_read_segment():
     assert_array_almost_equal(raw1._data, raw3._data)
 
 
+def test_iter_chunks():
+    """Test iterating over chunks of raw kit data when preload is False
+    """
+    raw = read_raw_kit(sqd_path, mrk_path, elp_path, hsp_path, stim='<',
+                       preload=False)
+    raw_pre = read_raw_kit(sqd_path, mrk_path, elp_path, hsp_path, stim='<',
+                           preload=True)
+    picks = pick_types(raw.info, meg=True, exclude='bads')[:20]
+    for data, times, start in raw.iter_chunks(0.1, picks=picks):
+        n_times = data.shape[1]
+        assert_array_almost_equal(data, raw_pre[picks,
+                                                start:start + n_times][0])
+    cov = compute_raw_data_covariance(raw, picks=picks)
+    cov_pre = compute_raw_data_covariance(raw_pre, picks=picks)
+    assert_array_almost_equal(cov.data, cov_pre.data)
+
+
+def test_filter():
+    """Test filtering raw kit data into a file when preload is False
+    """
+    raw = read_raw_kit(sqd_path, mrk_path, elp_path, hsp_path, stim='<',
+                       preload=False)
+    raw_pre = read_raw_kit(sqd_path, mrk_path, elp_path, hsp_path, stim='<',
+                           preload=True)
+    fname = op.join(tempdir, 'raw_filt.fif')
+    raw.filter(None, 40., filter_length='1s', h_trans_bandwidth=10.,
+               fname=fname)
+    raw_pre.filter(None, 40., filter_length='1s', h_trans_bandwidth=10.)
+    picks = pick_types(raw.info, meg=True, exclude='bads')
+    data = raw[picks, :][0]
+    assert_allclose(data, raw_pre[picks, :][0], rtol=1e-6,
+                    atol=1e-6 * np.abs(data).max())
+
+
 def test_ch_loc():
     """Test raw kit loc
     """
@@ -4,14 +4,16 @@
 # License: BSD (3-clause)
 
 import numpy as np
+import os
 import os.path as op
 import gzip
 import cStringIO
 
 from .tag import read_tag_info, read_tag, read_big, Tag
-from .tree import make_dir_tree
+from .tree import make_dir_tree, _flatten_dir_tree, _unflatten_dir_tree
+from .tree import _id_to_array
 from .constants import FIFF
-from ..utils import logger, verbose
+from ..utils import logger, verbose, get_config
 
 
 @verbose
@@ -38,6 +40,14 @@ def fiff_open(fname, preload=False, verbose=None):
         lists and tags.
     directory : list
         list of nodes.
+
+    Notes
+    -----
+    If the config value MNE_USE_FIF_INDEX_CACHE is 'true', the directory
+    and tree of files opened by name are stored in a hidden sidecar index
+    file next to the FIF file (if that location is writable), and reused
+    as long as the size, modification time and file id of the FIF file
+    are unchanged.
     """
     if isinstance(fname, basestring):
         if op.splitext(fname)[1].lower() == '.gz':
@@ -75,6 +85,19 @@ def fiff_open(fname, preload=False, verbose=None):
     if tag.kind != FIFF.FIFF_DIR_POINTER:
         raise ValueError('file does not have a directory pointer')
 
+    #   Use the index of a previous opening if available
+    use_index = (isinstance(fname, basestring) and
+                 get_config('MNE_USE_FIF_INDEX_CACHE',
+                            'false').lower() == 'true')
+    if use_index:
+        file_id = read_tag(fid, 0).data
+        out = _read_index(fname, file_id)
+        if out is not None:
+            logger.debug('    Using tag directory index for %s' % fname)
+            tree, directory = out
+            fid.seek(0)
+            return fid, tree, directory
+
     #   Read or create the directory tree
     logger.debug('    Creating tag directory for %s...' % fname)
 
@@ -96,6 +119,9 @@ def fiff_open(fname, preload=False, verbose=None):
 
     tree, _ = make_dir_tree(fid, directory)
 
+    if use_index:
+        _write_index(fname, file_id, tree, directory)
+
     logger.debug('[done]')
 
     #   Back to the beginning
@@ -104,6 +130,71 @@ def fiff_open(fname, preload=False, verbose=None):
     return fid, tree, directory
 
 
+_index_version = 1
+
+
+def _index_fname(fname):
+    """Get the name of the sidecar index file of a FIF file"""
+    path, base = op.split(op.abspath(fname))
+    return op.join(path, '.%s.idx' % base)
+
+
+def _index_key(fname, file_id):
+    """Get the values identifying a FIF file for its index"""
+    stat = os.stat(fname)
+    return dict(index_version=np.array(_index_version),
+                file_size=np.array(stat.st_size, dtype=np.int64),
+                file_mtime=np.array(stat.st_mtime, dtype=np.float64),
+                file_id=_id_to_array(file_id))
+
+
+def _read_index(fname, file_id):
+    """Read the directory and tree of a FIF file from its sidecar index
+
+    Returns None if there is no index or if it is out of date.
+    """
+    index_fname = _index_fname(fname)
+    if not op.isfile(index_fname):
+        return None
+    try:
+        key = _index_key(fname, file_id)
+        arrays = np.load(index_fname)
+        try:
+            arrays = dict((k, arrays[k]) for k in arrays.files)
+        finally:
+            arrays.close()
+        for k, v in key.iteritems():
+            if not np.array_equal(arrays[k], v):
+                logger.debug('    Tag directory index is out of date')
+                return None
+        return _unflatten_dir_tree(arrays)
+    except Exception as exp:
+        logger.debug('    Could not read tag directory index (%s)' % exp)
+        return None
+
+
+def _write_index(fname, file_id, tree, directory):
+    """Write the directory and tree of a FIF file to its sidecar index
+
+    Nothing is written if the location is not writable.
+    """
+    index_fname = _index_fname(fname)
+    tmp_fname = '%s.%d.tmp' % (index_fname, os.getpid())
+    try:
+        arrays = _flatten_dir_tree(tree, directory)
+        arrays.update(_index_key(fname, file_id))
+        with open(tmp_fname, 'wb') as fid:
+            np.savez(fid, **arrays)
+        # replace atomically so concurrent readers never see partial files
+        if os.name == 'nt' and op.isfile(index_fname):
+            os.remove(index_fname)
+        os.rename(tmp_fname, index_fname)
+    except (IOError, OSError) as exp:
+        logger.debug('    Could not write tag directory index (%s)' % exp)
+        if op.isfile(tmp_fname):
+            os.remove(tmp_fname)
+
+
 def show_fiff(fname, indent='    ', read_limit=np.inf, max_str=30,
               output=str, verbose=None):
     """Show FIFF information
@@ -114,6 +114,7 @@ class ProjMixin(object):
             return self
 
         self._projector, self.info = _projector, info
+        self._proj_vecs = proj_vecs = _projector_vecs(info)
         self.proj = True  # track that proj were applied
         # handle different data / preload attrs and create reference
         # this also helps avoiding circular imports
@@ -125,12 +126,13 @@ class ProjMixin(object):
                 if self.preload:
                     data = np.empty_like(self._data)
                     for ii, e in enumerate(self._data):
-                        data[ii] = self._preprocess(np.dot(self._projector, e),
-                            self.verbose)
+                        data[ii] = self._preprocess(_project(proj_vecs, e),
+                                                    self.verbose)
                 else:  # get data knows what to do.
                     data = data()
             else:
-                data = np.dot(self._projector, data)
+                # keep the floating point precision of the data
+                data = _project(proj_vecs, data)
             break
         logger.info('SSP projectors applied...')
         if hasattr(self, '_data'):
@@ -335,6 +337,23 @@ def write_proj(fid, projs):
 ###############################################################################
 # Utils
 
+# SSP operators computed by make_projector, see _projector_key
+_projector_cache = dict()
+_projector_keys = list()  # least recently used first
+_projector_cache_size = 32
+
+
+def _projector_key(projs, ch_names, bads, include_active):
+    """The key of the projector made from projs in _projector_cache"""
+    key = [tuple(ch_names), tuple(bads), include_active]
+    for p in projs:
+        # the active state only matters if active projs are excluded
+        key.append((None if include_active else p['active'],
+                    tuple(p['data']['col_names']),
+                    np.asarray(p['data']['data']).tostring()))
+    return tuple(key)
+
+
 def make_projector(projs, ch_names, bads=[], include_active=True):
     """Create an SSP operator from SSP projection vectors
 
@@ -360,16 +379,39 @@ def make_projector(projs, ch_names, bads=[], include_active=True):
         How many items in the projector.
     U : array
         The orthogonal basis of the projection vectors (optional).
+
+    Notes
+    -----
+    The results of the most recent calls are cached, so that making the
+    same projector again (e.g., for each Epochs created from a Raw) does
+    not need to compute it again.
     """
     nchan = len(ch_names)
     if nchan == 0:
         raise ValueError('No channel names specified')
 
-    default_return = (np.eye(nchan, nchan), 0, [])
-
     #   Check trivial cases first
     if projs is None:
-        return default_return
+        return np.eye(nchan, nchan), 0, []
+
+    key = _projector_key(projs, ch_names, bads, include_active)
+    if key in _projector_cache:
+        _projector_keys.remove(key)
+    else:
+        if len(_projector_keys) >= _projector_cache_size:
+            del _projector_cache[_projector_keys.pop(0)]
+        _projector_cache[key] = _make_projector(projs, ch_names, bads,
+                                                include_active)
+    _projector_keys.append(key)
+    proj, nproj, U = _projector_cache[key]
+    # the caller may modify the arrays
+    return proj.copy(), nproj, U.copy() if nproj > 0 else []
+
+
+def _make_projector(projs, ch_names, bads, include_active):
+    """Create an SSP operator (see make_projector)"""
+    nchan = len(ch_names)
+    default_return = (np.eye(nchan, nchan), 0, [])
 
     nvec = 0
     nproj = 0
@@ -456,6 +498,32 @@ def make_projector_info(info, include_active=True):
     return proj, nproj
 
 
+def _projector_vecs(info):
+    """The orthogonal basis U of the SSP operator I - U U' of info
+
+    Returns None if there are no projection vectors. The operator is
+    applied with _project.
+    """
+    _, nproj, U = make_projector(info['projs'], info['ch_names'],
+                                 info['bads'])
+    return U if nproj > 0 else None
+
+
+def _project(proj_vecs, data):
+    """Apply the SSP operator I - U U', with U = proj_vecs, to data
+
+    The channels are along the first axis of data. With k projection
+    vectors and n channels, the two products with the thin matrix U take
+    2 k / n of the operations of a product with the dense operator.
+    """
+    U = proj_vecs.astype(data.real.dtype)
+    shape = data.shape
+    data = data.reshape(shape[0], -1)
+    data = data - np.dot(U, np.dot(U.T, data))
+    data.shape = shape
+    return data
+
+
 @verbose
 def activate_proj(projs, copy=True, verbose=None):
     """Set all projections to active
@@ -11,6 +11,10 @@ from copy import deepcopy
 import warnings
 import os
 import os.path as op
+import sys
+import threading
+import Queue
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 from scipy.signal import hilbert
@@ -20,15 +24,18 @@ from .constants import FIFF
 from .open import fiff_open
 from .meas_info import read_meas_info, write_meas_info
 from .tree import dir_tree_find
-from .tag import read_tag
+from .tag import read_tag, _read_uncompressed_size
 from .pick import pick_types, channel_type
 from .proj import (setup_proj, activate_proj, proj_equal, ProjMixin,
-                   _has_eeg_average_ref_proj, make_eeg_average_ref_proj)
+                   _has_eeg_average_ref_proj, make_eeg_average_ref_proj,
+                   _projector_vecs)
 from .compensator import get_current_comp, make_compensator
 
 from ..filter import (low_pass_filter, high_pass_filter, band_pass_filter,
-                      notch_filter, band_stop_filter, resample)
-from ..parallel import parallel_func
+                      notch_filter, band_stop_filter, resample,
+                      _get_filter_length, _filter, _fir_gains, _notch_bands,
+                      _get_overlap_add_design, _overlap_add_blocks)
+from ..parallel import parallel_func, check_n_jobs
 from ..utils import (_check_fname, estimate_rank, _check_pandas_installed,
                      logger, verbose)
 from ..viz import plot_raw, plot_raw_psds, _mutable_defaults
@@ -66,6 +73,25 @@ class Raw(ProjMixin):
     add_eeg_ref : bool
         If True, add average EEG reference projector (if it's not already
         present).
+    mmap : bool
+        If True, data buffers of uncompressed files are accessed through
+        read-only memory-mapped views of the files instead of being read
+        and converted buffer by buffer. Calibration is then only applied
+        to the samples and channels that are requested, which makes
+        random access to short segments (e.g., epochs) of long recordings
+        much cheaper. Compressed (.fif.gz) files are read as usual.
+    n_jobs : int
+        Number of threads used to read the data when several files are
+        given (e.g., the continuation files of a split recording). Each
+        file is opened and read by its own thread, which is mostly useful
+        for files on high-latency (e.g., network) file systems. Applies to
+        preloading as well as to later reads of data segments that span
+        several files.
+    dtype : numpy dtype
+        Floating point type of the data once read and calibrated, either
+        np.float64 (default) or np.float32. Using np.float32 halves the
+        memory needed to preload the data, at the cost of precision.
+        Complex data are represented with the matching complex type.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -83,15 +109,17 @@ class Raw(ProjMixin):
     @verbose
     def __init__(self, fnames, allow_maxshield=False, preload=False,
                  proj=False, compensation=None, add_eeg_ref=True,
-                 verbose=None):
+                 mmap=False, n_jobs=1, dtype=np.float64, verbose=None):
 
+        dtype = _check_dtype(dtype)
         if not isinstance(fnames, list):
             fnames = [op.abspath(fnames)] if not op.isabs(fnames) else [fnames]
         else:
             fnames = [op.abspath(f) if not op.isabs(f) else f for f in fnames]
 
-        raws = [self._read_raw_file(fname, allow_maxshield, preload,
-                                    compensation) for fname in fnames]
+        n_jobs = check_n_jobs(n_jobs)
+        raws = _thread_map(lambda fname: self._read_raw_file(
+            fname, allow_maxshield, preload, compensation), fnames, n_jobs)
 
         _check_raw_compatibility(raws)
 
@@ -103,6 +131,7 @@ class Raw(ProjMixin):
         self.last_samp = self.first_samp + sum(self._raw_lengths) - 1
         self.cals = raws[0].cals
         self.rawdirs = [r.rawdir for r in raws]
+        self._rawdirs_complex = [r.rawdir_complex for r in raws]
         self.comp = copy.deepcopy(raws[0].comp)
         self.fids = [r.fid for r in raws]
         self.info = copy.deepcopy(raws[0].info)
@@ -110,6 +139,9 @@ class Raw(ProjMixin):
         self.info['filenames'] = fnames
         self.orig_format = raws[0].orig_format
         self.proj = False
+        self._mmap = mmap
+        self._n_jobs = n_jobs
+        self._dtype = dtype
         self._add_eeg_ref(add_eeg_ref)
 
         if preload:
@@ -165,10 +197,12 @@ class Raw(ProjMixin):
         # close files once data are preloaded
         self.close()
 
-    @verbose
-    def _read_raw_file(self, fname, allow_maxshield, preload, compensation,
-                       verbose=None):
-        """Read in header information from a raw file"""
+    def _read_raw_file(self, fname, allow_maxshield, preload, compensation):
+        """Read in header information from a raw file
+
+        This is called in the threads of __init__, which sets the log level
+        once for all of them (set_log_level is not thread-safe).
+        """
         logger.info('Opening raw data file %s...' % fname)
 
         #   Read in the whole file if preload is on and .fif.gz (saves time)
@@ -236,22 +270,26 @@ class Raw(ProjMixin):
             if ent.kind == FIFF.FIFF_DATA_SKIP:
                 tag = read_tag(fid, ent.pos)
                 nskip = int(tag.data)
-            elif ent.kind == FIFF.FIFF_DATA_BUFFER:
+            elif ent.kind in (FIFF.FIFF_DATA_BUFFER,
+                              FIFF.FIFF_MNE_COMPRESSED_DATA_BUFFER):
                 #   Figure out the number of samples in this buffer
+                size = ent.size
+                if ent.kind == FIFF.FIFF_MNE_COMPRESSED_DATA_BUFFER:
+                    size = _read_uncompressed_size(fid, ent)
                 if ent.type == FIFF.FIFFT_DAU_PACK16:
-                    nsamp = ent.size / (2 * nchan)
+                    nsamp = size / (2 * nchan)
                 elif ent.type == FIFF.FIFFT_SHORT:
-                    nsamp = ent.size / (2 * nchan)
+                    nsamp = size / (2 * nchan)
                 elif ent.type == FIFF.FIFFT_FLOAT:
-                    nsamp = ent.size / (4 * nchan)
+                    nsamp = size / (4 * nchan)
                 elif ent.type == FIFF.FIFFT_DOUBLE:
-                    nsamp = ent.size / (8 * nchan)
+                    nsamp = size / (8 * nchan)
                 elif ent.type == FIFF.FIFFT_INT:
-                    nsamp = ent.size / (4 * nchan)
+                    nsamp = size / (4 * nchan)
                 elif ent.type == FIFF.FIFFT_COMPLEX_FLOAT:
-                    nsamp = ent.size / (8 * nchan)
+                    nsamp = size / (8 * nchan)
                 elif ent.type == FIFF.FIFFT_COMPLEX_DOUBLE:
-                    nsamp = ent.size / (16 * nchan)
+                    nsamp = size / (16 * nchan)
                 else:
                     fid.close()
                     raise ValueError('Cannot handle data buffers of type %d' %
@@ -302,6 +340,10 @@ class Raw(ProjMixin):
 
         raw.cals = cals
         raw.rawdir = rawdir
+        # whether the file has complex data buffers
+        raw.rawdir_complex = any(r['ent'] is not None and
+                                 r['ent'].type in _complex_types
+                                 for r in rawdir)
         raw.comp = None
 
         #   Set up the CTF compensator
@@ -378,8 +420,9 @@ class Raw(ProjMixin):
         if self._preloaded:
             data, times = self._data[sel, start:stop], self._times[start:stop]
         else:
+            proj_vecs = None if self._projector is None else self._proj_vecs
             data, times = self._read_segment(start=start, stop=stop, sel=sel,
-                                             projector=self._projector,
+                                             proj_vecs=proj_vecs,
                                              verbose=self.verbose)
         return data, times
 
@@ -393,6 +436,95 @@ class Raw(ProjMixin):
         # set the data
         self._data[sel, start:stop] = value
 
+    def iter_chunks(self, chunk_sec=10., overlap_sec=0., picks=None,
+                    proj=False, start=0, stop=None):
+        """Iterate over consecutive (possibly overlapping) chunks of data
+
+        If the data are not preloaded, each chunk is read from disk into
+        the same preallocated buffer, so that the memory used does not
+        depend on the length of the recording.
+
+        Parameters
+        ----------
+        chunk_sec : float
+            Duration of the chunks in seconds (rounded up to an integer
+            number of samples). The last chunk can be shorter.
+        overlap_sec : float
+            Overlap between consecutive chunks in seconds (rounded up to an
+            integer number of samples). Must be shorter than chunk_sec.
+        picks : array-like of int | None
+            Indices of channels to include. If None, all channels are used.
+        proj : bool
+            If True, the SSP projectors in info (including the ones that
+            have not been applied yet) are applied to the chunks. If False,
+            data are returned as with raw[picks, start:stop].
+        start : int
+            First sample to include (first is 0).
+        stop : int | None
+            First sample to not include. If None, data are included to the
+            end. No chunks are generated if stop is not after start.
+
+        Returns
+        -------
+        chunks : generator
+            Generator of (data, times, start_samp) tuples, where data is of
+            shape (n_channels, n_samples), times contains the time values
+            of the samples and start_samp is the index of the first sample
+            of the chunk. Note that data is overwritten by the next
+            iteration, so it has to be copied if it must be kept.
+        """
+        sfreq = self.info['sfreq']
+        n_chunk = int(ceil(chunk_sec * sfreq))
+        n_overlap = int(ceil(overlap_sec * sfreq))
+        if n_chunk <= 0:
+            raise ValueError('chunk_sec must be positive')
+        if n_overlap < 0 or n_overlap >= n_chunk:
+            raise ValueError('overlap_sec must be non-negative and shorter '
+                             'than chunk_sec')
+        stop = self.n_times if stop is None else min(int(stop), self.n_times)
+        start = int(start)
+        if start < 0:
+            raise ValueError('start must be non-negative')
+        if start >= stop:
+            return
+
+        projector = self._projector
+        proj_vecs = None if projector is None else self._proj_vecs
+        if proj and not all(p['active'] for p in self.info['projs']):
+            projector, info = setup_proj(deepcopy(self.info),
+                                         add_eeg_ref=False, verbose=False)
+            proj_vecs = None if projector is None else _projector_vecs(info)
+            if self._preloaded and projector is not None:
+                projector = projector if picks is None else projector[picks]
+                projector = projector.astype(self._data.real.dtype)
+        elif self._preloaded:
+            projector = None  # data already projected as needed
+        sel = picks if picks is None else np.asarray(picks, dtype=int)
+        buf = None
+        first = start
+        while True:
+            last = min(first + n_chunk, stop)
+            if self._preloaded:
+                if projector is not None:
+                    data = np.dot(projector, self._data[:, first:last])
+                elif sel is None:
+                    data = self._data[:, first:last]
+                else:
+                    data = self._data[sel, first:last]
+                times = self._times[first:last]
+            else:
+                data_buffer = None if buf is None else buf[:, :last - first]
+                data, times = self._read_segment(first, last, sel=sel,
+                                                 data_buffer=data_buffer,
+                                                 proj_vecs=proj_vecs,
+                                                 verbose=self.verbose)
+                if buf is None and last - first == n_chunk:
+                    buf = data
+            yield data, times, first
+            if last >= stop:
+                break
+            first = last - n_overlap
+
     @verbose
     def apply_function(self, fun, picks, dtype, n_jobs, verbose=None, *args,
                        **kwargs):
@@ -518,14 +650,15 @@ class Raw(ProjMixin):
     def filter(self, l_freq, h_freq, picks=None, filter_length='10s',
                l_trans_bandwidth=0.5, h_trans_bandwidth=0.5, n_jobs=1,
                method='fft', iir_params=dict(order=4, ftype='butter'),
-               verbose=None):
+               fname=None, overwrite=False, verbose=None):
         """Filter a subset of channels.
 
         Applies a zero-phase low-pass, high-pass, band-pass, or band-stop
         filter to the channels selected by "picks". The data of the Raw
         object is modified inplace.
 
-        The Raw object has to be constructed using preload=True (or string).
+        The Raw object has to be constructed using preload=True (or string),
+        unless fname is given (see below).
 
         l_freq and h_freq are the frequencies below which and above which,
         respectively, to filter out of the data. Thus the uses are:
@@ -570,6 +703,16 @@ class Raw(ProjMixin):
         iir_params : dict
             Dictionary of parameters to use for IIR filtering.
             See mne.filter.construct_iir_filter for details.
+        fname : str | None
+            If the data are not preloaded, the filtered data of all channels
+            are written to this raw FIF file (as with format='single' in
+            Raw.save), and the Raw object then reads its data from there.
+            The data are filtered in blocks read with margins, so that the
+            result is the same as when filtering the preloaded data, and
+            all data are never held in memory at once. Only method='fft'
+            is supported. Ignored if the data are preloaded.
+        overwrite : bool
+            If True, fname will be overwritten if it exists.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -586,9 +729,13 @@ class Raw(ProjMixin):
         if h_freq is not None and not isinstance(h_freq, float):
             h_freq = float(h_freq)
 
-        if not self._preloaded:
+        if not self._preloaded and fname is None:
             raise RuntimeError('Raw data needs to be preloaded to filter. Use '
-                               'preload=True (or string) in the constructor.')
+                               'preload=True (or string) in the constructor, '
+                               'or give fname to filter to a new file.')
+        if not self._preloaded and method != 'fft':
+            raise ValueError('Only method="fft" can be used to filter data '
+                             'that are not preloaded')
         if picks is None:
             if 'ICA ' in ','.join(self.ch_names):
                 pick_parameters = dict(misc=True)
@@ -609,51 +756,61 @@ class Raw(ProjMixin):
             if l_freq is not None and (h_freq is None or l_freq < h_freq) and \
                     l_freq > self.info['highpass']:
                 self.info['highpass'] = l_freq
+        kwargs = dict(filter_length=filter_length, method=method,
+                      iir_params=iir_params, picks=picks, n_jobs=n_jobs,
+                      copy=False)
         if l_freq is None and h_freq is not None:
             logger.info('Low-pass filtering at %0.2g Hz' % h_freq)
-            low_pass_filter(self._data, fs, h_freq,
-                            filter_length=filter_length,
-                            trans_bandwidth=l_trans_bandwidth, method=method,
-                            iir_params=iir_params, picks=picks, n_jobs=n_jobs,
-                            copy=False)
-        if l_freq is not None and h_freq is None:
+            filt_fun, args = low_pass_filter, (h_freq,)
+            kwargs['trans_bandwidth'] = l_trans_bandwidth
+            band = (h_freq, h_freq + l_trans_bandwidth, 'low')
+        elif l_freq is not None and h_freq is None:
             logger.info('High-pass filtering at %0.2g Hz' % l_freq)
-            high_pass_filter(self._data, fs, l_freq,
-                             filter_length=filter_length,
-                             trans_bandwidth=h_trans_bandwidth, method=method,
-                             iir_params=iir_params, picks=picks, n_jobs=n_jobs,
-                             copy=False)
-        if l_freq is not None and h_freq is not None:
+            filt_fun, args = high_pass_filter, (l_freq,)
+            kwargs['trans_bandwidth'] = h_trans_bandwidth
+            band = (l_freq, l_freq - h_trans_bandwidth, 'high')
+        elif l_freq is not None and h_freq is not None:
             if l_freq < h_freq:
                 logger.info('Band-pass filtering from %0.2g - %0.2g Hz'
                             % (l_freq, h_freq))
-                self._data = band_pass_filter(self._data, fs, l_freq, h_freq,
-                    filter_length=filter_length,
-                    l_trans_bandwidth=l_trans_bandwidth,
-                    h_trans_bandwidth=h_trans_bandwidth,
-                    method=method, iir_params=iir_params, picks=picks,
-                    n_jobs=n_jobs, copy=False)
+                filt_fun, args = band_pass_filter, (l_freq, h_freq)
+                kwargs['l_trans_bandwidth'] = l_trans_bandwidth
+                kwargs['h_trans_bandwidth'] = h_trans_bandwidth
+                band = ([l_freq, h_freq], [l_freq - l_trans_bandwidth,
+                                           h_freq + h_trans_bandwidth],
+                        'bandpass')
             else:
                 logger.info('Band-stop filtering from %0.2g - %0.2g Hz'
                             % (h_freq, l_freq))
-                self._data = band_stop_filter(self._data, fs, h_freq, l_freq,
-                    filter_length=filter_length,
-                    l_trans_bandwidth=h_trans_bandwidth,
-                    h_trans_bandwidth=l_trans_bandwidth, method=method,
-                    iir_params=iir_params, picks=picks, n_jobs=n_jobs,
-                    copy=False)
+                filt_fun, args = band_stop_filter, (h_freq, l_freq)
+                kwargs['l_trans_bandwidth'] = h_trans_bandwidth
+                kwargs['h_trans_bandwidth'] = l_trans_bandwidth
+                band = ([h_freq, l_freq], [h_freq + h_trans_bandwidth,
+                                           l_freq - l_trans_bandwidth],
+                        'bandstop')
+        else:
+            return
+
+        if self._preloaded:
+            self._data = filt_fun(self._data, fs, *args, **kwargs)
+        else:
+            freq, gain = _fir_gains(fs, *band)
+            self._filter_to_file(fname, overwrite, freq, gain, filter_length,
+                                 picks, n_jobs)
 
     @verbose
     def notch_filter(self, freqs, picks=None, filter_length='10s',
                      notch_widths=None, trans_bandwidth=1.0, n_jobs=1,
                      method='fft', iir_params=dict(order=4, ftype='butter'),
-                     mt_bandwidth=None, p_value=0.05, verbose=None):
+                     mt_bandwidth=None, p_value=0.05, fname=None,
+                     overwrite=False, verbose=None):
         """Notch filter a subset of channels.
 
         Applies a zero-phase notch filter to the channels selected by
         "picks". The data of the Raw object is modified inplace.
 
-        The Raw object has to be constructed using preload=True (or string).
+        The Raw object has to be constructed using preload=True (or string),
+        unless fname is given (see below).
 
         Note: If n_jobs > 1, more memory is required as "len(picks) * n_times"
               additional time points need to be temporaily stored in memory.
@@ -698,6 +855,13 @@ class Raw(ProjMixin):
             sinusoidal components to remove when method='spectrum_fit' and
             freqs=None. Note that this will be Bonferroni corrected for the
             number of frequencies, so large p-values may be justified.
+        fname : str | None
+            If the data are not preloaded, the filtered data are written to
+            this raw FIF file, from which the Raw object then reads its data.
+            See Raw.filter for details. Only method='fft' is supported.
+            Ignored if the data are preloaded.
+        overwrite : bool
+            If True, fname will be overwritten if it exists.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -720,21 +884,106 @@ class Raw(ProjMixin):
                 raise RuntimeError('Could not find any valid channels for '
                                    'your Raw object. Please contact the '
                                    'MNE-Python developers.')
-        if not self._preloaded:
+        if not self._preloaded and fname is None:
             raise RuntimeError('Raw data needs to be preloaded to filter. Use '
-                               'preload=True (or string) in the constructor.')
+                               'preload=True (or string) in the constructor, '
+                               'or give fname to filter to a new file.')
+        if not self._preloaded and method != 'fft':
+            raise ValueError('Only method="fft" can be used to filter data '
+                             'that are not preloaded')
+
+        kwargs = dict(filter_length=filter_length, notch_widths=notch_widths,
+                      trans_bandwidth=trans_bandwidth, method=method,
+                      iir_params=iir_params, mt_bandwidth=mt_bandwidth,
+                      p_value=p_value, picks=picks, n_jobs=n_jobs, copy=False)
+        if self._preloaded:
+            self._data = notch_filter(self._data, fs, freqs, **kwargs)
+        else:
+            if freqs is None:
+                raise ValueError('freqs=None can only be used with method '
+                                 'spectrum_fit')
+            lows, highs = _notch_bands(freqs, notch_widths, trans_bandwidth)
+            tb_2 = trans_bandwidth / 2.
+            freq, gain = _fir_gains(fs, [lows, highs], [lows + tb_2,
+                                                        highs - tb_2],
+                                    'bandstop')
+            self._filter_to_file(fname, overwrite, freq, gain, filter_length,
+                                 picks, n_jobs)
+
+    def _filter_to_file(self, fname, overwrite, freq, gain, filter_length,
+                        picks, n_jobs):
+        """Filter data that are not preloaded block by block into a file
+
+        The FIR filter given by freq and gain (in Hz, see _fir_gains) is
+        designed for the whole data and each block is read with margins,
+        which are discarded after filtering, so that the result is the
+        same as when filtering all data at once (see _overlap_add_blocks).
+        The Raw object then reads the filtered data from the new file.
+        """
+        fname = op.abspath(fname)
+        if fname in self.info['filenames']:
+            raise ValueError('You cannot filter data to the same file.'
+                             ' Please use a different filename.')
+        sfreq = self.info['sfreq']
+        n_times = self.n_times
+        filter_length = _get_filter_length(filter_length, sfreq,
+                                           len_x=n_times)
+        if filter_length is None:
+            raise ValueError('filter_length cannot be None to filter data '
+                             'that are not preloaded')
+        _check_fname(fname, overwrite)
 
-        self._data = notch_filter(self._data, fs, freqs,
-                                  filter_length=filter_length,
-                                  notch_widths=notch_widths,
-                                  trans_bandwidth=trans_bandwidth,
-                                  method=method, iir_params=iir_params,
-                                  mt_bandwidth=mt_bandwidth, p_value=p_value,
-                                  picks=picks, n_jobs=n_jobs, copy=False)
+        buffer_size_sec = self.info.get('buffer_size_sec', 10.0)
+        buffer_size = int(ceil(buffer_size_sec * sfreq))
+        if n_times <= filter_length:
+            # short data are filtered at once with a single FFT
+            blocks = [(0, n_times, 0, n_times)]
+        else:
+            h, h_fft, _, _ = _get_overlap_add_design(freq / (sfreq / 2.),
+                                                     gain, filter_length,
+                                                     n_times)
+            # blocks are a multiple of the buffer size
+            blocks = _overlap_add_blocks(n_times, len(h), len(h_fft),
+                                         buffer_size)
+
+        inv_comp = None
+        if self.comp is not None:
+            inv_comp = linalg.inv(self.comp)
+
+        outfid, cals = start_writing_raw(fname, self.info, None,
+                                         FIFF.FIFFT_FLOAT, reset_range=True)
+        write_int(outfid, FIFF.FIFF_FIRST_SAMPLE, self.first_samp)
+        writer = _RawBufferWriter(outfid, cals, 'single', inv_comp)
+        for start, stop, first, last in blocks:
+            data, _ = self[:, start:stop]
+            data = _filter(data, sfreq, freq, gain, filter_length, picks,
+                           n_jobs, copy=False, n_times=n_times)
+            for buf_first in range(first, last, buffer_size):
+                buf_last = min(buf_first + buffer_size, last)
+                writer.write(data[:, buf_first - start:buf_last - start])
+        writer.close()
+        finish_writing_raw(outfid)
+
+        # read the data from the new file from now on
+        raw = Raw(fname, add_eeg_ref=False, mmap=self._mmap,
+                  n_jobs=self._n_jobs, verbose=self.verbose)
+        self.close()
+        self.fids = raw.fids
+        self.rawdirs = raw.rawdirs
+        self._rawdirs_complex = raw._rawdirs_complex
+        self.cals = raw.cals
+        self._first_samps = raw._first_samps
+        self._last_samps = raw._last_samps
+        self._raw_lengths = raw._raw_lengths
+        self.orig_format = raw.orig_format
+        for key in ('chs', 'filenames', 'buffer_size_sec'):
+            self.info[key] = raw.info[key]
+        # the projection (if any) has been applied to the saved data
+        self._projector = None
 
     @verbose
     def resample(self, sfreq, npad=100, window='boxcar',
-                 stim_picks=None, n_jobs=1, verbose=None):
+                 stim_picks=None, n_jobs=1, method='fft', verbose=None):
         """Resample data channels.
 
         Resamples all channels. The data of the Raw object is modified inplace.
@@ -765,6 +1014,9 @@ class Raw(ProjMixin):
         n_jobs : int | str
             Number of jobs to run in parallel. Can be 'cuda' if scikits.cuda
             is installed properly and CUDA is initialized.
+        method : str
+            Resampling method, 'fft' or 'polyphase' (uses less memory for
+            long data). See mne.filter.resample.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -790,7 +1042,7 @@ class Raw(ProjMixin):
         for ri in range(len(self._raw_lengths)):
             data_chunk = self._data[:, offsets[ri]:offsets[ri + 1]]
             new_data.append(resample(data_chunk, sfreq, o_sfreq, npad,
-                                     n_jobs=n_jobs))
+                                     n_jobs=n_jobs, method=method))
             new_ntimes = new_data[ri].shape[1]
 
             # Now deal with the stim channels. In empirical testing, it was
@@ -872,6 +1124,9 @@ class Raw(ProjMixin):
         raw.fids = [f for fi, f in enumerate(raw.fids) if fi in keepers]
         raw.rawdirs = [r for ri, r in enumerate(raw.rawdirs)
                        if ri in keepers]
+        raw._rawdirs_complex = [c for ci, c in
+                                enumerate(raw._rawdirs_complex)
+                                if ci in keepers]
         raw.first_samp = raw._first_samps[0]
         raw.last_samp = raw.first_samp + (smax - smin)
         if raw._preloaded:
@@ -882,7 +1137,7 @@ class Raw(ProjMixin):
     @verbose
     def save(self, fname, picks=None, tmin=0, tmax=None, buffer_size_sec=10,
              drop_small_buffer=False, proj=False, format='single',
-             overwrite=False, verbose=None):
+             overwrite=False, threaded=False, compress=False, verbose=None):
         """Save raw data to file
 
         Parameters
@@ -919,6 +1174,14 @@ class Raw(ProjMixin):
         overwrite : bool
             If True, the destination file (if it exists) will be overwritten.
             If False (default), an error will be raised if the file exists.
+        threaded : bool
+            If True, the data are converted and written in a background
+            thread while the next chunk of data is read.
+        compress : bool | int
+            If True (or a zlib compression level between 1 and 9, True
+            corresponds to 6), each data buffer is compressed separately,
+            which keeps random access to the data fast. Compressed files
+            cannot be loaded with the MNE command-line tools.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -998,27 +1261,29 @@ class Raw(ProjMixin):
             inv_comp = linalg.inv(self.comp)
 
         write_int(outfid, FIFF.FIFF_FIRST_SAMPLE, first_samp)
-        for first in range(start, stop, buffer_size):
-            last = first + buffer_size
-            if last >= stop:
-                last = stop + 1
-
-            if picks is None:
-                data, times = self[:, first:last]
-            else:
-                data, times = self[picks, first:last]
+        writer = _RawBufferWriter(outfid, cals, format, inv_comp, projector,
+                                  threaded, compress)
+        try:
+            for first in range(start, stop, buffer_size):
+                last = first + buffer_size
+                if last >= stop:
+                    last = stop + 1
 
-            if projector is not None:
-                data = np.dot(projector, data)
+                if picks is None:
+                    data, times = self[:, first:last]
+                else:
+                    data, times = self[picks, first:last]
 
-            if (drop_small_buffer and (first > start)
-                                            and (len(times) < buffer_size)):
-                logger.info('Skipping data chunk due to small buffer ... '
-                            '[done]')
-                break
-            logger.info('Writing ...')
-            write_raw_buffer(outfid, data, cals, format, inv_comp)
-            logger.info('[done]')
+                if (drop_small_buffer and (first > start)
+                        and (len(times) < buffer_size)):
+                    logger.info('Skipping data chunk due to small buffer ... '
+                                '[done]')
+                    break
+                logger.info('Writing ...')
+                writer.write(data)
+                logger.info('[done]')
+        finally:
+            writer.close()
 
         finish_writing_raw(outfid)
 
@@ -1352,6 +1617,7 @@ class Raw(ProjMixin):
             self._last_samps = np.r_[self._last_samps, r._last_samps]
             self._raw_lengths = np.r_[self._raw_lengths, r._raw_lengths]
             self.rawdirs += r.rawdirs
+            self._rawdirs_complex += r._rawdirs_complex
             self.info['filenames'] += r.info['filenames']
         # reconstruct fids in case some were preloaded and others weren't
         self._initialize_fids()
@@ -1502,7 +1768,7 @@ class Raw(ProjMixin):
 
     @verbose
     def _read_segment(self, start=0, stop=None, sel=None, data_buffer=None,
-                      verbose=None, projector=None):
+                      verbose=None, proj_vecs=None):
         """Read a chunk of raw data
 
         Parameters
@@ -1521,8 +1787,9 @@ class Raw(ProjMixin):
             to store the data.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
-        projector : array
-            SSP operator to apply to the data.
+        proj_vecs : array | None
+            The orthogonal basis U of the SSP operator I - U U' to apply to
+            the data (see _projector_vecs).
 
         Returns
         -------
@@ -1544,6 +1811,10 @@ class Raw(ProjMixin):
 
         #  Initialize the data and calibration vector
         nchan = self.info['nchan']
+        if isinstance(data_buffer, np.ndarray):
+            dtype = data_buffer.real.dtype
+        else:
+            dtype = self._dtype
 
         n_sel_channels = nchan if sel is None else len(sel)
         # convert sel to a slice if possible for efficiency
@@ -1558,13 +1829,11 @@ class Raw(ProjMixin):
         else:
             data = None  # we will allocate it later, once we know the type
 
-        mult = list()
-        for ri in range(len(self._raw_lengths)):
-            mult.append(np.diag(self.cals.ravel()))
-            if self.comp is not None:
-                mult[ri] = np.dot(self.comp[idx, :], mult[ri])
-            if projector is not None:
-                mult[ri] = np.dot(projector, mult[ri])
+        # calibration (and compensation / projection) operator, computed
+        # once for all buffers and reduced to the output channels
+        mult, mult_cols, proj = _make_read_operator(self.cals, self.comp,
+                                                    proj_vecs, idx, dtype)
+        cals = self.cals.ravel()[idx][:, np.newaxis].astype(dtype)
 
         # deal with having multiple files accessed by the raw object
         cumul_lens = np.concatenate(([0], np.array(self._raw_lengths,
@@ -1574,19 +1843,13 @@ class Raw(ProjMixin):
                                     np.greater_equal(stop - 1,
                                                      cumul_lens[:-1]))
 
-        first_file_used = False
-        s_off = 0
+        # find the samples to read from each file and where they go
+        segments = list()
         dest = 0
-        if isinstance(idx, slice):
-            cals = self.cals.ravel()[idx][:, np.newaxis]
-        else:
-            cals = self.cals.ravel()[:, np.newaxis]
-
         for fi in np.nonzero(files_used)[0]:
             start_loc = self._first_samps[fi]
             # first iteration (only) could start in the middle somewhere
-            if not first_file_used:
-                first_file_used = True
+            if len(segments) == 0:
                 start_loc += start - cumul_lens[fi]
             stop_loc = np.min([stop - 1 - cumul_lens[fi] +
                                self._first_samps[fi], self._last_samps[fi]])
@@ -1596,95 +1859,121 @@ class Raw(ProjMixin):
                 raise ValueError('Bad array indexing, could be a bug')
             if stop_loc < start_loc:
                 raise ValueError('Bad array indexing, could be a bug')
-            len_loc = stop_loc - start_loc + 1
+            segments.append((fi, start_loc, stop_loc, dest))
+            dest += stop_loc - start_loc + 1
+        # double-check our math
+        if not dest == stop - start:
+            raise ValueError('Incorrect file reading')
+
+        # allocate the output now, so that files can be read in parallel
+        is_complex = any(self._rawdirs_complex[fi]
+                         for fi, _, _, _ in segments)
+        if is_complex:
+            dtype = np.result_type(dtype, np.complex64)
+        data = _allocate_data(data, data_buffer, data_shape, dtype)
+
+        # files sharing a file handle must be read by the same worker
+        fid_segments = dict()
+        for segment in segments:
+            fid_segments.setdefault(id(self.fids[segment[0]]),
+                                    list()).append(segment)
+        fid_segments = sorted(fid_segments.values())
+
+        def _read_segments(segments):
+            for fi, start_loc, stop_loc, dest in segments:
+                self._read_file_segment(fi, start_loc, stop_loc, dest, data,
+                                        idx, mult, mult_cols, proj, cals)
+
+        _thread_map(_read_segments, fid_segments, self._n_jobs)
+
+        logger.info('[done]')
+        times = np.arange(start, stop) / self.info['sfreq']
+
+        return data, times
 
-            for this in self.rawdirs[fi]:
+    def _read_file_segment(self, fi, start_loc, stop_loc, dest, data, idx,
+                           mult, mult_cols, proj, cals):
+        """Read samples start_loc ... stop_loc of a file into data[:, dest:]
 
-                #  Do we need this buffer
-                if this['last'] >= start_loc:
-                    #  The picking logic is a bit complicated
-                    if stop_loc > this['last'] and start_loc < this['first']:
-                        #    We need the whole buffer
-                        first_pick = 0
+        See _read_segment for the meaning of idx, mult, mult_cols, proj and
+        cals.
+        """
+        nchan = self.info['nchan']
+        mm = _mmap_file(self.fids[fi]) if self._mmap else None
+        len_loc = stop_loc - start_loc + 1
+        dest_end = dest + len_loc
+        for this in self.rawdirs[fi]:
+
+            #  Do we need this buffer
+            if this['last'] >= start_loc:
+                #  The picking logic is a bit complicated
+                if stop_loc > this['last'] and start_loc < this['first']:
+                    #    We need the whole buffer
+                    first_pick = 0
+                    last_pick = this['nsamp']
+                    logger.debug('W')
+
+                elif start_loc >= this['first']:
+                    first_pick = start_loc - this['first']
+                    if stop_loc <= this['last']:
+                        #   Something from the middle
+                        last_pick = this['nsamp'] + stop_loc - this['last']
+                        logger.debug('M')
+                    else:
+                        #   From the middle to the end
                         last_pick = this['nsamp']
-                        logger.debug('W')
-
-                    elif start_loc >= this['first']:
-                        first_pick = start_loc - this['first']
-                        if stop_loc <= this['last']:
-                            #   Something from the middle
-                            last_pick = this['nsamp'] + stop_loc - this['last']
-                            logger.debug('M')
+                        logger.debug('E')
+                else:
+                    #    From the beginning to the middle
+                    first_pick = 0
+                    last_pick = stop_loc - this['first'] + 1
+                    logger.debug('B')
+
+                #   Now we are ready to pick
+                picksamp = last_pick - first_pick
+                if picksamp > 0:
+                    # only read data if it exists
+                    if this['ent'] is not None:
+                        if (mm is not None and this['ent'].kind ==
+                                FIFF.FIFF_DATA_BUFFER):
+                            # zero-copy access to the requested samples
+                            one = _mmap_buffer(mm, this['ent'],
+                                               this['nsamp'], nchan)
+                            one = one[first_pick:last_pick]
                         else:
-                            #   From the middle to the end
-                            last_pick = this['nsamp']
-                            logger.debug('E')
-                    else:
-                        #    From the beginning to the middle
-                        first_pick = 0
-                        last_pick = stop_loc - this['first'] + 1
-                        logger.debug('B')
-
-                    #   Now we are ready to pick
-                    picksamp = last_pick - first_pick
-                    if picksamp > 0:
-                        # only read data if it exists
-                        if this['ent'] is not None:
                             one = read_tag(self.fids[fi], this['ent'].pos,
                                            shape=(this['nsamp'], nchan),
-                                           rlims=(first_pick, last_pick)).data
-                            if np.isrealobj(one):
-                                dtype = np.float
-                            else:
-                                dtype = np.complex128
+                                           rlims=(first_pick,
+                                                  last_pick)).data
                             one.shape = (picksamp, nchan)
-                            one = one.T.astype(dtype)
-                            # use proj + cal factors in mult
-                            if mult is not None:
-                                one = np.dot(mult[fi], one)
-                            else:  # apply just the calibration factors
-                                # this logic is designed to limit memory copies
-                                if isinstance(idx, slice):
-                                    # This is a view operation, so it's fast
-                                    one[idx] *= cals
-                                else:
-                                    # Extra operations are actually faster here
-                                    # than creating a new array
-                                    # (fancy indexing)
-                                    one *= cals
-
-                            # if not already done, allocate array with
-                            # right type
-                            data = _allocate_data(data, data_buffer,
-                                                  data_shape, dtype)
-                            if isinstance(idx, slice):
-                                # faster to slice in data than doing
-                                # one = one[idx] sooner
-                                data[:, dest:(dest + picksamp)] = one[idx]
-                            else:
-                                # faster than doing one = one[idx]
-                                data_view = data[:, dest:(dest + picksamp)]
-                                for ii, ix in enumerate(idx):
-                                    data_view[ii] = one[ix]
-                        dest += picksamp
-
-                #   Done?
-                if this['last'] >= stop_loc:
-                    # if not already done, allocate array with float dtype
-                    data = _allocate_data(data, data_buffer, data_shape,
-                                          np.float)
-                    break
-
-            self.fids[fi].seek(0, 0)  # Go back to beginning of the file
-            s_off += len_loc
-            # double-check our math
-            if not s_off == dest:
-                raise ValueError('Incorrect file reading')
-
-        logger.info('[done]')
-        times = np.arange(start, stop) / self.info['sfreq']
+                        data_view = data[:, dest:(dest + picksamp)]
+                        if mult is not None:
+                            # only convert the channels the output
+                            # depends on
+                            one = one[:, mult_cols].T.astype(data.dtype)
+                            data_view[:] = np.dot(mult, one)
+                        else:
+                            # apply just the calibration factors, to the
+                            # selected channels only
+                            np.multiply(one[:, idx].T, cals, out=data_view)
+                            if proj is not None:
+                                # x - U (U' x), without the dense operator
+                                proj_out, proj_in, proj_cols = proj
+                                one = one[:, proj_cols].T.astype(data.dtype)
+                                data_view -= np.dot(proj_out,
+                                                    np.dot(proj_in, one))
+                    dest += picksamp
+
+            #   Done?
+            if this['last'] >= stop_loc:
+                break
 
-        return data, times
+        if mm is not None:
+            del mm
+        self.fids[fi].seek(0, 0)  # Go back to beginning of the file
+        # double-check our math
+        if not dest == dest_end:
+            raise ValueError('Incorrect file reading')
 
     def __repr__(self):
         s = "n_channels x n_times : %s x %s" % (len(self.info['ch_names']),
@@ -1745,6 +2034,56 @@ def set_eeg_reference(raw, ref_channels, copy=True):
     return raw, ref_data
 
 
+def _make_read_operator(cals, comp, proj_vecs, idx, dtype=np.float64):
+    """Helper to set up the operator applied to raw data buffers
+
+    Returns mult, mult_cols and proj. With compensation, mult holds the
+    rows of the full (projector x compensation x calibration) operator
+    corresponding to the output channels, restricted to the input channels
+    these rows depend on, and mult_cols the indices of these input
+    channels. Otherwise mult is None and only the calibration factors are
+    applied, followed by the SSP operator I - U U' if proj_vecs (U) is not
+    None. This low-rank operator is returned as proj = (U_out, U_in',
+    proj_cols), where U_out are the rows of U of the output channels and
+    U_in' the calibrated rows of the proj_cols input channels it depends
+    on. The operators are computed in double precision and returned as
+    dtype.
+    """
+    if comp is None:
+        if proj_vecs is None:
+            return None, None, None
+        proj_cols = np.where(np.any(proj_vecs != 0, axis=1))[0]
+        proj_in = proj_vecs[proj_cols] * cals.ravel()[proj_cols, np.newaxis]
+        proj = (proj_vecs[idx].astype(dtype), proj_in.T.astype(dtype),
+                _index_as_slice(proj_cols))
+        return None, None, proj
+    mult = np.dot(comp, np.diag(cals.ravel()))
+    if proj_vecs is not None:
+        mult -= np.dot(proj_vecs, np.dot(proj_vecs.T, mult))
+    mult = mult[idx]
+    mult_cols = _index_as_slice(np.where(np.any(mult != 0, axis=0))[0])
+    return mult[:, mult_cols].astype(dtype), mult_cols, None
+
+
+def _index_as_slice(idx):
+    """Helper to turn sorted indices into a slice if they are contiguous
+
+    Unlike fancy indexing, a slice keeps the selection a view.
+    """
+    if len(idx) > 0 and idx[-1] - idx[0] == len(idx) - 1:
+        idx = slice(idx[0], idx[-1] + 1)
+    return idx
+
+
+def _check_dtype(dtype):
+    """Helper to check the floating point type used to represent data"""
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError('dtype must be np.float32 or np.float64, got %s'
+                         % dtype)
+    return dtype
+
+
 def _allocate_data(data, data_buffer, data_shape, dtype):
     if data is None:
         # if not already done, allocate array with right type
@@ -1757,6 +2096,49 @@ def _allocate_data(data, data_buffer, data_shape, dtype):
     return data
 
 
+def _thread_map(func, args_list, n_jobs):
+    """Helper to call func on each element of args_list using threads"""
+    n_jobs = min(n_jobs, len(args_list))
+    if n_jobs <= 1:
+        return [func(args) for args in args_list]
+    pool = ThreadPool(n_jobs)
+    try:
+        return pool.map(func, args_list)
+    finally:
+        pool.close()
+
+
+# on-disk (big-endian) data types of raw data buffers
+_buffer_dtypes = {FIFF.FIFFT_DAU_PACK16: np.dtype('>i2'),
+                  FIFF.FIFFT_SHORT: np.dtype('>i2'),
+                  FIFF.FIFFT_FLOAT: np.dtype('>f4'),
+                  FIFF.FIFFT_DOUBLE: np.dtype('>f8'),
+                  FIFF.FIFFT_INT: np.dtype('>i4'),
+                  FIFF.FIFFT_COMPLEX_FLOAT: np.dtype('>c8'),
+                  FIFF.FIFFT_COMPLEX_DOUBLE: np.dtype('>c16')}
+_complex_types = (FIFF.FIFFT_COMPLEX_FLOAT, FIFF.FIFFT_COMPLEX_DOUBLE)
+
+
+def _mmap_file(fid):
+    """Memory-map an open raw file, None if it cannot be mapped"""
+    # gzip files and in-memory copies of preloaded .fif.gz files
+    # do not map to the uncompressed data
+    if not isinstance(fid, file) or fid.closed:
+        return None
+    return np.memmap(fid, dtype=np.uint8, mode='r')
+
+
+def _mmap_buffer(mm, ent, nsamp, nchan):
+    """Get a (nsamp x nchan) view of a data buffer in a memory-mapped file
+
+    The view uses the on-disk data type; no data are read or converted
+    until it is used.
+    """
+    # data follow the 16-byte tag header
+    return np.ndarray((nsamp, nchan), dtype=_buffer_dtypes[ent.type],
+                      buffer=mm, offset=ent.pos + 16)
+
+
 def _time_as_index(times, sfreq, first_samp=0, use_first_samp=False):
     """Convert time to indices
 
@@ -1805,6 +2187,7 @@ class _RawShell():
         self.last_samp = None
         self.cals = None
         self.rawdir = None
+        self.rawdir_complex = False
         self._projector = None
 
     @property
@@ -1816,8 +2199,7 @@ class _RawShell():
 # Writing
 
 from .write import (start_file, end_file, start_block, end_block,
-                    write_dau_pack16, write_float, write_double,
-                    write_complex64, write_complex128, write_int, write_id)
+                    write_int, write_id, _compress_data, _nop_tag)
 
 
 def start_writing_raw(name, info, sel=None, data_type=FIFF.FIFFT_FLOAT,
@@ -1896,7 +2278,7 @@ def start_writing_raw(name, info, sel=None, data_type=FIFF.FIFFT_FLOAT,
     return fid, cals
 
 
-def write_raw_buffer(fid, buf, cals, format, inv_comp):
+def write_raw_buffer(fid, buf, cals, format, inv_comp, compress=False):
     """Write raw buffer
 
     Parameters
@@ -1914,37 +2296,170 @@ def write_raw_buffer(fid, buf, cals, format, inv_comp):
     inv_comp : array | None
         The CTF compensation matrix used to revert compensation
         change when reading.
+    compress : bool | int
+        If True (or a zlib compression level between 1 and 9), the buffer
+        is stored compressed (see Raw.save).
     """
-    if buf.shape[0] != len(cals):
-        raise ValueError('buffer and calibration sizes do not match')
-
-    if not format in ['short', 'int', 'single', 'double']:
-        raise ValueError('format must be "short", "single", or "double"')
-
-    if np.isrealobj(buf):
-        if format == 'short':
-            write_function = write_dau_pack16
-        elif format == 'int':
-            write_function = write_int
-        elif format == 'single':
-            write_function = write_float
-        else:
-            write_function = write_double
-    else:
-        if format == 'single':
-            write_function = write_complex64
-        elif format == 'double':
-            write_function = write_complex128
+    writer = _RawBufferWriter(fid, cals, format, inv_comp, compress=compress)
+    writer.write(buf)
+    writer.close()
+
+
+# FIF types and on-disk data types used to write raw data buffers, for real
+# and complex data
+_write_types = dict(short=((FIFF.FIFFT_DAU_PACK16, '>i2'), None),
+                    int=((FIFF.FIFFT_INT, '>i4'), None),
+                    single=((FIFF.FIFFT_FLOAT, '>f4'),
+                            (FIFF.FIFFT_COMPLEX_FLOAT, '>c8')),
+                    double=((FIFF.FIFFT_DOUBLE, '>f8'),
+                            (FIFF.FIFFT_COMPLEX_DOUBLE, '>c16')))
+
+
+class _RawBufferWriter(object):
+    """Helper to write many raw data buffers efficiently
+
+    The calibration, inverse CTF compensation and projection are combined
+    into a single operator once. Converted buffers are collected and
+    written to the file in large chunks of at least flush_size bytes.
+    Each chunk but the last is padded with a FIFF_NOP tag to end at a
+    multiple of alignment bytes in the file, so that the following
+    writes start on a block boundary.
+    If threaded is True, buffers are converted and written in a background
+    thread, so that the caller can already read the next buffer.
+
+    Parameters
+    ----------
+    fid : file descriptor
+        An open raw data file.
+    cals : array
+        Calibration factors.
+    format : str
+        'short', 'int', 'single', or 'double' (see write_raw_buffer).
+    inv_comp : array | None
+        The CTF compensation matrix used to revert compensation
+        change when reading.
+    projector : array | None
+        Projection to apply to the buffers before writing them.
+    threaded : bool
+        If True, convert and write the buffers in a background thread.
+    compress : bool | int
+        If True or a zlib compression level, write compressed buffers.
+    flush_size : int
+        Minimum number of bytes to collect before writing to the file.
+    alignment : int
+        The block size the chunks written to the file are aligned to.
+    """
+    def __init__(self, fid, cals, format, inv_comp, projector=None,
+                 threaded=False, compress=False, flush_size=2 ** 24,
+                 alignment=4096):
+        if not format in _write_types:
+            raise ValueError('format must be "short", "single", or "double"')
+        if compress is True:
+            compress = 6
+        if not compress in range(10):
+            raise ValueError('compress must be a bool or an int between 0 '
+                             'and 9')
+        cals = np.ravel(cals)[:, np.newaxis]
+        if inv_comp is not None:
+            operator = inv_comp / cals
+            if projector is not None:
+                operator = np.dot(operator, projector)
+        elif projector is not None:
+            operator = projector / cals
         else:
+            operator = None
+        self._fid = fid
+        self._cals = cals
+        self._operator = operator
+        self._format = format
+        self._compress = compress
+        self._flush_size = flush_size
+        self._alignment = alignment
+        self._tags = list()
+        self._n_bytes = 0
+        self._queue = None
+        self._error = None
+        if threaded:
+            self._queue = Queue.Queue(maxsize=2)
+            self._thread = threading.Thread(target=self._worker)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def write(self, buf):
+        """Convert a buffer and write it (or queue it for writing)"""
+        if buf.shape[0] != len(self._cals):
+            raise ValueError('buffer and calibration sizes do not match')
+        if not np.isrealobj(buf) and _write_types[self._format][1] is None:
             raise ValueError('only "single" and "double" supported for '
                              'writing complex data')
+        if self._queue is None:
+            self._add_tag(buf)
+        else:
+            self._check_error()
+            self._queue.put(buf)
 
-    if inv_comp is not None:
-        buf = np.dot(inv_comp / np.ravel(cals)[:, None], buf)
-    else:
-        buf = buf / np.ravel(cals)[:, None]
-
-    write_function(fid, FIFF.FIFF_DATA_BUFFER, buf)
+    def close(self):
+        """Write all remaining buffers"""
+        if self._queue is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._queue = None
+            self._check_error()
+        self._flush(pad=False)
+
+    def _worker(self):
+        """Convert and write the queued buffers until None is received"""
+        while True:
+            buf = self._queue.get()
+            if buf is None:
+                break
+            if self._error is not None:
+                continue  # discard the remaining buffers
+            try:
+                self._add_tag(buf)
+            except Exception:
+                self._error = sys.exc_info()
+
+    def _check_error(self):
+        """Raise an exception that occurred in the background thread"""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error[0], error[1], error[2]
+
+    def _add_tag(self, buf):
+        """Convert a buffer to a data buffer tag and collect it"""
+        type_, dtype = _write_types[self._format][0 if np.isrealobj(buf)
+                                                  else 1]
+        if self._operator is not None:
+            buf = np.dot(self._operator, buf)
+        else:
+            buf = buf / self._cals
+        # samples are stored one after the other (channels change fastest)
+        data = buf.T.astype(dtype).tostring()
+        kind = FIFF.FIFF_DATA_BUFFER
+        if self._compress:
+            # shuffle real and imaginary parts as separate items
+            item_size = np.dtype(dtype).itemsize
+            if not np.isrealobj(buf):
+                item_size //= 2
+            data = _compress_data(data, item_size, self._compress)
+            kind = FIFF.FIFF_MNE_COMPRESSED_DATA_BUFFER
+        header = np.array([kind, type_, len(data),
+                           FIFF.FIFFV_NEXT_SEQ], dtype='>i4').tostring()
+        self._tags.extend([header, data])
+        self._n_bytes += len(header) + len(data)
+        if self._n_bytes >= self._flush_size:
+            self._flush()
+
+    def _flush(self, pad=True):
+        """Write the collected tags to the file in one go"""
+        if len(self._tags) > 0:
+            if pad:
+                end = self._fid.tell() + self._n_bytes + 16
+                self._tags.append(_nop_tag((-end) % self._alignment))
+            self._fid.write(''.join(self._tags))
+            self._tags = list()
+            self._n_bytes = 0
 
 
 def finish_writing_raw(fid):
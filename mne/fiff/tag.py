@@ -8,6 +8,8 @@ import numpy as np
 from scipy import linalg
 import os
 import gzip
+import zlib
+import cStringIO
 
 from .constants import FIFF
 
@@ -144,6 +146,31 @@ def read_tag_info(fid):
     return tag
 
 
+def _decompress_data(fid, tag_size):
+    """Helper to decompress a tag payload written by _compress_data
+
+    Returns a file-like object holding the uncompressed payload, and the
+    size of the latter.
+    """
+    size, item_size = np.fromstring(fid.read(8), dtype='>i4')
+    data = zlib.decompress(fid.read(tag_size - 8))
+    if len(data) != size:
+        raise ValueError('Corrupted compressed tag')
+    if item_size > 1:
+        data = np.fromstring(data, np.uint8).reshape(item_size, -1)
+        data = data.T.tostring()
+    return cStringIO.StringIO(data), int(size)
+
+
+def _read_uncompressed_size(fid, ent):
+    """Helper to get the uncompressed payload size of a compressed tag
+
+    ent is the directory entry of the tag.
+    """
+    fid.seek(ent.pos + 16, 0)
+    return int(np.fromstring(fid.read(4), dtype='>i4'))
+
+
 def _fromstring_rows(fid, tag_size, dtype=None, shape=None, rlims=None):
     """Helper for getting a range of rows from a large tag"""
     if shape is not None:
@@ -188,7 +215,8 @@ def read_tag(fid, pos=None, shape=None, rlims=None):
     rlims : tuple | None
         If tuple, the first and last rows to retrieve. Note that data are
         assumed to be stored row-major in the file. Only to be used with
-        data stored as a vector (not implemented for matrices yet).
+        data stored as a vector (together with shape) or as a dense
+        matrix, in which case the rows are taken along the first dimension.
 
     Returns
     -------
@@ -201,6 +229,12 @@ def read_tag(fid, pos=None, shape=None, rlims=None):
     s = fid.read(4 * 4)
     tag = Tag(*struct.unpack(">iIii", s))
 
+    #   Compressed tags are decoded like the uncompressed ones
+    fid_orig = None
+    if tag.kind == FIFF.FIFF_MNE_COMPRESSED_DATA_BUFFER and tag.size > 0:
+        fid_orig, size_orig = fid, tag.size
+        fid, tag.size = _decompress_data(fid, tag.size)
+
     #
     #   The magic hexadecimal values
     #
@@ -215,8 +249,8 @@ def read_tag(fid, pos=None, shape=None, rlims=None):
         if matrix_coding != 0:
             matrix_coding = matrix_coding >> 16
 
-            # This should be easy to implement (see _fromstring_rows)
-            # if we need it, but for now, it's not...
+            # The dimensions of matrices are stored in the tag, rows of
+            # dense matrices can be read using rlims only
             if shape is not None:
                 raise ValueError('Row reading not implemented for matrices '
                                  'yet')
@@ -239,26 +273,44 @@ def read_tag(fid, pos=None, shape=None, rlims=None):
                                     'supported at this time')
 
                 matrix_type = data_type & tag.type
+                n_items = dims.prod()
+
+                if rlims is not None:
+                    # skip to the first row and only read the rows needed
+                    if not 0 <= rlims[0] < rlims[1] <= dims[0]:
+                        raise ValueError('rlims must yield at least one '
+                                         'output')
+                    item_size = dict([(FIFF.FIFFT_INT, 4),
+                                      (FIFF.FIFFT_JULIAN, 4),
+                                      (FIFF.FIFFT_FLOAT, 4),
+                                      (FIFF.FIFFT_DOUBLE, 8),
+                                      (FIFF.FIFFT_COMPLEX_FLOAT, 8),
+                                      (FIFF.FIFFT_COMPLEX_DOUBLE, 16)]
+                                     ).get(matrix_type, 0)
+                    row_items = dims[1:].prod()
+                    fid.seek(rlims[0] * row_items * item_size, 1)
+                    dims = np.concatenate([[rlims[1] - rlims[0]], dims[1:]])
+                    n_items = dims.prod()
 
                 if matrix_type == FIFF.FIFFT_INT:
-                    tag.data = np.fromstring(read_big(fid, 4 * dims.prod()),
+                    tag.data = np.fromstring(read_big(fid, 4 * n_items),
                                              dtype='>i4').reshape(dims)
                 elif matrix_type == FIFF.FIFFT_JULIAN:
-                    tag.data = np.fromstring(read_big(fid, 4 * dims.prod()),
+                    tag.data = np.fromstring(read_big(fid, 4 * n_items),
                                              dtype='>i4').reshape(dims)
                 elif matrix_type == FIFF.FIFFT_FLOAT:
-                    tag.data = np.fromstring(read_big(fid, 4 * dims.prod()),
+                    tag.data = np.fromstring(read_big(fid, 4 * n_items),
                                              dtype='>f4').reshape(dims)
                 elif matrix_type == FIFF.FIFFT_DOUBLE:
-                    tag.data = np.fromstring(read_big(fid, 8 * dims.prod()),
+                    tag.data = np.fromstring(read_big(fid, 8 * n_items),
                                              dtype='>f8').reshape(dims)
                 elif matrix_type == FIFF.FIFFT_COMPLEX_FLOAT:
-                    data = np.fromstring(read_big(fid, 4 * 2 * dims.prod()),
+                    data = np.fromstring(read_big(fid, 4 * 2 * n_items),
                                          dtype='>f4')
                     # Note: we need the non-conjugate transpose here
                     tag.data = (data[::2] + 1j * data[1::2]).reshape(dims)
                 elif matrix_type == FIFF.FIFFT_COMPLEX_DOUBLE:
-                    data = np.fromstring(read_big(fid, 8 * 2 * dims.prod()),
+                    data = np.fromstring(read_big(fid, 8 * 2 * n_items),
                                          dtype='>f8')
                     # Note: we need the non-conjugate transpose here
                     tag.data = (data[::2] + 1j * data[1::2]).reshape(dims)
@@ -447,9 +499,15 @@ def read_tag(fid, pos=None, shape=None, rlims=None):
                 for _ in range(tag.size / 16 - 1):
                     s = fid.read(4 * 4)
                     tag.data.append(Tag(*struct.unpack(">iIii", s)))
+            elif tag.type == FIFF.FIFFT_VOID:
+                # padding, there are no data to read
+                fid.seek(tag.size, 1)
             else:
                 raise Exception('Unimplemented tag data type %s' % tag.type)
 
+    if fid_orig is not None:
+        fid, tag.size = fid_orig, size_orig
+
     if tag.next != FIFF.FIFFV_NEXT_SEQ:
         # f.seek(tag.next,0)
         fid.seek(tag.next, 1)  # XXX : fix? pb when tag.next < 0
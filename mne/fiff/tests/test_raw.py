@@ -15,6 +15,10 @@ from nose.tools import assert_true, assert_raises, assert_equal
 
 from mne.fiff import (Raw, pick_types, pick_channels, concatenate_raws, FIFF,
                       get_chpi_positions, set_eeg_reference)
+from mne.fiff.open import fiff_open, _index_fname
+from mne.fiff.raw import (start_writing_raw, finish_writing_raw,
+                          _RawBufferWriter)
+from mne.fiff.tree import dir_tree_find
 from mne import concatenate_events, find_events
 from mne.utils import _TempDir, requires_nitime, requires_pandas
 
@@ -157,6 +161,12 @@ def test_multiple_files():
     _compare_combo(raw, raw_combo, times, n_times)
     raw_combo = Raw([fif_fname, fif_fname], preload='memmap8.dat')
     _compare_combo(raw, raw_combo, times, n_times)
+    # reading the files in parallel
+    raw_combo = Raw([fif_fname, fif_fname], preload=True, n_jobs=2)
+    assert_array_equal(raw_combo._data, raw_combo0._data)
+    raw_combo = Raw([fif_fname, fif_fname], n_jobs=2)
+    assert_array_equal(raw_combo[:, n_times - 10:n_times + 10][0],
+                       raw_combo0[:, n_times - 10:n_times + 10][0])
     assert_raises(ValueError, Raw, [fif_fname, ctf_fname])
     assert_raises(ValueError, Raw, [fif_fname, fif_bad_marked_fname])
     assert_true(raw[:, :][0].shape[1] * 2 == raw_combo0[:, :][0].shape[1])
@@ -402,6 +412,109 @@ def test_getitem():
         assert_array_equal(times, times1)
 
 
+def test_mmap():
+    """Test reading Raw through memory-mapped data buffers
+    """
+    raw = Raw(fif_fname, preload=True).crop(0, 2, copy=False)
+    raw.save(op.join(tempdir, 'raw_short.fif'), format='short',
+             buffer_size_sec=0.5, overwrite=True)
+    for fname in [fif_fname, fif_gz_fname,
+                  op.join(tempdir, 'raw_short.fif')]:
+        raw = Raw(fname)
+        raw_mmap = Raw(fname, mmap=True)
+        for sel in [slice(None), slice(0, 10), [5, 300, 2, 30]]:
+            for start, stop in [(0, 1), (100, 2000), (3, 17)]:
+                assert_array_equal(raw[sel, start:stop][0],
+                                   raw_mmap[sel, start:stop][0])
+        raw.apply_proj()
+        raw_mmap.apply_proj()
+        assert_allclose(raw[:, 100:200][0], raw_mmap[:, 100:200][0])
+        raw_mmap = Raw(fname, mmap=True, preload=True)
+        assert_array_equal(raw_mmap._data, Raw(fname, preload=True)._data)
+
+    # with CTF compensation
+    raw = Raw(ctf_comp_fname, compensation=1)
+    raw_mmap = Raw(ctf_comp_fname, compensation=1, mmap=True)
+    assert_array_equal(raw[:, :][0], raw_mmap[:, :][0])
+
+
+def test_iter_chunks():
+    """Test iterating over chunks of Raw data
+    """
+    raw = Raw(ctf_comp_fname, compensation=1)
+    raw_pre = Raw(ctf_comp_fname, compensation=1, preload=True)
+    sfreq = raw.info['sfreq']
+    picks = [3, 7, 100, 5]
+    for r in (raw, raw_pre):
+        for picks_ in (None, picks):
+            data_all, times_all = r[picks_ if picks_ else slice(None), :]
+            last = 0
+            for data, times, start in r.iter_chunks(0.1, 0.02, picks_):
+                n_times = data.shape[1]
+                assert_true(n_times <= int(np.ceil(0.1 * sfreq)))
+                assert_array_equal(data, data_all[:, start:start + n_times])
+                assert_array_equal(times, times_all[start:start + n_times])
+                if start > 0:
+                    assert_equal(start, last - int(np.ceil(0.02 * sfreq)))
+                last = start + n_times
+            assert_equal(last, r.n_times)
+        starts = [c[2] for c in r.iter_chunks(0.05, start=10, stop=50)]
+        assert_equal(starts, range(10, 50, int(np.ceil(0.05 * sfreq))))
+    assert_raises(ValueError, raw.iter_chunks(0.1, 0.1).next)
+    assert_raises(ValueError, raw.iter_chunks(0.).next)
+    assert_raises(ValueError, raw.iter_chunks(0.1, start=-1).next)
+    assert_equal(list(raw.iter_chunks(0.1, start=50, stop=50)), [])
+
+    # projections that are not applied yet
+    raw = Raw(fif_fname)
+    raw_proj = Raw(fif_fname, proj=True)
+    for data, _, start in raw.iter_chunks(1., picks=picks, proj=True,
+                                          stop=3000):
+        data_proj = raw_proj[picks, start:start + data.shape[1]][0]
+        assert_allclose(data, data_proj, rtol=1e-10, atol=1e-20)
+
+
+def test_fif_index_cache():
+    """Test reading Raw using the FIF directory index cache
+    """
+    temp_fname = op.join(tempdir, 'raw_index.fif')
+    index_fname = _index_fname(temp_fname)
+    raw = Raw(ctf_comp_fname)
+    raw.save(temp_fname, overwrite=True)
+    old_val = os.environ.get('MNE_USE_FIF_INDEX_CACHE')
+    os.environ['MNE_USE_FIF_INDEX_CACHE'] = 'true'
+    try:
+        if op.isfile(index_fname):
+            os.remove(index_fname)
+        raw_1 = Raw(temp_fname)
+        assert_true(op.isfile(index_fname))
+        raw_2 = Raw(temp_fname)  # now from the index
+        for r in (raw_1, raw_2):
+            assert_equal(r.info['ch_names'], raw.info['ch_names'])
+            assert_array_equal(r[:, :][0], raw[:, :][0])
+        _, tree_1, dir_1 = fiff_open(temp_fname)
+        os.environ['MNE_USE_FIF_INDEX_CACHE'] = 'false'
+        _, tree_2, dir_2 = fiff_open(temp_fname)
+        assert_equal(len(dir_1), len(dir_2))
+        for d1, d2 in zip(dir_1, dir_2):
+            assert_equal((d1.kind, d1.type, d1.size, d1.next, d1.pos),
+                         (d2.kind, d2.type, d2.size, d2.next, d2.pos))
+        assert_equal(len(dir_tree_find(tree_1, FIFF.FIFFB_RAW_DATA)), 1)
+        assert_equal(str(tree_1), str(tree_2))
+
+        # a modified file must not use the outdated index
+        os.environ['MNE_USE_FIF_INDEX_CACHE'] = 'true'
+        raw.crop(0, 0.2, copy=False).save(temp_fname, overwrite=True)
+        raw_3 = Raw(temp_fname)
+        assert_equal(raw_3.n_times, raw.n_times)
+        assert_array_equal(raw_3[:, :][0], raw[:, :][0])
+    finally:
+        if old_val is None:
+            del os.environ['MNE_USE_FIF_INDEX_CACHE']
+        else:
+            os.environ['MNE_USE_FIF_INDEX_CACHE'] = old_val
+
+
 def test_proj():
     """Test SSP proj operations
     """
@@ -451,6 +564,8 @@ def test_proj():
         data_proj_2, _ = raw2[:, 0:2]
         assert_allclose(data_proj_1, data_proj_2)
         assert_true(all(p['active'] for p in raw2.info['projs']))
+        picks = pick_types(raw2.info, meg='grad', exclude=[])[::3]
+        assert_allclose(data_proj_1[picks], raw2[picks, 0:2][0])
 
         # test that apply_proj works
         raw.apply_proj()
@@ -556,6 +671,51 @@ def test_filter():
     assert_array_almost_equal(data, data_notch, sig_dec_notch_fit)
 
 
+def test_filter_to_file():
+    """Test filtering data that are not preloaded into a new file
+    """
+    raw = concatenate_raws([Raw(ctf_comp_fname) for _ in range(20)])
+    picks = pick_types(raw.info, meg=True, ref_meg=False)
+    temp_fname = op.join(tempdir, 'raw_filt.fif')
+    assert_raises(RuntimeError, raw.filter, 1., 40.)
+    assert_raises(ValueError, raw.filter, 1., 40., method='iir',
+                  fname=temp_fname)
+    assert_raises(ValueError, raw.notch_filter, 60., fname=raw.info[
+                  'filenames'][0])
+    # the data are filtered in three blocks
+    for l_freq, h_freq in [(1., 40.), (None, 40.), (40., 20.)]:
+        raw = concatenate_raws([Raw(ctf_comp_fname) for _ in range(40)])
+        raw_pre = raw.copy()
+        raw_pre._preload_data(True)
+        with warnings.catch_warnings(True):
+            raw.filter(l_freq, h_freq, filter_length='200ms',
+                       fname=temp_fname, overwrite=True)
+            raw_pre.filter(l_freq, h_freq, filter_length='200ms')
+        assert_true(not raw._preloaded)
+        assert_equal(raw.info['filenames'], [op.abspath(temp_fname)])
+        assert_equal(raw.info['lowpass'], raw_pre.info['lowpass'])
+        assert_equal(raw.n_times, raw_pre.n_times)
+        data, data_pre = raw[picks, :][0], raw_pre[picks, :][0]
+        # the filtered data are saved in single precision
+        assert_allclose(data, data_pre, rtol=1e-6,
+                        atol=1e-7 * np.abs(data_pre).max())
+        assert_true(Raw(temp_fname).info['lowpass'] == raw.info['lowpass'])
+    assert_raises(ValueError, raw.filter, 1., 40., fname=temp_fname,
+                  overwrite=True)
+    assert_raises(IOError, Raw(ctf_comp_fname).filter, 1., 40.,
+                  fname=temp_fname)
+    raw = concatenate_raws([Raw(ctf_comp_fname) for _ in range(40)])
+    raw_pre = raw.copy()
+    raw_pre._preload_data(True)
+    with warnings.catch_warnings(True):
+        raw.notch_filter(60., filter_length='200ms', fname=op.join(
+                         tempdir, 'raw_notch.fif'))
+        raw_pre.notch_filter(60., filter_length='200ms')
+    data, data_pre = raw[picks, :][0], raw_pre[picks, :][0]
+    assert_allclose(data, data_pre, rtol=1e-6,
+                    atol=1e-7 * np.abs(data_pre).max())
+
+
 def test_crop():
     """Test cropping raw files
     """
@@ -797,6 +957,10 @@ def test_compensation_raw():
     assert_array_equal(times1, times3)
     # make sure it's different with a different compensation:
     assert_true(np.mean(np.abs(data1 - data3)) > 1e-12)
+    # channel subsets must match the full read
+    for sel in ([3, 7, 100, 5], slice(10, 20)):
+        data_sel, _ = raw3[sel, 13:177]
+        assert_allclose(data_sel, data3[sel, 13:177], rtol=1e-10, atol=0)
     assert_raises(ValueError, Raw, ctf_comp_fname, compensation=33)
 
     # Try IO with compensation
@@ -817,6 +981,85 @@ def test_compensation_raw():
     assert_array_equal(times1, times5)
     assert_allclose(data1, data5, rtol=1e-12, atol=1e-22)
 
+    # writing from a background thread must give the same file contents
+    temp_file_2 = op.join(tempdir, 'raw_2.fif')
+    raw3.save(temp_file_2, overwrite=True, threaded=True,
+              buffer_size_sec=0.05)
+    raw3.save(temp_file, overwrite=True, buffer_size_sec=0.05)
+    data6 = Raw(temp_file_2)[:, :][0]
+    assert_array_equal(Raw(temp_file)[:, :][0], data6)
+    assert_allclose(data1, data6, rtol=1e-12, atol=1e-22)
+
+
+def test_raw_dtype():
+    """Test reading raw data in single precision
+    """
+    for preload in [False, True]:
+        for compensation in [None, 1]:
+            raw = Raw(ctf_comp_fname, preload=preload,
+                      compensation=compensation)
+            raw_32 = Raw(ctf_comp_fname, preload=preload,
+                         compensation=compensation, dtype=np.float32)
+            data, times = raw[:, :]
+            data_32, times_32 = raw_32[:, :]
+            assert_equal(data_32.dtype, np.float32)
+            assert_array_equal(times, times_32)
+            assert_allclose(data_32, data, rtol=1e-6,
+                            atol=1e-6 * np.abs(data).max())
+            assert_equal(raw_32[3:17, 10:50][0].dtype, np.float32)
+    raw_32.apply_proj()
+    assert_equal(raw_32._data.dtype, np.float32)
+    assert_raises(ValueError, Raw, ctf_comp_fname, dtype=np.int16)
+
+
+def test_compressed_io():
+    """Test writing and reading raw data with compressed buffers
+    """
+    raw = Raw(ctf_comp_fname)
+    data, times = raw[:, :]
+    for format in ['short', 'int', 'single', 'double']:
+        fname = op.join(tempdir, 'raw.fif')
+        fname_comp = op.join(tempdir, 'raw_comp.fif')
+        raw.save(fname, format=format, buffer_size_sec=0.1, overwrite=True)
+        raw.save(fname_comp, format=format, buffer_size_sec=0.1,
+                 overwrite=True, compress=True)
+        assert_true(os.path.getsize(fname_comp) < os.path.getsize(fname))
+        for kwargs in [dict(), dict(mmap=True), dict(preload=True)]:
+            raw_read = Raw(fname, **kwargs)
+            raw_comp = Raw(fname_comp, **kwargs)
+            assert_equal(raw_comp.orig_format, raw_read.orig_format)
+            assert_array_equal(raw_comp[:, :][0], raw_read[:, :][0])
+            assert_array_equal(raw_comp[5:12, 17:123][0],
+                               raw_read[5:12, 17:123][0])
+    assert_allclose(Raw(fname_comp)[:, :][0], data, rtol=1e-12, atol=1e-22)
+    assert_raises(ValueError, raw.save, fname_comp, overwrite=True,
+                  compress=10)
+
+
+def test_write_aligned():
+    """Test aligning the chunks written by the raw buffer writer
+    """
+    raw = Raw(ctf_comp_fname)
+    data = raw[:, :][0]
+    fname = op.join(tempdir, 'raw.fif')
+    fid, cals = start_writing_raw(fname, raw.info)
+    writer = _RawBufferWriter(fid, cals, 'double', None, flush_size=10000,
+                              alignment=512)
+    for first in range(0, data.shape[1], 10):
+        writer.write(data[:, first:first + 10])
+    writer.close()
+    finish_writing_raw(fid)
+    fid, _, directory = fiff_open(fname)
+    fid.close()
+    last = max(ent.pos for ent in directory
+               if ent.kind == FIFF.FIFF_DATA_BUFFER)
+    nops = [ent for ent in directory
+            if ent.kind == FIFF.FIFF_NOP and ent.pos < last]
+    assert_true(len(nops) > 1)
+    for ent in nops:
+        assert_equal((ent.pos + 16 + ent.size) % 512, 0)
+    assert_allclose(Raw(fname)[:, :][0], data, rtol=1e-12, atol=1e-22)
+
 
 def test_set_eeg_reference():
     """ Test rereference eeg data"""
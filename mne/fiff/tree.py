@@ -3,7 +3,9 @@
 #
 # License: BSD (3-clause)
 
-from .tag import read_tag
+import numpy as np
+
+from .tag import read_tag, Tag
 from ..utils import logger, verbose
 
 
@@ -66,8 +68,9 @@ def make_dir_tree(fid, directory, start=0, indent=0, verbose=None):
                 tree['nchild'] += 1
                 tree['children'].append(child)
         elif directory[this].kind == FIFF_BLOCK_END:
-            tag = read_tag(fid, directory[start].pos)
-            if tag.data == block:
+            # children consume their own end tags, so unless we are the
+            # top level this one is ours (no need to read it)
+            if directory[start].kind == FIFF_BLOCK_START:
                 break
         else:
             tree['nent'] += 1
@@ -100,13 +103,90 @@ def make_dir_tree(fid, directory, start=0, indent=0, verbose=None):
     last = this
     return tree, last
 
+
+def _id_to_array(this_id):
+    """Helper to pack an id dict (or None) into an int array"""
+    if this_id is None:
+        return np.zeros(6, dtype=np.int64)
+    return np.array([1, this_id['version'], this_id['machid'][0],
+                     this_id['machid'][1], this_id['secs'],
+                     this_id['usecs']], dtype=np.int64)
+
+
+def _array_to_id(arr):
+    """Helper to unpack an int array made by _id_to_array"""
+    if arr[0] == 0:
+        return None
+    return dict(version=int(arr[1]),
+                machid=np.array(arr[2:4], dtype='>i4'),
+                secs=int(arr[4]), usecs=int(arr[5]))
+
+
+def _flatten_dir_tree(tree, directory):
+    """Represent a directory and its tree as a dict of arrays
+
+    Nodes are stored in pre-order, each with the index of its parent node
+    and the indices of its directory entries. This is the inverse of
+    _unflatten_dir_tree.
+    """
+    dir_idx = dict((id(ent), ii) for ii, ent in enumerate(directory))
+    blocks, parents, ids, parent_ids, ent_idx, n_ents = [], [], [], [], [], []
+
+    def _add_node(node, parent):
+        this = len(blocks)
+        blocks.append(np.atleast_1d(node['block'])[0])
+        parents.append(parent)
+        ids.append(_id_to_array(node['id']))
+        parent_ids.append(_id_to_array(node['parent_id']))
+        ents = node['directory'] if node['directory'] is not None else []
+        ent_idx.extend(dir_idx[id(ent)] for ent in ents)
+        n_ents.append(len(ents))
+        for child in node['children']:
+            _add_node(child, this)
+
+    _add_node(tree, -1)
+    out = dict()
+    out['directory'] = np.array([[ent.kind, ent.type, ent.size, ent.next,
+                                  ent.pos] for ent in directory],
+                                dtype=np.int64).reshape(-1, 5)
+    out['block'] = np.array(blocks, dtype=np.int64)
+    # the root block is an int, all others come from tags (int arrays)
+    out['block_is_array'] = np.array([isinstance(tree['block'], np.ndarray)]
+                                     + [True] * (len(blocks) - 1))
+    out['parent'] = np.array(parents, dtype=np.int64)
+    out['id'] = np.array(ids, dtype=np.int64)
+    out['parent_id'] = np.array(parent_ids, dtype=np.int64)
+    out['ent_idx'] = np.array(ent_idx, dtype=np.int64)
+    out['n_ent'] = np.array(n_ents, dtype=np.int64)
+    return out
+
+
+def _unflatten_dir_tree(arrays):
+    """Rebuild the directory and tree stored by _flatten_dir_tree"""
+    directory = [Tag(*ent) for ent in arrays['directory']]
+    ent_starts = np.concatenate([[0], np.cumsum(arrays['n_ent'])])
+    nodes = list()
+    for ii, parent in enumerate(arrays['parent']):
+        block = int(arrays['block'][ii])
+        if arrays['block_is_array'][ii]:
+            block = np.array([block], dtype='>i4')
+        ents = arrays['ent_idx'][ent_starts[ii]:ent_starts[ii + 1]]
+        node = dict(block=block, id=_array_to_id(arrays['id'][ii]),
+                    parent_id=_array_to_id(arrays['parent_id'][ii]),
+                    nent=len(ents), nchild=0, children=[],
+                    directory=[directory[e] for e in ents]
+                    if len(ents) > 0 else None)
+        if parent >= 0:
+            nodes[parent]['children'].append(node)
+            nodes[parent]['nchild'] += 1
+        nodes.append(node)
+    return nodes[0], directory
+
 ###############################################################################
 # Writing
 
-import numpy as np
 import struct
 from .constants import FIFF
-from .tag import Tag
 from .write import write_id, start_block, end_block, _write
 
 
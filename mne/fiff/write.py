@@ -12,6 +12,7 @@ import sys
 import os
 import re
 import uuid
+import zlib
 
 from .constants import FIFF
 from ..utils import logger
@@ -29,6 +30,21 @@ def _write(fid, data, kind, data_size, FIFFT_TYPE, dtype):
     fid.write(np.array(data, dtype=dtype).tostring())
 
 
+def _compress_data(data, item_size, level=6):
+    """Compress the payload of a tag
+
+    The bytes of the items are shuffled (all first bytes, then all second
+    bytes etc.) before zlib compression, which works much better on
+    numerical data. The result starts with the size of the uncompressed
+    payload and item_size (see mne.fiff.tag._decompress_data).
+    """
+    if item_size > 1:
+        data = np.fromstring(data, np.uint8).reshape(-1, item_size)
+        data = data.T.tostring()
+    header = np.array([len(data), item_size], dtype='>i4').tostring()
+    return header + zlib.compress(data, level)
+
+
 def write_int(fid, kind, data):
     """Writes a 32-bit integer tag to a fif file"""
     data_size = 4
@@ -98,7 +114,11 @@ def write_float_matrix(fid, kind, mat):
     fid.write(np.array(FIFFT_MATRIX_FLOAT, dtype='>i4').tostring())
     fid.write(np.array(data_size, dtype='>i4').tostring())
     fid.write(np.array(FIFF.FIFFV_NEXT_SEQ, dtype='>i4').tostring())
-    fid.write(np.array(mat, dtype='>f4').tostring())
+    # convert large matrices in blocks of rows to limit memory usage
+    row_size = mat[0].size if len(mat) > 0 else 1
+    n_rows = max(2 ** 24 // (4 * max(row_size, 1)), 1)
+    for start in xrange(0, len(mat), n_rows):
+        fid.write(np.array(mat[start:start + n_rows], dtype='>f4').tostring())
 
     dims = np.empty(mat.ndim + 1, dtype=np.int32)
     dims[:mat.ndim] = mat.shape[::-1]
@@ -231,6 +251,22 @@ def start_file(fname):
     return fid
 
 
+def write_padding(fid, alignment):
+    """Writes a FIFF_NOP tag so that the data of the next tag are aligned
+
+    The data of the tag written next start at a multiple of alignment bytes
+    in the file, which allows for efficient reading of parts of them.
+    """
+    fid.write(_nop_tag((-(fid.tell() + 32)) % alignment))
+
+
+def _nop_tag(data_size):
+    """A FIFF_NOP tag with data_size bytes of padding, as a string"""
+    header = np.array([FIFF.FIFF_NOP, FIFF.FIFFT_VOID, data_size,
+                       FIFF.FIFFV_NEXT_SEQ], dtype='>i4').tostring()
+    return header + '\0' * data_size
+
+
 def end_file(fid):
     """Writes the closing tags to a fif file and closes the file"""
     data_size = 0
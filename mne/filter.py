@@ -1,8 +1,9 @@
 """IIR and FIR filtering functions"""
 
 import warnings
+from fractions import Fraction
 import numpy as np
-from scipy.fftpack import fft, ifftshift, fftfreq
+from scipy.fftpack import fft, ifft, ifftshift, fftfreq
 from scipy.signal import freqz, iirdesign, iirfilter, filter_dict, get_window
 from scipy import signal, stats
 from copy import deepcopy
@@ -40,7 +41,7 @@ def is_power2(num):
 
 
 def _overlap_add_filter(x, h, n_fft=None, zero_phase=True, picks=None,
-                        n_jobs=1):
+                        n_jobs=1, h_fft=None):
     """ Filter using overlap-add FFTs.
 
     Filters the signal x using a filter with the impulse response h.
@@ -66,6 +67,9 @@ def _overlap_add_filter(x, h, n_fft=None, zero_phase=True, picks=None,
     n_jobs : int | str
         Number of jobs to run in parallel. Can be 'cuda' if scikits.cuda
         is installed properly and CUDA is initialized.
+    h_fft : 1d array | None
+        The frequency response computed by _overlap_add_fft. If None, it is
+        computed from h and n_fft.
 
     Returns
     -------
@@ -75,13 +79,84 @@ def _overlap_add_filter(x, h, n_fft=None, zero_phase=True, picks=None,
     if picks is None:
         picks = np.arange(x.shape[0])
 
+    if h_fft is None:
+        h_fft = _overlap_add_fft(h, x.shape[1], n_fft, zero_phase)
+    n_fft = len(h_fft)
+
     # Extend the signal by mirroring the edges to reduce transient filter
     # response
     n_h = len(h)
     n_edge = min(n_h, x.shape[1])
-
     n_x = x.shape[1] + 2 * n_edge - 2
 
+    # Segment length for signal x
+    n_seg = n_fft - n_h + 1
+
+    # Number of segments (including fractional segments)
+    n_segments = int(np.ceil(n_x / float(n_seg)))
+
+    # Figure out if we should use CUDA
+    n_jobs, cuda_dict, h_fft = setup_cuda_fft_multiply_repeated(n_jobs, h_fft)
+
+    if not cuda_dict['use_cuda'] and not np.iscomplexobj(x):
+        # Process the rows together, two at a time
+        picks = np.asarray(picks)
+        if n_jobs == 1:
+            x[picks] = _2d_overlap_filter(x[picks], h_fft, n_edge, n_fft,
+                                          zero_phase, n_seg)
+        else:
+            _check_njobs(n_jobs)
+            parallel, p_fun, n_jobs = parallel_func(_2d_overlap_filter,
+                                                    n_jobs)
+            picks_list = [p for p in np.array_split(picks, n_jobs)
+                          if len(p) > 0]
+            data_new = parallel(p_fun(x[p], h_fft, n_edge, n_fft,
+                                      zero_phase, n_seg)
+                                for p in picks_list)
+            for p, this_data in zip(picks_list, data_new):
+                x[p] = this_data
+    # Process each row separately
+    elif n_jobs == 1:
+        for p in picks:
+            x[p] = _1d_overlap_filter(x[p], h_fft, n_edge, n_fft, zero_phase,
+                                      n_segments, n_seg, cuda_dict)
+    else:
+        _check_njobs(n_jobs, can_be_cuda=True)
+        parallel, p_fun, _ = parallel_func(_1d_overlap_filter, n_jobs)
+        data_new = parallel(p_fun(x[p], h_fft, n_edge, n_fft, zero_phase,
+                                  n_segments, n_seg, cuda_dict)
+                            for p in picks)
+        for pp, p in enumerate(picks):
+            x[p] = data_new[pp]
+
+    return x
+
+
+def _overlap_add_fft(h, n_times, n_fft=None, zero_phase=True):
+    """Compute the frequency response used by _overlap_add_filter
+
+    Parameters
+    ----------
+    h : 1d array
+        Filter impulse response (FIR filter coefficients).
+    n_times : int
+        Length of the signals to filter.
+    n_fft : int
+        Length of the FFT. If None, the best size is determined automatically.
+    zero_phase : bool
+        If True, the amplitude response is scaled for a filter applied in
+        forward and backward direction.
+
+    Returns
+    -------
+    h_fft : 1d array
+        The frequency response, of length n_fft.
+    """
+    # The signal is extended by mirroring the edges
+    n_h = len(h)
+    n_edge = min(n_h, n_times)
+    n_x = n_times + 2 * n_edge - 2
+
     # Determine FFT length to use
     if n_fft is None:
         if n_x > n_h:
@@ -124,30 +199,67 @@ def _overlap_add_filter(x, h, n_fft=None, zero_phase=True, picks=None,
         idx = np.where(np.abs(h_fft) > 1e-6)
         h_fft[idx] = h_fft[idx] / np.sqrt(np.abs(h_fft[idx]))
 
-    # Segment length for signal x
-    n_seg = n_fft - n_h + 1
+    return h_fft
 
-    # Number of segments (including fractional segments)
-    n_segments = int(np.ceil(n_x / float(n_seg)))
 
-    # Figure out if we should use CUDA
-    n_jobs, cuda_dict, h_fft = setup_cuda_fft_multiply_repeated(n_jobs, h_fft)
+def _2d_overlap_filter(x, h_fft, n_edge, n_fft, zero_phase, n_seg,
+                       max_size=2 ** 26):
+    """Do overlap-add FFT FIR filtering of the rows of x
 
-    # Process each row separately
-    if n_jobs == 1:
-        for p in picks:
-            x[p] = _1d_overlap_filter(x[p], h_fft, n_edge, n_fft, zero_phase,
-                                      n_segments, n_seg, cuda_dict)
-    else:
-        _check_njobs(n_jobs, can_be_cuda=True)
-        parallel, p_fun, _ = parallel_func(_1d_overlap_filter, n_jobs)
-        data_new = parallel(p_fun(x[p], h_fft, n_edge, n_fft, zero_phase,
-                                  n_segments, n_seg, cuda_dict)
-                            for p in picks)
-        for pp, p in enumerate(picks):
-            x[p] = data_new[pp]
-
-    return x
+    As h is real, two rows are filtered with one complex FFT, the first
+    as the real and the second as the imaginary part. The rows are
+    processed in blocks of at most max_size bytes. Each pass filters the
+    padded block in place, one segment at a time: the part of the output
+    of a segment that falls into the next segments is carried over, so
+    that the output of a segment is final once the segment has been read.
+    The second (zero-phase) pass runs on the reversed view of the output
+    of the first.
+    """
+    n_rows, n_times = x.shape
+    n_pad = n_edge - 1
+    n_x = n_times + 2 * n_pad
+    n_tail = n_fft - n_seg
+    out = np.empty(x.shape, dtype=x.dtype)
+    # rows per block, rounded to an even number so rows can be paired
+    block_size = 2 * max(max_size // (32 * n_x), 1)
+    work = np.zeros(((min(block_size, n_rows) + 1) // 2, n_fft),
+                    dtype=np.complex128)
+    for first in range(0, n_rows, block_size):
+        this_x = x[first:first + block_size]
+        n_pairs = (len(this_x) + 1) // 2
+        this_work = work[:n_pairs]
+        # pad to reduce ringing, as with _smart_pad, and pair the rows
+        buf = np.empty((n_pairs, n_x), dtype=np.complex128)
+        for part, rows in ((buf.real, this_x[::2]),
+                           (buf.imag, this_x[1::2])):
+            if len(rows) < n_pairs:
+                part[-1] = 0.
+            part = part[:len(rows)]
+            part[:, n_pad:n_pad + n_times] = rows
+            part[:, :n_pad] = 2 * rows[:, :1] - rows[:, n_pad:0:-1]
+            part[:, n_pad + n_times:] = (2 * rows[:, -1:] -
+                                         rows[:, -2:-n_pad - 2:-1])
+        x_ext = buf
+        for pass_no in range(2) if zero_phase else range(1):
+            if pass_no == 1:
+                # second pass: flip signal
+                buf = buf[:, ::-1]
+            tail = None
+            for start in range(0, n_x, n_seg):
+                stop = min(start + n_seg, n_x)
+                this_work[:, :stop - start] = buf[:, start:stop]
+                this_work[:, stop - start:] = 0.
+                prod = ifft(fft(this_work, overwrite_x=True) * h_fft,
+                            overwrite_x=True)
+                if tail is not None:
+                    prod[:, :n_tail] += tail
+                buf[:, start:stop] = prod[:, :stop - start]
+                tail = prod[:, n_seg:]
+        # Remove mirrored edges that we added, buf[:, ::-1] is x_ext
+        x_ext = x_ext[:, n_pad:n_pad + n_times]
+        out[first:first + 2 * n_pairs:2] = x_ext.real
+        out[first + 1:first + 2 * n_pairs:2] = x_ext.imag[:len(this_x) // 2]
+    return out
 
 
 def _1d_overlap_filter(x, h_fft, n_edge, n_fft, zero_phase, n_segments, n_seg,
@@ -230,8 +342,176 @@ def _prep_for_filtering(x, copy, picks=None):
     return x, orig_shape, picks
 
 
+# issue a warning if the attenuation of an FIR filter is less than this (dB)
+_min_att_db = 20
+
+# FIR filters designed by _filter, see _get_fir_design
+_fir_design_cache = dict()
+_fir_design_keys = list()  # least recently used first
+_fir_design_cache_size = 32
+_fir_design_cache_bytes = 2 ** 24  # memory used by the cached arrays
+
+
+def _get_fir_design(design, N, freq, gain, *args):
+    """Get the output of design(N, freq, gain, *args) from the cache
+
+    Designing a filter with firwin2 and computing its frequency response
+    usually takes longer than filtering short signals, e.g. epochs, so the
+    most recently used filters are kept, as long as their arrays take less
+    than _fir_design_cache_bytes in total. Designs which are larger on
+    their own, e.g. the frequency responses for long signals filtered with
+    filter_length=None, are not cached. The returned arrays are read-only.
+    """
+    key = (design.__name__, N, tuple(freq), tuple(gain)) + args
+    if key in _fir_design_cache:
+        _fir_design_keys.remove(key)
+        _fir_design_keys.append(key)
+        return _fir_design_cache[key]
+    out = design(N, freq, gain, *args)
+    for o in out:
+        if isinstance(o, np.ndarray):
+            o.flags.writeable = False
+    n_bytes = _design_nbytes(out)
+    if n_bytes <= _fir_design_cache_bytes:
+        cache_bytes = sum(_design_nbytes(o)
+                          for o in _fir_design_cache.itervalues())
+        while len(_fir_design_keys) > 0 and \
+                (len(_fir_design_keys) >= _fir_design_cache_size or
+                 cache_bytes + n_bytes > _fir_design_cache_bytes):
+            cache_bytes -= _design_nbytes(
+                _fir_design_cache.pop(_fir_design_keys.pop(0)))
+        _fir_design_cache[key] = out
+        _fir_design_keys.append(key)
+    return out
+
+
+def _design_nbytes(out):
+    """The memory used by the arrays of a filter design"""
+    return sum(o.nbytes for o in out if isinstance(o, np.ndarray))
+
+
+def _design_fir(N, freq, gain):
+    """Design the FIR filter of length N and get its attenuation"""
+    H = firwin2(N, freq, gain)
+    att_db, att_freq = _filter_attenuation(H, freq, gain)
+    return H, att_db, att_freq
+
+
+def _design_fft_filter(N, freq, gain):
+    """Design the zero-phase filter used for signals of length N"""
+    H, att_db, att_freq = _design_fir(N, freq, gain)
+    # Make zero-phase filter function
+    B = np.abs(fft(H))
+    return B, att_db, att_freq
+
+
+def _design_overlap_add(N, freq, gain, n_times):
+    """Design the filter of length N used for signals of length n_times"""
+    H, att_db, att_freq = _design_fir(N, freq, gain)
+    H_fft = _overlap_add_fft(H, n_times, zero_phase=True)
+    return H, H_fft, att_db, att_freq
+
+
+def _get_overlap_add_design(freq, gain, filter_length, n_times):
+    """Get the overlap-add filter _filter uses for signals of n_times
+
+    freq are the normalized frequencies. The length of the filter is
+    filter_length, made odd or even depending on the gain at the Nyquist
+    frequency.
+    """
+    N = filter_length
+    if (gain[-1] == 0.0 and N % 2 == 1) \
+            or (gain[-1] == 1.0 and N % 2 != 1):
+        # Gain at Nyquist freq: 1: make N EVEN, 0: make N ODD
+        N += 1
+    return _get_fir_design(_design_overlap_add, N, freq, gain, n_times)
+
+
+def _overlap_add_blocks(n_times, n_h, n_fft, block_size):
+    """Split a signal into blocks to filter them separately
+
+    Filtering each block with _overlap_add_filter and the h_fft of the
+    whole signal gives exactly the same output as filtering the whole
+    signal: as the zero-phase filter is not exactly of length n_h, its
+    output depends on where the segments start, so the blocks are read
+    such that the segments of both passes are aligned with those of the
+    whole signal, with margins beyond which a segment does not affect the
+    output (n_fft + n_seg).
+
+    Parameters
+    ----------
+    n_times : int
+        Length of the whole signal.
+    n_h : int
+        Length of the filter.
+    n_fft : int
+        Length of the FFT (of h_fft) used for the whole signal.
+    block_size : int
+        The output is computed in blocks of a multiple of block_size
+        samples, at least twice as long as the margins.
+
+    Returns
+    -------
+    blocks : list of tuple
+        The (start, stop, first, last) of each block: the samples in
+        [start, stop) are filtered to get the output in [first, last).
+    """
+    n_seg = n_fft - n_h + 1
+    margin = n_fft + n_seg
+    block_size *= int(np.ceil(2. * margin / block_size))
+    blocks = list()
+    for first in range(0, n_times, block_size):
+        last = min(first + block_size, n_times)
+        # start and n_times - stop are multiples of n_seg
+        start = max(((first - margin) // n_seg) * n_seg, 0)
+        stop = min(n_times - ((n_times - last - margin) // n_seg) * n_seg,
+                   n_times)
+        blocks.append((start, stop, first, last))
+    return blocks
+
+
+def _fir_gains(Fs, f_pass, f_stop, btype):
+    """Get the frequencies (in Hz) and gains that define an FIR filter
+
+    f_pass and f_stop are the edges of the pass and stop bands, as for
+    construct_iir_filter, and btype is 'low', 'high', 'bandpass' or
+    'bandstop'. For 'bandstop', the edges can be arrays to specify
+    several stop bands.
+    """
+    Fs = float(Fs)
+    if btype == 'low':
+        freq = [0, f_pass, f_stop, Fs / 2]
+        gain = [1, 1, 0, 0]
+    elif btype == 'high':
+        freq = [0, f_stop, f_pass, Fs / 2]
+        gain = [0, 0, 1, 1]
+    elif btype == 'bandpass':
+        freq = [0, f_stop[0], f_pass[0], f_pass[1], f_stop[1], Fs / 2]
+        gain = [0, 0, 1, 1, 0, 0]
+    elif btype == 'bandstop':
+        Fp1, Fp2 = np.atleast_1d(f_pass[0]), np.atleast_1d(f_pass[1])
+        Fs1, Fs2 = np.atleast_1d(f_stop[0]), np.atleast_1d(f_stop[1])
+        freq = np.r_[0, Fp1, Fs1, Fs2, Fp2, Fs / 2]
+        gain = np.r_[1, np.ones_like(Fp1), np.zeros_like(Fs1),
+                     np.zeros_like(Fs2), np.ones_like(Fp2), 1]
+        order = np.argsort(freq)
+        freq = freq[order]
+        gain = gain[order]
+        if np.any(np.abs(np.diff(gain, 2)) > 1):
+            raise ValueError('Stop bands are not sufficiently separated.')
+    else:
+        raise ValueError('btype must be "low", "high", "bandpass" or '
+                         '"bandstop", not "%s"' % btype)
+    freq = np.array(freq, dtype=np.float64)
+    if freq[1] <= 0 or freq[-2] > Fs / 2 or np.any(np.diff(freq) < 0):
+        raise ValueError('Filter specification invalid: the transition '
+                         'bands must lie between 0 and %s Hz (Nyquist) '
+                         'and must not overlap' % (Fs / 2))
+    return freq, np.array(gain, dtype=np.float64)
+
+
 def _filter(x, Fs, freq, gain, filter_length='10s', picks=None, n_jobs=1,
-            copy=True):
+            copy=True, n_times=None):
     """Filter signal using gain control points in the frequency domain.
 
     The filter impulse response is constructed from a Hamming window (window
@@ -265,6 +545,9 @@ def _filter(x, Fs, freq, gain, filter_length='10s', picks=None, n_jobs=1,
     copy : bool
         If True, a copy of x, filtered, is returned. Otherwise, it operates
         on x in place.
+    n_times : int | None
+        If x is a block of a longer signal (see _overlap_add_blocks), the
+        length of the whole signal, for which the filter is designed.
 
     Returns
     -------
@@ -273,16 +556,15 @@ def _filter(x, Fs, freq, gain, filter_length='10s', picks=None, n_jobs=1,
     """
     # set up array for filtering, reshape to 2D, operate on last axis
     x, orig_shape, picks = _prep_for_filtering(x, copy, picks)
-
-    # issue a warning if attenuation is less than this
-    min_att_db = 20
+    if n_times is None:
+        n_times = x.shape[1]
 
     # normalize frequencies
     freq = np.array([f / (Fs / 2) for f in freq])
     gain = np.array(gain)
-    filter_length = _get_filter_length(filter_length, Fs, len_x=x.shape[1])
+    filter_length = _get_filter_length(filter_length, Fs, len_x=n_times)
 
-    if filter_length is None or x.shape[1] <= filter_length:
+    if filter_length is None or n_times <= filter_length:
         # Use direct FFT filtering for short signals
 
         Norig = x.shape[1]
@@ -295,17 +577,13 @@ def _filter(x, Fs, freq, gain, filter_length='10s', picks=None, n_jobs=1,
 
         N = x.shape[1] + (extend_x is True)
 
-        H = firwin2(N, freq, gain)[np.newaxis, :]
-
-        att_db, att_freq = _filter_attenuation(H, freq, gain)
-        if att_db < min_att_db:
+        B, att_db, att_freq = _get_fir_design(_design_fft_filter, N, freq,
+                                              gain)
+        if att_db < _min_att_db:
             att_freq *= Fs / 2
             warnings.warn('Attenuation at stop frequency %0.1fHz is only '
                           '%0.1fdB.' % (att_freq, att_db))
 
-        # Make zero-phase filter function
-        B = np.abs(fft(H)).ravel()
-
         # Figure out if we should use CUDA
         n_jobs, cuda_dict, B = setup_cuda_fft_multiply_repeated(n_jobs, B)
 
@@ -321,25 +599,18 @@ def _filter(x, Fs, freq, gain, filter_length='10s', picks=None, n_jobs=1,
                 x[p] = data_new[pp]
     else:
         # Use overlap-add filter with a fixed length
-        N = filter_length
-
-        if (gain[-1] == 0.0 and N % 2 == 1) \
-                or (gain[-1] == 1.0 and N % 2 != 1):
-            # Gain at Nyquist freq: 1: make N EVEN, 0: make N ODD
-            N += 1
-
-        H = firwin2(N, freq, gain)
-
-        att_db, att_freq = _filter_attenuation(H, freq, gain)
+        H, H_fft, att_db, att_freq = _get_overlap_add_design(freq, gain,
+                                                             filter_length,
+                                                             n_times)
         att_db += 6  # the filter is applied twice (zero phase)
-        if att_db < min_att_db:
+        if att_db < _min_att_db:
             att_freq *= Fs / 2
             warnings.warn('Attenuation at stop frequency %0.1fHz is only '
                           '%0.1fdB. Increase filter_length for higher '
                           'attenuation.' % (att_freq, att_db))
 
         x = _overlap_add_filter(x, H, zero_phase=True, picks=picks,
-                                n_jobs=n_jobs)
+                                n_jobs=n_jobs, h_fft=H_fft)
 
     x.shape = orig_shape
     return x
@@ -591,8 +862,7 @@ def band_pass_filter(x, Fs, Fp1, Fp2, filter_length='10s',
                          'transition bandwidth (l_trans_bandwidth)' % Fs1)
 
     if method == 'fft':
-        freq = [0, Fs1, Fp1, Fp2, Fs2, Fs / 2]
-        gain = [0, 0, 1, 1, 0, 0]
+        freq, gain = _fir_gains(Fs, [Fp1, Fp2], [Fs1, Fs2], 'bandpass')
         xf = _filter(x, Fs, freq, gain, filter_length, picks, n_jobs, copy)
     else:
         iir_params = construct_iir_filter(iir_params, [Fp1, Fp2],
@@ -696,14 +966,7 @@ def band_stop_filter(x, Fs, Fp1, Fp2, filter_length='10s',
                          'transition bandwidth (l_trans_bandwidth)' % Fs1)
 
     if method == 'fft':
-        freq = np.r_[0, Fp1, Fs1, Fs2, Fp2, Fs / 2]
-        gain = np.r_[1, np.ones_like(Fp1), np.zeros_like(Fs1),
-                     np.zeros_like(Fs2), np.ones_like(Fp2), 1]
-        order = np.argsort(freq)
-        freq = freq[order]
-        gain = gain[order]
-        if np.any(np.abs(np.diff(gain, 2)) > 1):
-            raise ValueError('Stop bands are not sufficiently separated.')
+        freq, gain = _fir_gains(Fs, [Fp1, Fp2], [Fs1, Fs2], 'bandstop')
         xf = _filter(x, Fs, freq, gain, filter_length, picks, n_jobs, copy)
     else:
         for fp_1, fp_2, fs_1, fs_2 in zip(Fp1, Fp2, Fs1, Fs2):
@@ -790,8 +1053,7 @@ def low_pass_filter(x, Fs, Fp, filter_length='10s', trans_bandwidth=0.5,
                          '(maximum based on Nyquist is %s)' % (Fstop, Fs / 2.))
 
     if method == 'fft':
-        freq = [0, Fp, Fstop, Fs / 2]
-        gain = [1, 1, 0, 0]
+        freq, gain = _fir_gains(Fs, Fp, Fstop, 'low')
         xf = _filter(x, Fs, freq, gain, filter_length, picks, n_jobs, copy)
     else:
         iir_params = construct_iir_filter(iir_params, Fp, Fstop, Fs, 'low')
@@ -879,8 +1141,7 @@ def high_pass_filter(x, Fs, Fp, filter_length='10s', trans_bandwidth=0.5,
                          'bandwidth (trans_bandwidth)' % Fstop)
 
     if method == 'fft':
-        freq = [0, Fstop, Fp, Fs / 2]
-        gain = [0, 0, 1, 1]
+        freq, gain = _fir_gains(Fs, Fp, Fstop, 'high')
         xf = _filter(x, Fs, freq, gain, filter_length, picks, n_jobs, copy)
     else:
         iir_params = construct_iir_filter(iir_params, Fp, Fstop, Fs, 'high')
@@ -891,6 +1152,178 @@ def high_pass_filter(x, Fs, Fp, filter_length='10s', trans_bandwidth=0.5,
     return xf
 
 
+@verbose
+def filter_bank(x, Fs, bands, filter_length='10s', l_trans_bandwidth=0.5,
+                h_trans_bandwidth=0.5, picks=None, output='real', n_jobs=1,
+                verbose=None):
+    """Band-pass filter the signal x in several frequency bands at once
+
+    Applies zero-phase band-pass filters to the signal x, operating on the
+    last dimension. This is faster than calling band_pass_filter for each
+    band, as each segment of the signal is Fourier transformed only once
+    for all bands.
+
+    Parameters
+    ----------
+    x : array
+        Signal to filter.
+    Fs : float
+        Sampling rate in Hz.
+    bands : list of tuple
+        The pass-bands (Fp1, Fp2) in Hz.
+    filter_length : str (Default: '10s') | int | None
+        Length of the filter to use. If None or "len(x) < filter_length",
+        the filter length used is len(x). Otherwise, if int, overlap-add
+        filtering with a filter of the specified length in samples) is
+        used (faster for long signals). If str, a human-readable time in
+        units of "s" or "ms" (e.g., "10s" or "5500ms") will be converted
+        to the shortest power-of-two length at least that duration.
+    l_trans_bandwidth : float
+        Width of the transition band at the low cut-off frequency in Hz.
+    h_trans_bandwidth : float
+        Width of the transition band at the high cut-off frequency in Hz.
+    picks : list of int | None
+        Indices to filter. If None all indices will be filtered. The other
+        indices are returned unchanged for each band.
+    output : str
+        'real' returns the filtered signals, 'analytic' their analytic
+        signals (as computed with scipy.signal.hilbert) and 'envelope'
+        the amplitude of the analytic signals.
+    n_jobs : int
+        Number of jobs to run in parallel.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+
+    Returns
+    -------
+    xf : array, shape=(n_bands,) + x.shape
+        x filtered in each band. The array is complex if
+        output == 'analytic'.
+
+    Notes
+    -----
+    The filters are designed as in band_pass_filter (with an odd length).
+    Here they are applied once with their delay compensated instead of
+    forward and backward, which only changes the sign of the ripples in
+    the stop bands. For the analytic signals, the negative frequencies of the
+    filters are removed, so no separate Hilbert transform is needed.
+    """
+    if output not in ['real', 'analytic', 'envelope']:
+        raise ValueError('output must be "real", "analytic" or "envelope", '
+                         'not "%s"' % output)
+    # use a view, so that reshaping does not change the shape of x
+    x = np.asarray(x).view()
+    orig_shape = x.shape
+    x, _, picks = _prep_for_filtering(x, False, picks)
+
+    Fs = float(Fs)
+    n_times = x.shape[1]
+    filter_length = _get_filter_length(filter_length, Fs, len_x=n_times)
+    if filter_length is None or filter_length > n_times:
+        filter_length = n_times
+    # odd length: the delay of the filters is an integer
+    N = filter_length + (filter_length % 2 == 0)
+
+    kernels = list()
+    for Fp1, Fp2 in bands:
+        Fp1 = float(Fp1)
+        Fp2 = float(Fp2)
+        Fs1 = Fp1 - l_trans_bandwidth
+        Fs2 = Fp2 + h_trans_bandwidth
+        if Fs2 > Fs / 2:
+            raise ValueError('Effective band-stop frequency (%s) is too high '
+                             '(maximum based on Nyquist is %s)'
+                             % (Fs2, Fs / 2.))
+        if Fs1 <= 0:
+            raise ValueError('Filter specification invalid: Lower stop '
+                             'frequency too low (%0.1fHz). Increase Fp1 or '
+                             'reduce transition bandwidth '
+                             '(l_trans_bandwidth)' % Fs1)
+        freq, gain = _fir_gains(Fs, [Fp1, Fp2], [Fs1, Fs2], 'bandpass')
+        freq /= Fs / 2
+        h_fft, att_db, att_freq = _get_fir_design(_design_band_kernel, N,
+                                                  freq, gain, n_times,
+                                                  output != 'real')
+        if att_db < _min_att_db:
+            warnings.warn('Attenuation at stop frequency %0.1fHz is only '
+                          '%0.1fdB. Increase filter_length for higher '
+                          'attenuation.' % (att_freq * Fs / 2, att_db))
+        kernels.append(h_fft)
+
+    dtype = np.complex128 if output == 'analytic' else np.float64
+    xf = np.empty((len(bands),) + x.shape, dtype=dtype)
+    xf[:] = x
+    if len(picks) > 0 and n_times > 0:
+        picks = np.asarray(picks)
+        if n_jobs == 1:
+            xf[:, picks] = _filter_bank_rows(x[picks], kernels, N, output)
+        else:
+            _check_njobs(n_jobs)
+            parallel, p_fun, n_jobs = parallel_func(_filter_bank_rows,
+                                                    n_jobs)
+            picks_list = [p for p in np.array_split(picks, n_jobs)
+                          if len(p) > 0]
+            data_new = parallel(p_fun(x[p], kernels, N, output)
+                                for p in picks_list)
+            for p, this_data in zip(picks_list, data_new):
+                xf[:, p] = this_data
+    xf.shape = (len(bands),) + orig_shape
+    return xf
+
+
+def _design_band_kernel(N, freq, gain, n_times, analytic):
+    """Design the filter bank kernel of length N for signals of n_times
+
+    If analytic, the negative frequencies are removed from the filter. Its
+    impulse response is then computed with a longer FFT and truncated to
+    the N samples of the filter, where it is concentrated.
+    """
+    h, att_db, att_freq = _design_fir(N, freq, gain)
+    h_fft = _overlap_add_fft(h, n_times, zero_phase=False)
+    if analytic:
+        n_fft = 8 * 2 ** int(np.ceil(np.log2(N)))
+        h_a = fft(h, n_fft)
+        h_a[1:n_fft // 2] *= 2
+        h_a[n_fft // 2 + 1:] = 0
+        h_fft = fft(ifft(h_a)[:N], len(h_fft))
+    return h_fft, att_db, att_freq
+
+
+def _filter_bank_rows(x, kernels, n_h, output, max_size=2 ** 26):
+    """Do overlap-add FIR filtering of the rows of x with all kernels
+
+    Each segment is Fourier transformed once and multiplied with the
+    kernels of all bands. The output is shifted by the delay of the
+    filters, n_h // 2, to make it zero-phase.
+    """
+    n_rows, n_times = x.shape
+    n_fft = len(kernels[0])
+    n_pad = n_h // 2
+    n_x = n_times + 2 * n_pad
+    n_seg = n_fft - n_h + 1
+    dtype = np.float64 if output == 'real' else np.complex128
+    xf = np.empty((len(kernels), n_rows, n_times),
+                  dtype=np.complex128 if output == 'analytic' else np.float64)
+    # rows per block, the output of all bands is accumulated for a block
+    block_size = max(max_size // (16 * len(kernels) * (n_x + n_fft)), 1)
+    for first in range(0, n_rows, block_size):
+        rows = slice(first, min(first + block_size, n_rows))
+        # pad to reduce ringing, as with _smart_pad
+        x_ext = _pad_segment(x[rows], -n_pad, n_times + n_pad)
+        y = np.zeros((len(kernels), len(x_ext), n_x + n_fft), dtype=dtype)
+        for start in range(0, n_x, n_seg):
+            seg_fft = fft(x_ext[:, start:start + n_seg], n_fft)
+            for bi, h_fft in enumerate(kernels):
+                prod = ifft(seg_fft * h_fft)
+                if output == 'real':
+                    prod = prod.real
+                y[bi, :, start:start + n_fft] += prod
+        # Remove mirrored edges and the delay of the filter
+        y = y[:, :, n_h - 1:n_h - 1 + n_times]
+        xf[:, rows] = np.abs(y) if output == 'envelope' else y
+    return xf
+
+
 @verbose
 def notch_filter(x, Fs, freqs, filter_length='10s', notch_widths=None,
                  trans_bandwidth=1, method='fft',
@@ -993,25 +1426,12 @@ def notch_filter(x, Fs, freqs, filter_length='10s', notch_widths=None,
 
     # Only have to deal with notch_widths for non-autodetect
     if freqs is not None:
-        if notch_widths is None:
-            notch_widths = freqs / 200.0
-        elif np.any(notch_widths < 0):
-            raise ValueError('notch_widths must be >= 0')
-        else:
-            notch_widths = np.atleast_1d(notch_widths)
-            if len(notch_widths) == 1:
-                notch_widths = notch_widths[0] * np.ones_like(freqs)
-            elif len(notch_widths) != len(freqs):
-                raise ValueError('notch_widths must be None, scalar, or the '
-                                 'same length as freqs')
+        notch_widths = _notch_widths(freqs, notch_widths)
 
     if method in ['fft', 'iir']:
         # Speed this up by computing the fourier coefficients once
         tb_2 = trans_bandwidth / 2.0
-        lows = [freq - nw / 2.0 - tb_2
-                for freq, nw in zip(freqs, notch_widths)]
-        highs = [freq + nw / 2.0 + tb_2
-                 for freq, nw in zip(freqs, notch_widths)]
+        lows, highs = _notch_bands(freqs, notch_widths, trans_bandwidth)
         xf = band_stop_filter(x, Fs, lows, highs, filter_length, tb_2, tb_2,
                               method, iir_params, picks, n_jobs, copy)
     elif method == 'spectrum_fit':
@@ -1021,6 +1441,36 @@ def notch_filter(x, Fs, freqs, filter_length='10s', notch_widths=None,
     return xf
 
 
+def _notch_widths(freqs, notch_widths):
+    """Get the width of the stop band at each of the freqs"""
+    freqs = np.atleast_1d(freqs)
+    if notch_widths is None:
+        notch_widths = freqs / 200.0
+    elif np.any(notch_widths < 0):
+        raise ValueError('notch_widths must be >= 0')
+    else:
+        notch_widths = np.atleast_1d(notch_widths)
+        if len(notch_widths) == 1:
+            notch_widths = notch_widths[0] * np.ones_like(freqs)
+        elif len(notch_widths) != len(freqs):
+            raise ValueError('notch_widths must be None, scalar, or the '
+                             'same length as freqs')
+    return notch_widths
+
+
+def _notch_bands(freqs, notch_widths, trans_bandwidth):
+    """Get the edges of the pass bands around the notches of notch_filter
+
+    The stop bands are trans_bandwidth / 2 narrower.
+    """
+    freqs = np.atleast_1d(freqs).astype(np.float64)
+    notch_widths = _notch_widths(freqs, notch_widths)
+    tb_2 = trans_bandwidth / 2.0
+    lows = freqs - notch_widths / 2.0 - tb_2
+    highs = freqs + notch_widths / 2.0 + tb_2
+    return lows, highs
+
+
 def _mt_spectrum_proc(x, sfreq, line_freqs, notch_widths, mt_bandwidth,
                       p_value, picks, n_jobs, copy):
     """Helper to more easily call _mt_spectrum_remove"""
@@ -1158,7 +1608,8 @@ def _mt_spectrum_remove(x, sfreq, line_freqs, notch_widths,
 
 
 @verbose
-def resample(x, up, down, npad=100, window='boxcar', n_jobs=1, verbose=None):
+def resample(x, up, down, npad=100, window='boxcar', n_jobs=1, method='fft',
+             verbose=None):
     """Resample the array x
 
     Operates along the last dimension of the array.
@@ -1172,12 +1623,18 @@ def resample(x, up, down, npad=100, window='boxcar', n_jobs=1, verbose=None):
     down : float
         Factor to downsample by.
     npad : integer
-        Number of samples to use at the beginning and end for padding.
+        Number of samples to use at the beginning and end for padding
+        (only used if method == 'fft').
     window : string or tuple
-        See scipy.signal.resample for description.
+        See scipy.signal.resample for description (only used if
+        method == 'fft').
     n_jobs : int | str
         Number of jobs to run in parallel. Can be 'cuda' if scikits.cuda
         is installed properly and CUDA is initialized.
+    method : str
+        'fft' resamples each signal at once in the frequency domain.
+        'polyphase' uses polyphase FIR filtering, which needs up / down to
+        be a ratio of integers of at most 1000, e.g. 1000. / 5000.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -1188,23 +1645,59 @@ def resample(x, up, down, npad=100, window='boxcar', n_jobs=1, verbose=None):
 
     Notes
     -----
-    This uses (hopefully) intelligent edge padding and frequency-domain
-    windowing improve scipy.signal.resample's resampling method, which
-    we have adapted for our use here. Choices of npad and window have
-    important consequences, and the default choices should work well
-    for most natural signals.
-
-    Resampling arguments are broken into "up" and "down" components for future
-    compatibility in case we decide to use an upfirdn implementation. The
-    current implementation is functionally equivalent to passing
-    up=up/down and down=1.
+    With method='fft', this uses (hopefully) intelligent edge padding and
+    frequency-domain windowing improve scipy.signal.resample's resampling
+    method, which we have adapted for our use here. Choices of npad and
+    window have important consequences, and the default choices should
+    work well for most natural signals. This method is functionally
+    equivalent to passing up=up/down and down=1.
+
+    With method='polyphase', the signal is upsampled by up, low-pass
+    filtered and downsampled by down, computing only the output samples
+    (see _resample_polyphase). The filter is the Hamming-windowed FIR
+    filter of scipy.signal.decimate for max(up, down). The data are
+    processed in chunks, so, unlike with method='fft', the memory needed
+    does not grow with the length of the signal. This is also faster for
+    long signals and small up and down.
     """
+    method = method.lower()
+    if method not in ['fft', 'polyphase']:
+        raise RuntimeError('method should be fft or polyphase (not %s)'
+                           % method)
     # make sure our arithmetic will work
     ratio = float(up) / down
     x, orig_shape = _prep_for_filtering(x, False)[:2]
 
     x_len = x.shape[1]
-    if x_len > 0:
+    if x_len > 0 and method == 'polyphase':
+        frac = Fraction(ratio).limit_denominator(1000)
+        up, down = frac.numerator, frac.denominator
+        if up > 1000 or abs(float(up) / down - ratio) > 1e-10 * ratio:
+            raise ValueError('method="polyphase" needs the resampling '
+                             'ratio to be up / down with integers of at '
+                             'most 1000, got %s' % ratio)
+        if up == down:
+            h = np.ones(1)
+        else:
+            h = _decim_filter(max(up, down)) * up
+        if n_jobs == 'cuda':
+            n_jobs = 1
+        if n_jobs == 1:
+            y = _resample_polyphase(x, h, up, down)
+        else:
+            _check_njobs(n_jobs, can_be_cuda=True)
+            parallel, p_fun, n_jobs = parallel_func(_resample_polyphase,
+                                                    n_jobs)
+            rows = [r for r in np.array_split(np.arange(len(x)), n_jobs)
+                    if len(r) > 0]
+            y = np.concatenate(parallel(p_fun(x[r], h, up, down)
+                                        for r in rows))
+
+        # Restore the original array shape (modified for resampling)
+        orig_shape = list(orig_shape)
+        orig_shape[-1] = y.shape[1]
+        y.shape = tuple(orig_shape)
+    elif x_len > 0:
         # prep for resampling now
         orig_len = x_len + 2 * npad  # length after padding
         new_len = int(round(ratio * orig_len))  # length after resampling
@@ -1252,6 +1745,75 @@ def resample(x, up, down, npad=100, window='boxcar', n_jobs=1, verbose=None):
     return y
 
 
+def _resample_polyphase(x, h, up, down, max_size=2 ** 26):
+    """Resample the rows of x by up / down with polyphase FIR filtering
+
+    This computes y[n] = sum_j h[j] * xu[n * down + len(h) // 2 - j],
+    where xu is x upsampled by inserting up - 1 zeros after each sample.
+    Only the taps h[j] that fall on nonzero samples of xu are used: the
+    outputs n, n + up, n + 2 * up, ... use the same taps (phase) and
+    the samples of x down apart, so they are computed with _fir_decimate.
+    The outputs are computed in chunks of at most max_size bytes, and the
+    edges are padded as with _smart_pad.
+
+    Parameters
+    ----------
+    x : 2d array
+        The signals to resample.
+    h : 1d array
+        The low-pass filter, of odd length and symmetric (zero phase).
+    up : int
+        Factor to upsample by.
+    down : int
+        Factor to downsample by.
+    max_size : int
+        Maximum size of a chunk of the input in bytes.
+
+    Returns
+    -------
+    y : 2d array
+        The resampled signals, of length round(x.shape[1] * up / down).
+    """
+    n_rows, n_times = x.shape
+    n_out = int(round(n_times * up / float(down)))
+    half = len(h) // 2
+    n_taps = -(-len(h) // up)  # most taps of a phase
+    y = np.empty((n_rows, n_out), dtype=np.result_type(x.dtype, np.float32))
+    # outputs per chunk, a multiple of up
+    chunk = max(max_size // (8 * n_rows * max(down, 1)), 1) * up
+    for n_start in range(0, n_out, chunk):
+        n_stop = min(n_start + chunk, n_out)
+        # the samples of x used by the outputs of this chunk
+        x_start = (n_start * down + half) // up - n_taps + 1
+        x_stop = ((n_stop - 1) * down + half) // up + 1
+        x_seg = _pad_segment(x, x_start, x_stop)
+        for n_first in range(n_start, min(n_start + up, n_stop)):
+            t = n_first * down + half
+            taps = h[t % up::up][::-1]
+            first = t // up - x_start - len(taps) + 1
+            n_phase = len(range(n_first, n_stop, up))
+            stop = first + (n_phase - 1) * down + len(taps)
+            y[:, n_first:n_stop:up] = _fir_decimate(x_seg[:, :stop], taps,
+                                                    first, down)
+    return y
+
+
+def _pad_segment(x, start, stop):
+    """Get x[:, start:stop], padding outside of x as with _smart_pad"""
+    n_times = x.shape[1]
+    x_seg = x[:, max(start, 0):min(stop, n_times)]
+    if start >= 0 and stop <= n_times:
+        return x_seg
+    if start < 0:
+        idx = np.minimum(np.arange(-start, 0, -1), n_times - 1)
+        x_seg = np.c_[2 * x[:, :1] - x[:, idx], x_seg]
+    if stop > n_times:
+        idx = np.maximum(np.arange(n_times - 2, 2 * n_times - 2 - stop, -1),
+                         0)
+        x_seg = np.c_[x_seg, 2 * x[:, -1:] - x[:, idx]]
+    return x_seg
+
+
 def detrend(x, order=1, axis=-1):
     """Detrend the array x.
 
@@ -1293,6 +1855,242 @@ def detrend(x, order=1, axis=-1):
     return y
 
 
+class StreamingFilter(object):
+    """Causal filter for data that arrive in consecutive buffers
+
+    Note that with method='fft' the output lags the input by half the
+    filter length, i.e. by about 5 s with the default filter_length of
+    '10s'. For a low latency, use a short filter_length (with wider
+    transition bands for a sufficient attenuation) or method='iir'.
+
+    The filter keeps its state between calls, so that filtering a signal
+    buffer by buffer gives the same result as filtering it at once,
+    without edge artifacts at the buffer boundaries. This makes it
+    possible to filter e.g. the raw buffers received by an RtClient::
+
+        filt = StreamingFilter(info['sfreq'], 1., 40., picks=picks,
+                               method='iir')
+        client.register_receive_callback(lambda x: process(filt.filter(x)))
+
+    Parameters
+    ----------
+    sfreq : float
+        The sampling frequency in Hz.
+    l_freq : float | None
+        Low cut-off frequency in Hz. If None the data are only low-passed.
+    h_freq : float | None
+        High cut-off frequency in Hz. If None the data are only
+        high-passed. If l_freq > h_freq, a band-stop filter is used.
+    picks : array-like of int | None
+        Indices of the rows to filter. If None all rows are filtered.
+        The other rows are returned unchanged.
+    filter_length : str | int
+        Length of the FIR filter to use (if method == 'fft'). If int, the
+        length in samples. If str, a human-readable time in units of "s"
+        or "ms" (e.g., "10s" or "500ms") will be converted to the shortest
+        power-of-two length at least that duration. The filter delays the
+        signal by half its length, so for a shorter delay use a shorter
+        filter (with wider transition bands) or method='iir'.
+    l_trans_bandwidth : float
+        Width of the transition band at the low cut-off frequency in Hz.
+    h_trans_bandwidth : float
+        Width of the transition band at the high cut-off frequency in Hz.
+    method : str
+        'fft' will use an FIR filter, applied with overlap-save FFTs.
+        'iir' will use IIR forward filtering.
+    iir_params : dict
+        Dictionary of parameters to use for IIR filtering.
+        See mne.filter.construct_iir_filter for details.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+
+    Notes
+    -----
+    Unlike the other filtering functions, which apply the filter forward
+    and backward, the filter is only applied forward: the FIR filter
+    delays the signal by (filter_length - 1) / 2 samples and the IIR
+    filter has a frequency dependent delay. The amplitude response is
+    that of the filter applied once.
+
+    Before the first buffer, the signal is assumed to be constant, so the
+    output starts without a transient for signals with a DC offset.
+    """
+    @verbose
+    def __init__(self, sfreq, l_freq, h_freq, picks=None,
+                 filter_length='10s', l_trans_bandwidth=0.5,
+                 h_trans_bandwidth=0.5, method='fft',
+                 iir_params=dict(order=4, ftype='butter'), verbose=None):
+        method = method.lower()
+        if method not in ['fft', 'iir']:
+            raise RuntimeError('method should be fft or iir (not %s)'
+                               % method)
+        if l_freq is None and h_freq is None:
+            raise ValueError('l_freq and h_freq cannot both be None')
+
+        Fs = float(sfreq)
+        if l_freq is None:
+            logger.info('Low-pass filtering at %0.2g Hz' % h_freq)
+            f_pass, f_stop = h_freq, h_freq + h_trans_bandwidth
+            btype = 'low'
+        elif h_freq is None:
+            logger.info('High-pass filtering at %0.2g Hz' % l_freq)
+            f_pass, f_stop = l_freq, l_freq - l_trans_bandwidth
+            btype = 'high'
+        elif l_freq < h_freq:
+            logger.info('Band-pass filtering from %0.2g - %0.2g Hz'
+                        % (l_freq, h_freq))
+            f_pass = [l_freq, h_freq]
+            f_stop = [l_freq - l_trans_bandwidth, h_freq + h_trans_bandwidth]
+            btype = 'bandpass'
+        else:
+            logger.info('Band-stop filtering from %0.2g - %0.2g Hz'
+                        % (h_freq, l_freq))
+            f_pass = [h_freq, l_freq]
+            f_stop = [h_freq + h_trans_bandwidth, l_freq - l_trans_bandwidth]
+            btype = 'bandstop'
+        # the edges of a band-stop filter are sorted by _fir_gains
+        if btype == 'bandstop' and f_stop[0] > f_stop[1]:
+            raise ValueError('Filter specification invalid: the transition '
+                             'bands must not overlap')
+        freq, gain = _fir_gains(Fs, f_pass, f_stop, btype)
+
+        if method == 'fft':
+            N = _get_filter_length(filter_length, Fs)
+            if (gain[-1] == 0.0 and N % 2 == 1) \
+                    or (gain[-1] == 1.0 and N % 2 != 1):
+                # Gain at Nyquist freq: 1: make N EVEN, 0: make N ODD
+                N += 1
+            self._b, att_db, att_freq = _get_fir_design(_design_fir, N,
+                                                        freq / (Fs / 2), gain)
+            self._a = np.array([1.])
+            if att_db < _min_att_db:
+                warnings.warn('Attenuation at stop frequency %0.1fHz is '
+                              'only %0.1fdB. Increase filter_length for '
+                              'higher attenuation.'
+                              % (att_freq * Fs / 2, att_db))
+        else:
+            iir_params = construct_iir_filter(iir_params, f_pass, f_stop, Fs,
+                                              btype)
+            self._b = np.asarray(iir_params['b'], dtype=np.float64)
+            self._a = np.asarray(iir_params['a'], dtype=np.float64)
+        self.method = method
+        self.picks = picks
+        # FFTs of the FIR filter for each FFT length used
+        self._b_fft = dict()
+        self.reset()
+
+    def reset(self):
+        """Reset the state, the next buffer starts a new signal"""
+        self._zi = None
+        self._shape = None
+
+    def filter(self, x):
+        """Filter the next buffer of the signal
+
+        Parameters
+        ----------
+        x : array, shape=(..., n_times)
+            The next buffer, filtered along the last dimension. The other
+            dimensions must be the same for all buffers.
+
+        Returns
+        -------
+        xf : array, shape=(..., n_times)
+            The filtered buffer.
+        """
+        x, orig_shape, picks = _prep_for_filtering(x, True, self.picks)
+        if x.shape[1] == 0:
+            x.shape = orig_shape
+            return x
+        n_zi = max(len(self._a), len(self._b)) - 1
+        if self._zi is None:
+            # the signal was constant before
+            if self.method == 'fft':
+                self._zi = np.repeat(x[picks, :1], n_zi, axis=1)
+            else:
+                self._zi = signal.lfilter_zi(self._b, self._a) * x[picks, :1]
+            self._shape = orig_shape[:-1]
+        elif orig_shape[:-1] != self._shape:
+            raise ValueError('The shape of the buffer %s does not match '
+                             'the shape of the previous buffers %s'
+                             % (orig_shape[:-1], self._shape))
+        if self.method == 'fft':
+            x[picks] = self._overlap_save(x[picks])
+        else:
+            x[picks], self._zi = signal.lfilter(self._b, self._a, x[picks],
+                                                zi=self._zi)
+        x.shape = orig_shape
+        return x
+
+    def _overlap_save(self, x):
+        """Do overlap-save FIR filtering, using the last inputs in _zi"""
+        n_h = len(self._b)
+        n_times = x.shape[1]
+        x_ext = np.concatenate((self._zi, x), axis=1)
+        self._zi = x_ext[:, n_times:].copy()
+        # Use one FFT for short buffers and segments of at least the
+        # filter length for long ones
+        n_fft = 2 ** int(np.ceil(np.log2(min(n_times, 2 * n_h) + n_h - 1)))
+        if n_fft not in self._b_fft:
+            self._b_fft[n_fft] = np.fft.rfft(self._b, n_fft)
+        b_fft = self._b_fft[n_fft]
+        n_seg = n_fft - n_h + 1
+        xf = np.empty_like(x)
+        for start in range(0, n_times, n_seg):
+            stop = min(start + n_seg, n_times)
+            seg = np.fft.rfft(x_ext[:, start:stop + n_h - 1], n_fft)
+            prod = np.fft.irfft(seg * b_fft, n_fft)
+            # the first n_h - 1 samples are wrapped around
+            xf[:, start:stop] = prod[:, n_h - 1:n_h - 1 + stop - start]
+        return xf
+
+
+def _decim_filter(decim):
+    """The anti-aliasing FIR filter used to decimate by decim
+
+    This is the filter of scipy.signal.decimate with ftype='fir': a
+    Hamming-windowed low-pass filter of 20 * decim + 1 taps with a cutoff
+    at the Nyquist frequency of the decimated data.
+    """
+    return signal.firwin(20 * decim + 1, 1. / decim, window='hamming')
+
+
+def _fir_decimate(x, h, first, decim):
+    """Filter x along the last axis with h and decimate the result
+
+    Only the output samples first, first + decim, ... are computed, one
+    filter tap at a time over strided views of x (a polyphase
+    decimation). The last axis of x has len(h) - 1 more samples than the
+    (full-rate) output, so that output sample k is centered on sample
+    k + len(h) // 2 of x.
+
+    Parameters
+    ----------
+    x : array
+        The data, with the filter margins along the last axis.
+    h : array
+        The filter, of odd length and symmetric (zero phase).
+    first : int
+        The first output sample to compute.
+    decim : int
+        The decimation factor.
+
+    Returns
+    -------
+    y : array
+        The filtered and decimated data.
+    """
+    n_out = len(range(first, x.shape[-1] - len(h) + 1, decim))
+    dtype = np.result_type(x.dtype, np.float32)
+    y = np.zeros(x.shape[:-1] + (n_out,), dtype=dtype)
+    if n_out == 0:
+        return y
+    for ii, tap in enumerate(h.astype(x.real.dtype)):
+        start = first + ii
+        y += tap * x[..., start:start + decim * (n_out - 1) + 1:decim]
+    return y
+
+
 def _get_filter_length(filter_length, sfreq, min_length=128, len_x=np.inf):
     """Helper to determine a reasonable filter length"""
     if not isinstance(min_length, int):
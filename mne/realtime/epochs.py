@@ -16,7 +16,7 @@ from ..baseline import rescale
 from ..epochs import _BaseEpochs
 from ..event import _find_events
 from ..filter import detrend
-from ..fiff.proj import setup_proj
+from ..fiff.proj import setup_proj, _projector_vecs, _project
 
 
 class RtEpochs(_BaseEpochs):
@@ -148,6 +148,7 @@ class RtEpochs(_BaseEpochs):
         self.proj = proj
         self._projector, self.info = setup_proj(self.info, add_eeg_ref,
                                                 activate=self.proj)
+        self._proj_vecs = _projector_vecs(self.info)
 
         self._client = client
 
@@ -363,7 +364,7 @@ class RtEpochs(_BaseEpochs):
 
         # apply SSP
         if self.proj and self._projector is not None:
-            epoch = np.dot(self._projector, epoch)
+            epoch = _project(self._proj_vecs, epoch)
 
         # Detrend
         if self.detrend is not None:
@@ -526,7 +526,7 @@ class _BaseSourceEstimate(object):
 
     @verbose
     def resample(self, sfreq, npad=100, window='boxcar', n_jobs=1,
-                 verbose=None):
+                 method='fft', verbose=None):
         """Resample data
 
         Parameters
@@ -539,6 +539,9 @@ class _BaseSourceEstimate(object):
             Window to use in resampling. See scipy.signal.resample.
         n_jobs : int
             Number of jobs to run in parallel.
+        method : str
+            Resampling method, 'fft' or 'polyphase' (uses less memory for
+            long data). See mne.filter.resample.
         verbose : bool, str, int, or None
             If not None, override default verbose level (see mne.verbose).
             Defaults to self.verbose.
@@ -555,7 +558,8 @@ class _BaseSourceEstimate(object):
         self._remove_kernel_sens_data_()
 
         o_sfreq = 1.0 / self.tstep
-        self._data = resample(self._data, sfreq, o_sfreq, npad, n_jobs=n_jobs)
+        self._data = resample(self._data, sfreq, o_sfreq, npad, n_jobs=n_jobs,
+                              method=method)
 
         # adjust indirectly affected variables
         self.tstep = 1.0 / sfreq
@@ -3,6 +3,7 @@
 #
 # License: BSD (3-clause)
 
+import os
 import os.path as op
 from copy import deepcopy
 
@@ -11,15 +12,22 @@ from nose.tools import assert_true, assert_equal, assert_raises
 from numpy.testing import (assert_array_equal, assert_array_almost_equal,
                            assert_allclose)
 import numpy as np
+from scipy import signal
 import copy as cp
 import warnings
 
 from mne import fiff, Epochs, read_events, pick_events, read_epochs
-from mne.epochs import bootstrap, equalize_epoch_counts, combine_event_ids
+from mne.epochs import (bootstrap, equalize_epoch_counts, combine_event_ids,
+                        _SpanReader, _is_good, _is_good_batch,
+                        _EpochsStats, _Preprocessor)
 from mne.utils import _TempDir, requires_pandas, requires_nitime
 from mne.fiff import read_evoked
+from mne.fiff.pick import channel_indices_by_type
 from mne.fiff.proj import _has_eeg_average_ref_proj
 from mne.event import merge_events
+from mne.fixes import in1d
+from mne.filter import detrend
+from mne.baseline import rescale
 
 warnings.simplefilter('always')  # enable b/c these tests throw warnings
 
@@ -313,6 +321,38 @@ def test_reject_epochs():
     assert_true(epochs.times[epochs._reject_time][-1] <= 0.1)
 
 
+def test_reject_epochs_batch():
+    """Test rejection of many epochs at once
+    """
+    epochs = Epochs(raw, events, event_id, tmin, tmax, picks=picks,
+                    baseline=(None, 0), preload=True)
+    data = epochs.get_data()
+    idx = channel_indices_by_type(epochs.info)
+    reject_crazy = dict(grad=1000e-15, mag=4e-12, eeg=80e-9, eog=150e-9)
+    flat_crazy = dict(grad=1e-11, mag=1e-15)
+    ignore_chs = [epochs.ch_names[0]]
+    good, bad_lists = _is_good_batch(data, epochs.ch_names, idx,
+                                     reject_crazy, flat_crazy,
+                                     ignore_chs=ignore_chs)
+    assert_equal(good.shape, (len(data),))
+    assert_true(np.any(~good))
+    for e, this_good, bad_list in zip(data, good, bad_lists):
+        # the peak-to-peak amplitudes of one epoch at a time
+        bad_ref = list()
+        for thresh_dict, compare in [(reject_crazy, np.greater),
+                                     (flat_crazy, np.less)]:
+            for key, thresh in thresh_dict.items():
+                for ii in idx[key]:
+                    if epochs.ch_names[ii] in ignore_chs:
+                        continue
+                    if compare(e[ii].max() - e[ii].min(), thresh):
+                        bad_ref.append(epochs.ch_names[ii])
+        assert_equal(this_good, len(bad_ref) == 0)
+        assert_equal(sorted(bad_list or []), sorted(bad_ref))
+        assert_equal(_is_good(e, epochs.ch_names, idx, reject_crazy,
+                              flat_crazy, ignore_chs=ignore_chs), this_good)
+
+
 def test_preload_epochs():
     """Test preload of epochs
     """
@@ -330,6 +370,257 @@ def test_preload_epochs():
                               epochs.average().data, 18)
 
 
+def test_epochs_from_preloaded_raw():
+    """Test batched extraction of epochs from preloaded raw data
+    """
+    raw_preload = fiff.Raw(raw_fname, preload=True, add_eeg_ref=False)
+    # include events too close to the beginning and the end of the data
+    events_edge = np.concatenate([[[raw.first_samp + 10, 0, event_id]],
+                                  events[:12],
+                                  [[raw.last_samp - 10, 0, event_id]]])
+    for kwargs in [dict(), dict(proj=False, detrend=1, decim=3),
+                   dict(proj='delayed', reject=reject, flat=flat),
+                   dict(baseline=None, detrend=0, reject=reject),
+                   dict(detrend=1, decim=3, decim_filter=True)]:
+        epochs = Epochs(raw, events_edge, event_id, tmin, tmax,
+                        picks=picks, **kwargs)
+        epochs_preload = Epochs(raw_preload, events_edge, event_id, tmin,
+                                tmax, picks=picks, **kwargs)
+        assert_allclose(epochs_preload.get_data(), epochs.get_data(),
+                        rtol=1e-10, atol=1e-20)
+        assert_equal(epochs_preload.drop_log, epochs.drop_log)
+        assert_equal(epochs_preload.drop_log[0], ['NO_DATA'])
+        assert_equal(epochs_preload.drop_log[-1], ['TOO_SHORT'])
+
+
+def test_epochs_n_jobs():
+    """Test projecting and preprocessing epochs in parallel
+    """
+    raw_preload = fiff.Raw(raw_fname, preload=True, add_eeg_ref=False)
+    for this_raw, kwargs in [(raw, dict(detrend=1, decim=3)),
+                             (raw_preload, dict(detrend=1)),
+                             (raw, dict(proj='delayed', reject=reject,
+                                        flat=flat))]:
+        epochs = Epochs(this_raw, events, event_id, tmin, tmax, picks=picks,
+                        preload=True, **kwargs)
+        epochs_par = Epochs(this_raw, events, event_id, tmin, tmax,
+                            picks=picks, preload=True, n_jobs=2, **kwargs)
+        assert_array_equal(epochs.get_data(), epochs_par.get_data())
+        assert_equal(epochs.drop_log, epochs_par.drop_log)
+
+
+def test_preprocessor():
+    """Test detrending, baseline correction and decimation in one pass
+    """
+    rng = np.random.RandomState(0)
+    times = np.arange(-20, 41) / 100.
+    data = rng.randn(4, 5, len(times)) + np.arange(len(times))
+    for order, detrend_picks in [(None, None), (0, [0, 1, 2, 3, 4]),
+                                 (1, [1, 3]), (1, [])]:
+        for baseline in [None, (None, 0), (-0.1, 0.1), (None, None)]:
+            for decim_idx in [None, slice(1, None, 3)]:
+                preprocessor = _Preprocessor(None, 5, times, order,
+                                             detrend_picks, baseline,
+                                             decim_idx)
+                offset = rng.randn(5, len(times[decim_idx or slice(None)]))
+                want = data.copy()
+                if order is not None and len(detrend_picks) > 0:
+                    want[:, detrend_picks] = detrend(want[:, detrend_picks],
+                                                     order, axis=-1)
+                want = rescale(want, times, baseline, 'mean')
+                want = want[..., decim_idx or slice(None)] + offset
+                assert_allclose(preprocessor(data.copy(), offset), want,
+                                rtol=1e-10, atol=1e-10)
+                assert_allclose(preprocessor(data[0].astype(np.float32),
+                                             offset),
+                                want[0], rtol=1e-4, atol=1e-4)
+
+
+def test_epochs_span_reads():
+    """Test reading overlapping epochs through merged spans
+    """
+    # overlapping, adjacent, unsorted and out of range events
+    samps = np.concatenate([events[:6, 0], events[:6, 0] + 20,
+                            events[8:2:-1, 0], [raw.last_samp - 10]])
+    events_span = np.c_[samps, np.zeros(len(samps), int),
+                        event_id * np.ones(len(samps), int)]
+    epochs = Epochs(raw, events_span, event_id, tmin, tmax, picks=picks,
+                    proj='delayed', reject=reject, flat=flat)
+    sfreq = raw.info['sfreq']
+    starts = np.array([int(round(s + tmin * sfreq)) for s in samps])
+    starts -= raw.first_samp
+    good = starts + epochs._epoch_stop <= raw.n_times
+    for max_size in [1, 2 ** 26]:
+        reader = _SpanReader(raw, np.asarray(picks), starts, good,
+                             epochs._epoch_stop, max_size=max_size)
+        if max_size == 1:
+            assert_equal(len(reader.spans), np.sum(good))
+        else:
+            assert_true(len(reader.spans) < np.sum(good))
+        data = reader(np.where(good)[0])
+        for ii, idx in enumerate(np.where(good)[0]):
+            data_raw, _ = raw[picks, starts[idx]:starts[idx] +
+                              epochs._epoch_stop]
+            assert_array_equal(data[:, ii], data_raw)
+    for idx, (epoch, epoch_raw) in enumerate(epochs._get_epochs_from_disk(
+            proj=True)):
+        epoch_ref, epoch_raw_ref = epochs._get_epoch_from_disk(idx,
+                                                                proj=True)
+        if epoch_ref is None:
+            assert_true(epoch is None)
+        else:
+            assert_array_equal(epoch, epoch_ref)
+            assert_array_equal(epoch_raw, epoch_raw_ref)
+
+
+def test_epochs_memmap():
+    """Test storing epochs data in a memmap
+    """
+    old_val = os.environ.get('MNE_CACHE_DIR')
+    os.environ['MNE_CACHE_DIR'] = tempdir
+    try:
+        event_ids = dict(a=1, b=2, c=3, d=4)
+        epochs = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                        reject=reject, flat=flat, preload=True)
+        epochs_mm = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                           reject=reject, flat=flat, preload='memmap')
+        assert_true(isinstance(epochs_mm._data, np.memmap))
+        assert_equal(epochs.drop_log, epochs_mm.drop_log)
+        assert_array_equal(epochs.get_data(), epochs_mm.get_data())
+        assert_array_almost_equal(epochs.average().data,
+                                  epochs_mm.average().data)
+        assert_array_almost_equal(epochs.standard_error().data,
+                                  epochs_mm.standard_error().data)
+        for key in ['a', ['a', 'b'], slice(1, 4), [0, 2], 1]:
+            assert_true(isinstance(epochs_mm[key]._data, np.memmap))
+            assert_array_equal(epochs[key].get_data(),
+                               epochs_mm[key].get_data())
+        for e in (epochs, epochs_mm):
+            e.crop(0., 0.1)
+            e.drop_picks(e.picks[:2])
+            e.equalize_event_counts(['a', 'b'], copy=False)
+        assert_true(isinstance(epochs_mm._data, np.memmap))
+        assert_array_equal(epochs.get_data(), epochs_mm.get_data())
+
+        epochs.save(op.join(tempdir, 'test-epo.fif'))
+        epochs_read = read_epochs(op.join(tempdir, 'test-epo.fif'),
+                                  preload='memmap')
+        assert_true(isinstance(epochs_read._data, np.memmap))
+        assert_array_almost_equal(epochs_read.get_data(), epochs.get_data())
+        assert_raises(ValueError, Epochs, raw, events, event_id, tmin, tmax,
+                      preload='foo')
+    finally:
+        if old_val is None:
+            os.environ.pop('MNE_CACHE_DIR', None)
+        else:
+            os.environ['MNE_CACHE_DIR'] = old_val
+
+
+def test_read_epochs_no_preload():
+    """Test reading selected epochs from a file without preloading
+    """
+    event_ids = dict(a=1, b=2, c=3, d=4)
+    epochs = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                    reject=reject, flat=flat, preload=True)
+    fname = op.join(tempdir, 'test-epo.fif')
+    epochs.save(fname)
+    epochs_read = read_epochs(fname, preload=False)
+    assert_true(epochs_read._data is None)
+    assert_array_equal(epochs_read.events, epochs.events)
+    data = read_epochs(fname).get_data()
+    assert_array_almost_equal(epochs_read.get_data(), data)
+    for key in ['a', ['b', 'c'], slice(1, 4), [3, 0, 3], 1]:
+        assert_array_almost_equal(epochs_read[key].get_data(),
+                                  epochs[key].get_data())
+    epochs_a = epochs_read['a']
+    assert_array_almost_equal(epochs_a.average().data,
+                              epochs['a'].average().data)
+    epochs_a.drop_epochs([0])
+    epochs_a.drop_picks(epochs_a.picks[:2])
+    assert_array_almost_equal(epochs_a.get_data(),
+                              epochs['a'].get_data()[1:, 2:])
+    assert_array_almost_equal(next(iter(epochs_read)), data[0])
+
+
+def test_epochs_stats():
+    """Test single pass average and standard error of all event ids
+    """
+    rng = np.random.RandomState(0)
+    data = rng.randn(20, 3, 5) + 1e3
+    event_ids = rng.randint(1, 4, 20)
+    stats = _EpochsStats()
+    for sl in [slice(0, 1), slice(1, 12), slice(12, 20)]:
+        stats.update(data[sl], event_ids[sl])
+    for ids in [[1], [2, 3], [1, 2, 3]]:
+        this_data = data[in1d(event_ids, ids)]
+        n, mean, m2 = stats.combine(ids)
+        assert_equal(n, len(this_data))
+        assert_array_almost_equal(mean, np.mean(this_data, axis=0))
+        assert_array_almost_equal(np.sqrt(m2 / n),
+                                  np.std(this_data, axis=0))
+
+    event_ids = dict(a=1, b=2, c=3, d=4)
+    epochs = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                    reject=reject, flat=flat)
+    epochs_preload = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                            reject=reject, flat=flat, preload=True)
+    for key in ['a', ['b', 'c']]:
+        for e, e_preload in [(epochs[key], epochs_preload[key]),
+                             (epochs, epochs_preload)]:
+            evoked, evoked_preload = e.average(), e_preload.average()
+            assert_equal(evoked.nave, evoked_preload.nave)
+            assert_array_almost_equal(evoked.data, evoked_preload.data)
+            assert_array_almost_equal(e.standard_error().data,
+                                      e_preload.standard_error().data)
+    # the statistics are not computed again for the event ids
+    epochs_a = epochs['a']
+    epochs_a.raw = None
+    assert_array_almost_equal(epochs_a.average().data,
+                              epochs_preload['a'].average().data)
+    epochs.drop_bad_epochs()
+    epochs_a = epochs['a']
+    epochs_a.raw = None
+    epochs_a.average()
+    # but they are if the epochs change
+    epochs_a.drop_epochs([0])
+    assert_raises(ValueError, epochs_a.average)
+    # or if the preprocessing changes
+    epochs.average()
+    for kwargs in [dict(baseline=None), dict(baseline=None, detrend=0)]:
+        for attr, value in kwargs.items():
+            setattr(epochs, attr, value)
+        epochs_new = Epochs(raw, events, event_ids, tmin, tmax, picks=picks,
+                            reject=reject, flat=flat, **kwargs)
+        assert_allclose(epochs.average().data, epochs_new.average().data,
+                        rtol=1e-7, atol=1e-20)
+
+
+def test_epochs_dtype():
+    """Test single precision epochs
+    """
+    tempdir = _TempDir()
+    epochs = Epochs(raw, events[:8], event_id, tmin, tmax, picks=picks,
+                    baseline=(None, 0), detrend=1, proj=True)
+    data = epochs.get_data()
+    for preload in [True, False]:
+        epochs_32 = Epochs(raw, events[:8], event_id, tmin, tmax,
+                           picks=picks, baseline=(None, 0), detrend=1,
+                           proj=True, preload=preload, dtype=np.float32)
+        data_32 = epochs_32.get_data()
+        assert_equal(data_32.dtype, np.float32)
+        assert_allclose(data_32, data, rtol=1e-4,
+                        atol=1e-5 * np.abs(data).max())
+    epochs_32.save(op.join(tempdir, 'test-epo.fif'))
+    # the data are read in the precision of the file by default
+    epochs_read = read_epochs(op.join(tempdir, 'test-epo.fif'))
+    assert_equal(epochs_read.get_data().dtype, np.float32)
+    epochs_read = read_epochs(op.join(tempdir, 'test-epo.fif'),
+                              dtype=np.float64)
+    assert_equal(epochs_read.get_data().dtype, np.float64)
+    assert_raises(ValueError, Epochs, raw, events[:8], event_id, tmin, tmax,
+                  dtype=np.int16)
+
+
 def test_indexing_slicing():
     """Test of indexing and slicing operations
     """
@@ -465,6 +756,43 @@ def test_resample():
     assert_true(np.allclose(data_up, epochs._data, rtol=1e-8, atol=1e-16))
 
 
+def test_epochs_decim_filter():
+    """Test anti-aliased decimation of epochs
+    """
+    raw_preload = fiff.Raw(raw_fname, preload=True, add_eeg_ref=False)
+    decim = 4
+    kwargs = dict(picks=picks[:20], decim=decim, decim_filter=True,
+                  baseline=None, proj=False)
+    epochs = Epochs(raw_preload, events, event_id, tmin, tmax, preload=True,
+                    **kwargs)
+    assert_equal(epochs.info['sfreq'], raw.info['sfreq'] / decim)
+    assert_true(epochs.info['lowpass'] <= epochs.info['sfreq'] / 2.)
+    data = epochs.get_data()
+    # filtering all the raw data gives the same epochs
+    h = signal.firwin(20 * decim + 1, 1. / decim, window='hamming')
+    raw_data = raw_preload._data[picks[:20]]
+    raw_filt = np.array([np.convolve(x, h, 'same') for x in raw_data])
+    sfreq = raw.info['sfreq']
+    for epoch, event in zip(data, epochs.events):
+        start = int(round(event[0] + tmin * sfreq)) - raw.first_samp
+        stop = start + len(epochs._raw_times)
+        if start < 10 * decim or stop + 10 * decim > raw.n_times:
+            continue  # the edges are padded differently
+        assert_allclose(epoch, raw_filt[:, start:stop][:, epochs._decim_idx],
+                        rtol=1e-10, atol=1e-20)
+    # same with non-preloaded raw, preloaded or not, and with projection
+    epochs = Epochs(raw, events, event_id, tmin, tmax, **kwargs)
+    assert_allclose(epochs.get_data(), data, rtol=1e-10, atol=1e-20)
+    assert_allclose(np.array([e for e in epochs]), data, rtol=1e-10,
+                    atol=1e-20)
+    kwargs.update(proj=True, detrend=1, baseline=(None, 0))
+    epochs = Epochs(raw, events, event_id, tmin, tmax, **kwargs)
+    epochs_preload = Epochs(raw_preload, events, event_id, tmin, tmax,
+                            preload=True, **kwargs)
+    assert_allclose(epochs.get_data(), epochs_preload.get_data(),
+                    rtol=1e-10, atol=1e-20)
+
+
 def test_detrend():
     """Test detrending of epochs
     """
@@ -3,15 +3,21 @@ from numpy.testing import assert_array_almost_equal, assert_almost_equal
 from nose.tools import assert_true, assert_raises
 import os.path as op
 import warnings
-from scipy.signal import resample as sp_resample
+from scipy.signal import resample as sp_resample, hilbert
 
 from mne.filter import (band_pass_filter, high_pass_filter, low_pass_filter,
                         band_stop_filter, resample, construct_iir_filter,
-                        notch_filter, detrend)
+                        notch_filter, detrend, _overlap_add_filter,
+                        _1d_overlap_filter, _fir_design_cache,
+                        _fir_design_keys, _fir_design_cache_size,
+                        _fir_design_cache_bytes, _design_nbytes,
+                        StreamingFilter, _resample_polyphase, _decim_filter,
+                        filter_bank, _get_fir_design, _design_fir)
 
 from mne import set_log_file
 from mne.utils import _TempDir, sum_squared
-from mne.cuda import requires_cuda
+from mne.cuda import requires_cuda, _smart_pad
+from mne.fixes import firwin2
 
 warnings.simplefilter('always')  # enable b/c these tests throw warnings
 
@@ -147,6 +153,185 @@ def test_filters():
     assert_true(iir_params['b'].size - 1 == 4)
 
 
+def test_overlap_add_rows():
+    """Test overlap-add filtering of several rows at once
+    """
+    x = np.random.randn(5, 3000)
+    h = np.hanning(101)
+    h /= h.sum()
+    n_fft = 512
+    n_seg = n_fft - len(h) + 1
+    n_segments = int(np.ceil((x.shape[1] + 2 * (len(h) - 1)) /
+                             float(n_seg)))
+    cuda_dict = dict(use_cuda=False)
+    for zero_phase in [True, False]:
+        h_fft = np.fft.fft(np.r_[h, np.zeros(n_fft - len(h))])
+        if zero_phase:
+            # same amplitude response for the forward-backward filter
+            idx = np.abs(h_fft) > 1e-6
+            h_fft[idx] /= np.sqrt(np.abs(h_fft[idx]))
+        want = np.array([_1d_overlap_filter(row, h_fft, len(h),
+                                            n_fft, zero_phase, n_segments,
+                                            n_seg, cuda_dict) for row in x])
+        for n_jobs in [1, 2]:
+            # an odd number of picks, the other rows are left alone
+            picks = [0, 2, 3]
+            x_filt = _overlap_add_filter(x.copy(), h, n_fft, zero_phase,
+                                         picks, n_jobs)
+            assert_array_almost_equal(x_filt[picks], want[picks], 10)
+            assert_array_almost_equal(x_filt[[1, 4]], x[[1, 4]], 15)
+
+
+def test_fir_design_cache():
+    """Test caching of FIR filter designs
+    """
+    Fs = 500.
+    a = np.random.randn(2, 2000)
+    for filter_length in [None, 1024]:
+        bp = band_pass_filter(a, Fs, 4, 8, filter_length)
+        key = _fir_design_keys[-1]
+        assert_true(not _fir_design_cache[key][0].flags.writeable)
+        # the design is reused, and is not modified by filtering
+        bp_2 = band_pass_filter(a, Fs, 4, 8, filter_length)
+        assert_true(_fir_design_keys[-1] == key)
+        assert_array_almost_equal(bp, bp_2, 15)
+    # the least recently used design is dropped
+    for ii in range(_fir_design_cache_size):
+        low_pass_filter(a[0, :100 + 2 * ii], Fs, 40)
+    assert_true(key not in _fir_design_cache)
+    assert_true(len(_fir_design_cache) == _fir_design_cache_size)
+    assert_true(len(_fir_design_keys) == _fir_design_cache_size)
+    # large designs are not kept, and the size of the cache is bounded
+    design = lambda N, freq, gain: (np.zeros(N), 0., 0.)
+    n_big = _fir_design_cache_bytes // 8 + 1
+    assert_true(len(_get_fir_design(design, n_big, [0, 1], [1, 1])[0]) ==
+                n_big)
+    assert_true(len(_fir_design_keys) == _fir_design_cache_size)
+    assert_true(all(key[1] < n_big for key in _fir_design_keys))
+    _get_fir_design(design, n_big // 2, [0, 1], [1, 1])
+    _get_fir_design(design, n_big // 2 + 1, [0, 1], [1, 1])
+    assert_true(_fir_design_keys[-1][1] == n_big // 2 + 1)
+    assert_true(all(key[1] != n_big // 2 for key in _fir_design_keys))
+    assert_true(sum(_design_nbytes(o) for o in _fir_design_cache.values())
+                <= _fir_design_cache_bytes)
+
+
+def test_streaming_filter():
+    """Test filtering of consecutive buffers
+    """
+    Fs = 500.
+    a = np.random.randn(3, 3000) + 10.
+    picks = [0, 2]
+    bounds = [0, 1, 10, 600, 601, 3000]
+    for method in ['fft', 'iir']:
+        for l_freq, h_freq in [(None, 40.), (4., None), (4., 40.),
+                               (60., 40.)]:
+            filt = StreamingFilter(Fs, l_freq, h_freq, picks,
+                                   filter_length=1024, method=method,
+                                   l_trans_bandwidth=2.,
+                                   h_trans_bandwidth=2.)
+            af = filt.filter(a)
+            assert_array_almost_equal(af[1], a[1], 15)
+            # the signal is assumed constant before the first buffer
+            if l_freq is None or (h_freq is not None and l_freq > h_freq):
+                assert_almost_equal(af[0, 0], a[0, 0], 3)
+            else:
+                assert_almost_equal(af[0, 0], 0, 3)
+            filt.reset()
+            af_2 = np.concatenate([filt.filter(a[:, start:stop]) for
+                                   start, stop in zip(bounds[:-1],
+                                                      bounds[1:])], axis=1)
+            assert_array_almost_equal(af_2, af, 12)
+            assert_raises(ValueError, filt.filter, a[:2])
+
+    # the filters are causal, the FIR filter delays by half its length
+    filt = StreamingFilter(Fs, None, 40., filter_length=101)
+    af = filt.filter(np.r_[np.zeros(300), np.ones(300)])
+    assert_true(np.all(np.abs(af[:300]) < 1e-12))
+    assert_almost_equal(af[350], 0.5, 1)
+    assert_almost_equal(af[-1], 1, 2)
+    # the FIR filter is the one low_pass_filter would use
+    b = _get_fir_design(_design_fir, 102, np.array([0, 40, 40.5, Fs / 2]) /
+                        (Fs / 2), [1, 1, 0, 0])[0]
+    assert_true(filt._b is b)
+    assert_raises(ValueError, StreamingFilter, Fs, 40., 30.,
+                  l_trans_bandwidth=6., h_trans_bandwidth=6.)
+    assert_raises(RuntimeError, StreamingFilter, Fs, 4., 40., method='blah')
+    assert_raises(ValueError, StreamingFilter, Fs, None, None)
+    assert_raises(ValueError, StreamingFilter, Fs, 4., None,
+                  l_trans_bandwidth=5.)
+    assert_raises(ValueError, StreamingFilter, Fs, None, Fs / 2.)
+
+
+def test_resample_polyphase():
+    """Test polyphase resampling
+    """
+    Fs = 1000.
+    t = np.arange(3000) / Fs
+    x = np.array([np.sin(2 * np.pi * 7 * t), np.cos(2 * np.pi * 23 * t) + 3])
+    for up, down in [(1, 1), (1, 5), (2, 3), (3, 2), (4, 1)]:
+        for n_jobs in [1, 2]:
+            y = resample(x, up * 100., down * 100., n_jobs=n_jobs,
+                         method='polyphase')
+            assert_true(y.shape == (2, int(round(3000 * up / float(down)))))
+            t_new = np.arange(y.shape[1]) * down / float(up) / Fs
+            y_true = np.array([np.sin(2 * np.pi * 7 * t_new),
+                               np.cos(2 * np.pi * 23 * t_new) + 3])
+            assert_array_almost_equal(y, y_true, 1)
+            assert_array_almost_equal(y[:, 50:-50], y_true[:, 50:-50], 2)
+    # chunked processing gives the same result
+    y = _resample_polyphase(x, _decim_filter(3) * 2, 2, 3)
+    y_2 = _resample_polyphase(x, _decim_filter(3) * 2, 2, 3, max_size=1000)
+    assert_array_almost_equal(y, y_2, 15)
+    # the sinusoid close to the Nyquist frequency disappears
+    sig = np.sin(2 * np.pi * Fs / 2.2 * t)
+    sig_gone = resample(sig, 1, 2, method='polyphase')[20:-20]
+    assert_array_almost_equal(np.zeros_like(sig_gone), sig_gone, 2)
+    assert_raises(ValueError, resample, x, 150., 600.614990234,
+                  method='polyphase')
+    assert_raises(RuntimeError, resample, x, 1, 2, method='blah')
+
+
+def test_filter_bank():
+    """Test filtering in several bands at once
+    """
+    Fs = 500.
+    a = np.random.randn(3, 10000)
+    bands = [(4., 8.), (8., 13.), (13., 30.)]
+    picks = [0, 2]
+    for filter_length, N in [('4s', 2049), (None, 10001)]:
+        af = filter_bank(a, Fs, bands, filter_length, picks=picks)
+        assert_true(af.shape == (3, 3, 10000))
+        aa = filter_bank(a, Fs, bands, filter_length, picks=picks,
+                         output='analytic', n_jobs=2)
+        ae = filter_bank(a, Fs, bands, filter_length, picks=picks,
+                         output='envelope')
+        for bi, (Fp1, Fp2) in enumerate(bands):
+            assert_array_almost_equal(af[bi, 1], a[1], 15)
+            # the band-pass filter, applied once and centered
+            freq = np.array([0, Fp1 - 0.5, Fp1, Fp2, Fp2 + 0.5, Fs / 2])
+            h = firwin2(N, freq / (Fs / 2), [0, 0, 1, 1, 0, 0])
+            # its analytic signal, truncated to the filter length
+            h_a = hilbert(h, 8 * 2 ** int(np.ceil(np.log2(N))))[:N]
+            for p in picks:
+                a_pad = _smart_pad(a[p], N // 2)
+                bp = np.convolve(a_pad, h, 'valid')
+                assert_array_almost_equal(af[bi, p] / bp.std(),
+                                          bp / bp.std(), 12)
+                bp_a = np.convolve(a_pad, h_a, 'valid')
+                assert_array_almost_equal(aa[bi, p] / bp.std(),
+                                          bp_a / bp.std(), 12)
+            assert_array_almost_equal(aa[bi].real, af[bi], 12)
+            assert_array_almost_equal(ae[bi, picks], np.abs(aa[bi, picks]),
+                                      12)
+    # a 1D signal
+    af = filter_bank(a[0], Fs, bands)
+    assert_array_almost_equal(af, filter_bank(a, Fs, bands)[:, 0], 12)
+    assert_raises(ValueError, filter_bank, a, Fs, bands, output='blah')
+    assert_raises(ValueError, filter_bank, a, Fs, [(0.2, 8.)])
+    assert_raises(ValueError, filter_bank, a, Fs, [(4., Fs / 2.)])
+
+
 @requires_cuda
 def test_cuda():
     """Test CUDA-based filtering
@@ -11,7 +11,9 @@ import mne
 from mne.datasets import sample
 from mne.fiff import Raw, pick_types
 from mne import compute_proj_epochs, compute_proj_evoked, compute_proj_raw
-from mne.fiff.proj import make_projector, activate_proj
+from mne.fiff.proj import (make_projector, activate_proj, _projector_vecs,
+                           _project, _projector_cache, _projector_keys,
+                           _projector_cache_size)
 from mne.proj import read_proj, write_proj, make_eeg_average_ref_proj
 from mne import read_events, Epochs, sensitivity_map, read_source_estimate
 from mne.utils import _TempDir
@@ -195,3 +197,35 @@ def test_compute_proj_raw():
     proj, nproj, U = make_projector(projs, raw.ch_names,
                                     bads=raw.ch_names)
     assert_array_almost_equal(proj, np.eye(len(raw.ch_names)))
+
+
+def test_low_rank_projector():
+    """Test caching and low-rank application of SSP operators
+    """
+    projs = read_proj(proj_fname)
+    ch_names = projs[0]['data']['col_names']
+    bads = ch_names[:2]
+    proj, nproj, U = make_projector(projs, ch_names, bads=bads)
+    proj[:] = 0  # the cached operator is not modified
+    proj, nproj, U = make_projector(projs, ch_names, bads=bads)
+    assert_array_almost_equal(proj, np.eye(len(ch_names)) - np.dot(U, U.T))
+    # the least recently used operator is dropped
+    key = _projector_keys[-1]
+    make_projector(projs, ch_names, bads=ch_names[:1])
+    key_old = _projector_keys[-1]
+    for ii in range(1, _projector_cache_size):
+        make_projector(projs, ch_names, bads=ch_names[ii:ii + 1])
+        make_projector(projs, ch_names, bads=bads)
+    assert_true(key in _projector_cache)
+    assert_true(key_old not in _projector_cache)
+    assert_true(len(_projector_cache) == _projector_cache_size)
+    info = dict(projs=projs, ch_names=ch_names, bads=bads)
+    assert_allclose(_projector_vecs(info), U)
+    data = np.random.RandomState(0).randn(len(ch_names), 3, 10)
+    assert_allclose(_project(U, data),
+                    np.dot(proj, data.reshape(len(ch_names), -1)).reshape(
+                        data.shape), rtol=1e-10, atol=1e-12)
+    data = data[:, 0].astype(np.float32)
+    assert_true(_project(U, data).dtype == np.float32)
+    info['projs'] = []
+    assert_true(_projector_vecs(info) is None)
@@ -734,6 +734,7 @@ known_config_types = [
     'SUBJECTS_DIR',
     'MNE_CACHE_DIR',
     'MNE_MEMMAP_MIN_SIZE',
+    'MNE_USE_FIF_INDEX_CACHE',
     'MNE_SKIP_SAMPLE_DATASET_TESTS',
     'MNE_DATASETS_SPM_FACE_DATASETS_TESTS'
     ]